@@ -0,0 +1,479 @@
+import asyncio
+import itertools
+import ntpath
+from collections import deque
+from atlassian_server_api.attachments import hash_files
+from atlassian_server_api.bitbucket import BitBucket
+from atlassian_server_api.codec import compress_body, decode_response, dumps
+from atlassian_server_api.coalesce import request_key
+from atlassian_server_api.jira import Jira
+from atlassian_server_api.models import DEFAULT_ISSUE_FIELDS, issue_model
+from atlassian_server_api.pagination import aiter_paged, bitbucket_next_start, jira_next_start
+from atlassian_server_api.transport import build_response
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncTransport:
+    """asyncio counterpart of Transport, backed by one pooled aiohttp.ClientSession.
+
+    Requests are limited by a semaphore so no more than concurrency requests are in flight at once, however many
+    coroutines are awaiting. Responses are read completely and returned as requests.Response objects, so they carry the
+    same data (status_code, headers, json(), ...) as the synchronous API. Responses are requested compressed and
+    decompressed by aiohttp.
+
+    Requires the optional aiohttp package.
+    """
+
+    def __init__(self, auth=None, headers=None, concurrency=10, limit_per_host=10, scheduler=None,
+                 instrumentation=None, single_flight=None, compress_min_size=None):
+        """Initialize AsyncTransport object with auth, default headers, and concurrency limits.
+
+        :param auth: Tuple of username and password for authentication.
+        :type auth: tuple[str, str]
+        :param headers: Headers sent with every request (request specific headers take precedence).
+        :type headers: dict
+        :param concurrency: Maximum number of requests in flight at once.
+        :type concurrency: int
+        :param limit_per_host: Maximum number of open connections per host.
+        :type limit_per_host: int
+        :param scheduler: Rate limiter and retry policy applied to every request.
+        :type scheduler: atlassian_server_api.scheduler.RequestScheduler
+        :param instrumentation: Receives an event for every request.
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
+        :param single_flight: Coalesces identical concurrent GET requests into one; every caller receives the same
+            response.
+        :type single_flight: atlassian_server_api.coalesce.SingleFlight
+        :param compress_min_size: Gzip compress request bodies of at least this many bytes (None to never compress).
+        :type compress_min_size: int
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncTransport requires aiohttp (pip install aiohttp).')
+
+        self.auth = auth
+        self.headers = dict(headers or {})
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.scheduler = scheduler
+        self.instrumentation = instrumentation
+        self.single_flight = single_flight
+        self.compress_min_size = compress_min_size
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        # aiohttp sessions must be created inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.limit_per_host)
+            auth = aiohttp.BasicAuth(*self.auth) if self.auth else None
+            trace_configs = []
+            if self.instrumentation is not None:
+                # count the connections opened for each request, to tell new connections from reused ones
+                trace_config = aiohttp.TraceConfig()
+                trace_config.on_connection_create_end.append(_count_connection)
+                trace_configs.append(trace_config)
+            self._session = aiohttp.ClientSession(connector=connector, auth=auth, headers=self.headers,
+                                                  trace_configs=trace_configs)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def request(self, method, url, files=None, **kwargs):
+        """Send a request through the pooled session.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param files: Form field names and open files, uploaded as multipart/form-data (a dict or a list of tuples).
+        :type files: dict | list[tuple[str, io.BufferedReader]]
+        :param kwargs: Any other argument accepted by aiohttp.ClientSession.request (headers, data, params, ...).
+        :return: Response from the server.
+        :rtype: requests.Response
+        """
+
+        # responses are always read completely
+        kwargs.pop('stream', None)
+        kwargs = compress_body(kwargs, self.compress_min_size)
+        if self.single_flight is not None and not files:
+            key = request_key(self, method, url, kwargs)
+            if key is not None:
+                return await self.single_flight.do_async(key, lambda: self._request(method, url, None, kwargs))
+        return await self._request(method, url, files, kwargs)
+
+    async def _request(self, method, url, files, kwargs):
+        session = self._get_session()
+
+        async def send():
+            if files:
+                # a form can only be sent once, so build it for every attempt
+                form = aiohttp.FormData()
+                for name, upload in (files.items() if isinstance(files, dict) else files):
+                    upload.seek(0)
+                    form.add_field(name, upload, filename=ntpath.basename(upload.name))
+                kwargs['data'] = form
+
+            async with self._semaphore:
+                async with session.request(method, url, **kwargs) as r:
+                    content = await r.read()
+
+            return build_response(r.status, r.headers, content, str(r.url), r.reason)
+
+        async def send_all():
+            if self.scheduler is None:
+                return await send()
+            return await self.scheduler.send_async(
+                method, url, send, connection_errors=(aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+        if self.instrumentation is None:
+            return await send_all()
+        tracking = kwargs['trace_request_ctx'] = {'opened': 0}
+        data = kwargs.get('data')
+        bytes_sent = len(data) if isinstance(data, (bytes, str)) else 0
+        return await self.instrumentation.http_async(method, url, send_all, tracking, bytes_sent)
+
+    async def get(self, url, **kwargs):
+        """Send a GET request.
+
+        :rtype: requests.Response
+        """
+
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        """Send a POST request.
+
+        :rtype: requests.Response
+        """
+
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        """Close the session and all pooled connections."""
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+async def _count_connection(session, trace_config_ctx, params):
+    if trace_config_ctx.trace_request_ctx is not None:
+        trace_config_ctx.trace_request_ctx['opened'] += 1
+
+
+class AsyncJira(Jira):
+    """asyncio counterpart of Jira.
+
+    Every method is a coroutine returning the same data as its synchronous counterpart:
+
+    async with AsyncTransport(auth=auth, concurrency=50) as transport:
+        jira = AsyncJira(jira_url, project_id, transport=transport)
+        responses = await asyncio.gather(*(jira.get_issues(key) for key in keys))
+    """
+
+    def __init__(self, base_http_url, project_key, auth=None, transport=None, concurrency=10):
+        """Initialize AsyncJira object with base_http_url, project_key, and auth or a shared transport.
+
+        :param base_http_url: URL for JIRA site - http://host:port/ (i.e. http://localhost:8080/)
+        :type base_http_url: str
+        :param project_key: The project matching the projectKey supplied in the resource path as shown in URL.
+        :type project_key: str
+        :param auth: Tuple of username and password for authentication.
+        :type auth: tuple[str, str]
+        :param transport: Asynchronous transport to send requests through. When omitted a new AsyncTransport is
+            created with auth and concurrency.
+        :type transport: AsyncTransport
+        :param concurrency: Maximum number of requests in flight at once for a transport created by this client.
+        :type concurrency: int
+        """
+        if transport is None:
+            transport = AsyncTransport(auth=auth, concurrency=concurrency)
+        super().__init__(base_http_url, project_key, auth=auth, transport=transport)
+
+    # create_issue and get_issues are inherited: they return the transport's coroutine unchanged.
+
+    async def create_issues(self, issues, chunk_size=50):
+        """Create many issues in Jira through the bulk endpoint, sending the chunks concurrently.
+
+        Concurrency is bounded by the transport. See Jira.create_issues for the format of the results.
+
+        :param issues: Issues to create. Each is either a summary string or a dict of create_issue keyword arguments.
+        :type issues: collections.abc.Iterable[str | dict]
+        :param chunk_size: Number of issues per bulk request.
+        :type chunk_size: int
+        :return: Result of every issue, in input order.
+        :rtype: list[dict]
+        """
+
+        url = self.base_http_url + 'rest/api/2/issue/bulk'
+        headers = {'Content-Type': 'application/json'}
+
+        async def create_chunk(start_index, chunk):
+            data = {"issueUpdates": [self._issue_data(**issue) for issue in chunk]}
+            try:
+                r = await self.transport.post(url, headers=headers, data=dumps(data))
+            except aiohttp.ClientError as e:
+                return self._bulk_results(start_index, chunk, None, error=str(e))
+            return self._bulk_results(start_index, chunk, r)
+
+        results = await asyncio.gather(*(create_chunk(*chunk) for chunk in self._issue_chunks(issues, chunk_size)))
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def iter_issues(self, page_size=50, fields=None, expand=None, model=False):
+        """Iterate over the issues listed by get_issues, one issue at a time.
+
+        :param page_size: The "maxResults" parameter used for each page.
+        :type page_size: int
+        :param fields: Only request these fields of the issues (see Jira.iter_issues).
+        :type fields: list[str]
+        :param expand: Entities to expand in the representation (i.e. ['changelog']).
+        :type expand: list[str]
+        :param model: Yield compact, slotted Issue models holding only the requested fields instead of dicts.
+        :type model: bool
+        :return: Asynchronous generator of issues.
+        :rtype: collections.abc.AsyncIterator[dict | atlassian_server_api.models.Issue]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        if model:
+            # request exactly the fields of the model (i.e. 'summary, status' split into names)
+            fields = issue_model(DEFAULT_ISSUE_FIELDS if fields is None else fields).fields
+        decode = issue_model(fields).from_json if model else None
+
+        async def fetch_page(start):
+            r = await self.get_issues(max_results=page_size, start_at=start, fields=fields, expand=expand)
+            r.raise_for_status()
+            return decode_response(r)
+
+        async for issue in aiter_paged(fetch_page, 'issues', jira_next_start):
+            yield decode(issue) if decode else issue
+
+    async def search(self, jql, fields=None, expand=None, page_size=100, parallelism=4, model=False):
+        """Iterate over all issues matching a JQL query, fetching pages in parallel.
+
+        See Jira.search. Pages after the first are requested as tasks, parallelism pages at a time.
+
+        :param jql: JQL query (i.e. 'project = PROJ ORDER BY key').
+        :type jql: str
+        :param fields: Only request these fields of the issues.
+        :type fields: list[str]
+        :param expand: Entities to expand in the representation (i.e. ['changelog']).
+        :type expand: list[str]
+        :param page_size: The "maxResults" parameter used for each page. Jira may cap it.
+        :type page_size: int
+        :param parallelism: Number of pages requested concurrently.
+        :type parallelism: int
+        :param model: Yield compact, slotted Issue models holding only the requested fields instead of dicts.
+        :type model: bool
+        :return: Asynchronous generator of issues.
+        :rtype: collections.abc.AsyncIterator[dict | atlassian_server_api.models.Issue]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        if model:
+            # request exactly the fields of the model (i.e. 'summary, status' split into names)
+            fields = issue_model(DEFAULT_ISSUE_FIELDS if fields is None else fields).fields
+        decode = issue_model(fields).from_json if model else None
+
+        async def fetch_page(start, max_results):
+            r = await self.search_issues(jql, max_results=max_results, start_at=start, fields=fields, expand=expand)
+            r.raise_for_status()
+            return decode_response(r)
+
+        page = await fetch_page(0, page_size)
+        step = min(page.get('maxResults') or page_size, page_size) or page_size
+        starts = iter(range(len(page['issues']), page.get('total', 0), step))
+
+        pending = deque(asyncio.ensure_future(fetch_page(start, step))
+                        for start in itertools.islice(starts, parallelism))
+        try:
+            while True:
+                issues = page['issues']
+                del page
+                for issue in issues:
+                    yield decode(issue) if decode else issue
+                if not pending:
+                    return
+                page = await pending.popleft()
+                for start in itertools.islice(starts, 1):
+                    pending.append(asyncio.ensure_future(fetch_page(start, step)))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def add_attachment(self, issue_id, attachments, mode='separate', max_workers=4):
+        """Add attachments to Jira issue.
+
+        Files are streamed from disk. The modes are those of Jira.add_attachment: 'separate' uploads one file per
+        request, one after the other; 'concurrent' uploads one file per request, max_workers at a time (and bounded by
+        the transport); 'single' sends all files in one multipart request.
+
+        :param issue_id: JIRA will attempt to identify the issue by the issueIdOrKey path parameter. This can be an
+            issue id, or an issue key.
+        :type issue_id: str
+        :param attachments: List of string paths to attachments to be uploaded and added to an issue.
+        :type attachments: list[str]
+        :param mode: How files are sent: 'separate', 'single' or 'concurrent'.
+        :type mode: str
+        :param max_workers: Number of concurrent uploads in 'concurrent' mode.
+        :type max_workers: int
+        :return: Same as Jira.add_attachment.
+        :rtype: list[requests.Response, str]
+        """
+
+        if mode not in ('separate', 'single', 'concurrent'):
+            raise ValueError('Unknown attachment mode: ' + str(mode))
+
+        if not attachments:
+            return ['ERROR: No attachments to add.']
+
+        url = self.base_http_url + 'rest/api/2/issue/' + issue_id + '/attachments'
+        headers = {'X-Atlassian-Token': 'no-check'}
+
+        async def upload(file_paths):
+            files = [open(file, 'rb') for file in file_paths]
+            try:
+                return await self.transport.post(url, headers=headers, files=[('file', f) for f in files])
+            finally:
+                for f in files:
+                    f.close()
+
+        if mode == 'single':
+            r = [await upload(attachments)]
+        elif mode == 'concurrent':
+            workers = asyncio.Semaphore(max_workers)
+
+            async def upload_file(file):
+                async with workers:
+                    return await upload([file])
+
+            r = list(await asyncio.gather(*(upload_file(file) for file in attachments)))
+        else:
+            r = [await upload([file]) for file in attachments]
+
+        # verify attachments were attached
+        uploaded = self._uploaded_filenames(r)
+        if uploaded is None:
+            r_issue = await self.get_issues(issue_id, fields=['attachment'])
+            uploaded = [d['filename'] for d in decode_response(r_issue)['fields']['attachment']]
+        r.extend(self._missing_attachments(attachments, uploaded))
+
+        return r
+
+    async def sync_attachments(self, issue_id, attachments, hash_cache=None, replace=False, mode='concurrent',
+                               max_workers=4):
+        """Upload only the attachments the issue does not have yet.
+
+        Files are hashed in a worker thread, so the event loop is not blocked. See Jira.sync_attachments.
+
+        :param issue_id: JIRA will attempt to identify the issue by the issueIdOrKey path parameter. This can be an
+            issue id, or an issue key.
+        :type issue_id: str
+        :param attachments: List of string paths to attachments to be synced to the issue.
+        :type attachments: list[str]
+        :param hash_cache: Cache of content hashes, also comparing files by content.
+        :type hash_cache: atlassian_server_api.attachments.HashCache
+        :param replace: Delete the issue's older attachments with the filename of a file uploaded again.
+        :type replace: bool
+        :param mode: How changed files are uploaded: 'separate', 'single' or 'concurrent'.
+        :type mode: str
+        :param max_workers: Number of files hashed at once, and of concurrent uploads in 'concurrent' mode.
+        :type max_workers: int
+        :return: Same as Jira.sync_attachments.
+        :rtype: dict
+        """
+
+        r_issue = await self.get_issues(issue_id, fields=['attachment'])
+        existing = decode_response(r_issue)['fields']['attachment']
+        hashes = {}
+        if hash_cache is not None:
+            hashes = await asyncio.get_running_loop().run_in_executor(
+                None, hash_files, attachments, hash_cache, max_workers)
+        upload, skipped = self._plan_attachments(attachments, existing, hashes, hash_cache)
+
+        responses = await self.add_attachment(issue_id, upload, mode=mode, max_workers=max_workers) if upload else []
+        replaced = self._record_attachments(responses, upload, existing, hashes, hash_cache)
+        deleted = []
+        for attachment_id in replaced if replace else []:
+            r = await self.transport.request('DELETE', self.base_http_url + 'rest/api/2/attachment/' + attachment_id)
+            if r.ok:
+                deleted.append(attachment_id)
+        if hash_cache is not None:
+            hash_cache.save()
+
+        return {'uploaded': upload, 'skipped': skipped, 'deleted': deleted, 'responses': responses}
+
+
+class AsyncBitBucket(BitBucket):
+    """asyncio counterpart of BitBucket.
+
+    Every method is a coroutine returning the same data as its synchronous counterpart.
+    """
+
+    def __init__(self, base_http_url, project_key, auth=None, transport=None, concurrency=10):
+        """Initialize AsyncBitBucket object with base_http_url, project_key, and auth or a shared transport.
+
+        :param base_http_url: URL for BitBucket site - http://host:port/ (i.e. http://localhost:7990/)
+        :type base_http_url: str
+        :param project_key: The project matching the projectKey supplied in the resource path as shown in URL.
+        :type project_key: str
+        :param auth: Tuple of username and password for authentication.
+        :type auth: tuple[str, str]
+        :param transport: Asynchronous transport to send requests through. When omitted a new AsyncTransport is
+            created with auth and concurrency.
+        :type transport: AsyncTransport
+        :param concurrency: Maximum number of requests in flight at once for a transport created by this client.
+        :type concurrency: int
+        """
+        if transport is None:
+            transport = AsyncTransport(auth=auth, concurrency=concurrency)
+        super().__init__(base_http_url, project_key, auth=auth, transport=transport)
+
+    # create_repo, get_repos, branch_repo and get_repo_branches are inherited: they return the transport's coroutine
+    # unchanged.
+
+    async def iter_repos(self, page_size=25):
+        """Iterate over all repositories of the project, one repository at a time.
+
+        :param page_size: Number of repos to request per page.
+        :type page_size: int
+        :return: Asynchronous generator of repositories.
+        :rtype: collections.abc.AsyncIterator[dict]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        async def fetch_page(start):
+            r = await self.get_repos(limit=page_size, start_at=start)
+            r.raise_for_status()
+            return decode_response(r)
+
+        async for repo in aiter_paged(fetch_page, 'values', bitbucket_next_start):
+            yield repo
+
+    async def iter_branches(self, repo_name, page_size=25):
+        """Iterate over all branches of the repository, one branch at a time.
+
+        :param repo_name: Name of repository to get branches (i.e. "my_repo").
+        :type repo_name: str
+        :param page_size: Number of branches to request per page.
+        :type page_size: int
+        :return: Asynchronous generator of branches.
+        :rtype: collections.abc.AsyncIterator[dict]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        async def fetch_page(start):
+            r = await self.get_repo_branches(repo_name, limit=page_size, start_at=start)
+            r.raise_for_status()
+            return decode_response(r)
+
+        async for branch in aiter_paged(fetch_page, 'values', bitbucket_next_start):
+            yield branch
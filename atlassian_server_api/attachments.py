@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def hash_file(path, algorithm='sha256', chunk_size=1024 * 1024):
+    """Hash the content of a file, reading it in chunks so it is never loaded into memory at once.
+
+    :param path: Path of the file.
+    :type path: str
+    :param algorithm: hashlib algorithm name.
+    :type algorithm: str
+    :param chunk_size: Bytes read at a time.
+    :type chunk_size: int
+    :return: Hex digest of the content.
+    :rtype: str
+    """
+
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        chunk = bytearray(chunk_size)
+        view = memoryview(chunk)
+        while True:
+            size = f.readinto(chunk)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def hash_files(paths, hash_cache=None, max_workers=4, algorithm='sha256', chunk_size=1024 * 1024):
+    """Hash many files in parallel.
+
+    hashlib releases the GIL while hashing large chunks, so threads hash several files at once. Files whose size and
+    modification time match the hash_cache are not read again.
+
+    :param paths: Paths of the files.
+    :type paths: list[str]
+    :param hash_cache: Cache of file hashes to read from and update.
+    :type hash_cache: HashCache
+    :param max_workers: Number of files hashed at the same time.
+    :type max_workers: int
+    :param algorithm: hashlib algorithm name.
+    :type algorithm: str
+    :param chunk_size: Bytes read at a time.
+    :type chunk_size: int
+    :return: Hex digest by path.
+    :rtype: dict[str, str]
+    """
+
+    def hash_one(path):
+        digest = hash_cache.file_hash(path) if hash_cache is not None else None
+        if digest is None:
+            digest = hash_file(path, algorithm, chunk_size)
+            if hash_cache is not None:
+                hash_cache.set_file_hash(path, digest)
+        return digest
+
+    paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(hash_one, paths)))
+
+
+class HashCache:
+    """Content hashes of local files and of uploaded attachments, optionally kept in a JSON file between runs.
+
+    File hashes are stored with the size and modification time of the file, and are only used while both are
+    unchanged. Attachment hashes are recorded by Jira.sync_attachments when it uploads a file, since Jira does not
+    report the hash of an attachment.
+    """
+
+    def __init__(self, path=None):
+        """Initialize HashCache, loading path if it exists.
+
+        :param path: JSON file the cache is loaded from and saved to. None keeps it in memory.
+        :type path: str
+        """
+        self.path = path
+        self._files = {}
+        self._attachments = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self._files = data.get('files', {})
+            self._attachments = data.get('attachments', {})
+
+    def file_hash(self, path):
+        """Cached hash of a file, or None if unknown or if the file changed since it was hashed.
+
+        :rtype: str
+        """
+
+        info = os.stat(path)
+        with self._lock:
+            entry = self._files.get(os.path.abspath(path))
+        if entry is not None and entry['size'] == info.st_size and entry['mtime_ns'] == info.st_mtime_ns:
+            return entry['hash']
+        return None
+
+    def set_file_hash(self, path, digest):
+        info = os.stat(path)
+        with self._lock:
+            self._files[os.path.abspath(path)] = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'hash': digest}
+
+    def attachment_hash(self, attachment_id):
+        """Hash recorded for an uploaded attachment, or None.
+
+        :rtype: str
+        """
+
+        with self._lock:
+            return self._attachments.get(str(attachment_id))
+
+    def set_attachment_hash(self, attachment_id, digest):
+        with self._lock:
+            self._attachments[str(attachment_id)] = digest
+
+    def save(self):
+        """Write the cache to path (atomically), if it has one."""
+
+        if not self.path:
+            return
+        with self._lock:
+            data = {'files': self._files, 'attachments': self._attachments}
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
@@ -0,0 +1,669 @@
+"""Benchmarks run against the stub server.
+
+Run with:
+
+python -m atlassian_server_api.benchmarks
+
+or, to save the per method results and fail on regressions against a saved run:
+
+python -m atlassian_server_api.benchmarks methods --json new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import inspect
+import itertools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from atlassian_server_api.bitbucket import BitBucket
+from atlassian_server_api import codec
+from atlassian_server_api.coalesce import SingleFlight
+from atlassian_server_api.aio import AsyncBitBucket, AsyncJira, AsyncTransport, aiohttp
+from atlassian_server_api.attachments import HashCache
+from atlassian_server_api.git import Git
+from atlassian_server_api.git_cache import MirrorCache
+from atlassian_server_api.instrumentation import Instrumentation, MetricsAggregator
+from atlassian_server_api.jira import Jira
+from atlassian_server_api.models import issue_model
+from atlassian_server_api.stub_server import StubServer
+from atlassian_server_api.transport import Transport
+
+
+def bench_transport(iterations=500):
+    """Compare requests per second of get_issues(issue_id=...) loops with and without connection reuse.
+
+    The baseline transport closes its connection after every request, which is what module level requests.get did
+    before the shared Transport existed.
+
+    :param iterations: Number of get_issues calls per run.
+    :type iterations: int
+    :return: Requests per second and connections opened for each run.
+    :rtype: dict
+    """
+
+    results = {}
+    with StubServer() as server:
+        for name, keep_alive in (('new connection per request', False), ('pooled keep-alive', True)):
+            transport = Transport(auth=('user', 'password'), keep_alive=keep_alive)
+            jira = Jira(server.base_http_url, server.project_key, transport=transport)
+            connections = server.connection_count
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                jira.get_issues(issue_id='PROJ-1').raise_for_status()
+            elapsed = time.perf_counter() - start
+
+            transport.close()
+            results[name] = {
+                'requests_per_second': iterations / elapsed,
+                'connections': server.connection_count - connections
+            }
+    return results
+
+
+def bench_coalescing(workers=32, rounds=20, latency=0.02):
+    """Load test of workers asking for the same issue and branch list at the same moment, with and without SingleFlight.
+
+    In every round, half of the workers call get_issues for one issue and the other half get_repo_branches for one
+    repository, all at once. Runs with threads and with asyncio (if aiohttp is installed).
+
+    :param workers: Number of concurrent callers.
+    :type workers: int
+    :param rounds: Number of rounds.
+    :type rounds: int
+    :param latency: Seconds the stub server takes to answer each request.
+    :type latency: float
+    :return: Requests received by the server, seconds, and the SingleFlight counters for each run.
+    :rtype: dict
+    """
+
+    def call(jira, bitbucket, worker, round_number):
+        if worker % 2:
+            return jira.get_issues('PROJ-%d' % (round_number % 10 + 1))
+        return bitbucket.get_repo_branches('repo-%d' % (round_number % 3 + 1))
+
+    def run_threads(single_flight):
+        transport = Transport(auth=('user', 'password'), pool_maxsize=workers, single_flight=single_flight)
+        jira = Jira(server.base_http_url, server.project_key, transport=transport)
+        bitbucket = BitBucket(server.base_http_url, server.project_key, transport=transport)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for round_number in range(rounds):
+                calls = [executor.submit(call, jira, bitbucket, worker, round_number) for worker in range(workers)]
+                for future in calls:
+                    future.result().raise_for_status()
+        transport.close()
+
+    async def run_asyncio(single_flight):
+        async with AsyncTransport(auth=('user', 'password'), concurrency=workers, limit_per_host=workers,
+                                  single_flight=single_flight) as transport:
+            jira = AsyncJira(server.base_http_url, server.project_key, transport=transport)
+            bitbucket = AsyncBitBucket(server.base_http_url, server.project_key, transport=transport)
+            for round_number in range(rounds):
+                responses = await asyncio.gather(*(call(jira, bitbucket, worker, round_number)
+                                                   for worker in range(workers)))
+                for r in responses:
+                    r.raise_for_status()
+
+    runs = [('threads', run_threads)]
+    if aiohttp is not None:
+        runs.append(('asyncio', lambda single_flight: asyncio.run(run_asyncio(single_flight))))
+
+    results = {}
+    with StubServer(latency=latency) as server:
+        for name, run in runs:
+            for single_flight in (None, SingleFlight()):
+                requests = server.request_count
+                start = time.perf_counter()
+                run(single_flight)
+                results[name + (' + single flight' if single_flight else '')] = {
+                    'server_requests': server.request_count - requests,
+                    'seconds': time.perf_counter() - start,
+                    'coalesced': single_flight.stats()['coalesced'] if single_flight else 0
+                }
+    return results
+
+
+def synthetic_issue(number, project_key='PROJ'):
+    """JSON representation of an issue shaped like the full representation Jira returns."""
+
+    user = {
+        'self': 'http://localhost:8080/rest/api/2/user?username=user%d' % (number % 50),
+        'name': 'user%d' % (number % 50),
+        'emailAddress': 'user%d@example.com' % (number % 50),
+        'avatarUrls': {size: 'http://localhost:8080/secure/useravatar?size=%s' % size
+                       for size in ('48x48', '24x24', '16x16', '32x32')},
+        'displayName': 'User %d' % (number % 50),
+        'active': True
+    }
+    return {
+        'expand': 'renderedFields,names,schema,operations,editmeta,changelog,versionedRepresentations',
+        'id': str(10000 + number),
+        'self': 'http://localhost:8080/rest/api/2/issue/%d' % (10000 + number),
+        'key': '%s-%d' % (project_key, number),
+        'fields': {
+            'summary': 'Issue %d' % number,
+            'description': 'Description of issue %d. ' % number * 4,
+            'issuetype': {'self': 'http://localhost:8080/rest/api/2/issuetype/3', 'id': '3', 'name': 'Task',
+                          'subtask': False},
+            'project': {'self': 'http://localhost:8080/rest/api/2/project/10000', 'id': '10000', 'key': project_key,
+                        'name': 'Project'},
+            'status': {'self': 'http://localhost:8080/rest/api/2/status/1', 'id': '1', 'name': 'Open',
+                       'statusCategory': {'id': 2, 'key': 'new', 'colorName': 'blue-gray', 'name': 'To Do'}},
+            'priority': {'self': 'http://localhost:8080/rest/api/2/priority/3', 'id': '3', 'name': 'Medium'},
+            'assignee': user,
+            'reporter': user,
+            'labels': ['backend', 'perf'],
+            'created': '2019-01-01T00:00:00.000+0000',
+            'updated': '2019-01-02T00:00:00.000+0000',
+            'attachment': [{'self': 'http://localhost:8080/rest/api/2/attachment/%d' % number, 'id': str(number),
+                            'filename': 'build-%d.log' % number, 'author': user, 'size': 1024,
+                            'mimeType': 'text/plain'}]
+        }
+    }
+
+
+def bench_issue_models(count=100000, page_size=1000):
+    """Compare memory retained by count decoded issues kept as dicts versus compact Issue models.
+
+    Pages of synthetic issues are decoded with json.loads; the dicts are either kept as they are or converted to
+    models holding key, summary, status and attachment names.
+
+    :param count: Number of issues.
+    :type count: int
+    :param page_size: Number of issues per decoded page.
+    :type page_size: int
+    :return: Retained megabytes for each representation.
+    :rtype: dict
+    """
+
+    page = json.dumps([synthetic_issue(i) for i in range(1, page_size + 1)])
+    model = issue_model(['summary', 'status', 'attachment'])
+
+    results = {}
+    for name, decode in (('dict', lambda issues: issues), ('slotted model', lambda issues: [
+            model.from_json(issue) for issue in issues])):
+        gc.collect()
+        tracemalloc.start()
+        kept = []
+        for _ in range(count // page_size):
+            kept.extend(decode(json.loads(page)))
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = {'megabytes': retained / 1e6, 'count': len(kept)}
+        del kept
+    return results
+
+
+def bench_codec(page_size=5000, rounds=5, chunk_size=64 * 1024):
+    """Measure the decode throughput of a large synthetic Jira search page with every installed JSON library.
+
+    Each library decodes the page at once from its joined chunks, as done for a response read whole. Incremental
+    decoding (decode_chunks) reads the same chunks as they arrive, without joining them first. Peak memory includes the
+    joined body.
+
+    :param page_size: Number of issues in the page.
+    :type page_size: int
+    :param rounds: Number of timed decodes.
+    :type rounds: int
+    :param chunk_size: Size of the chunks the page arrives in.
+    :type chunk_size: int
+    :return: Megabytes decoded per second and peak megabytes of each decoder.
+    :rtype: dict
+    """
+
+    page = json.dumps({'startAt': 0, 'maxResults': page_size, 'total': page_size,
+                       'issues': [synthetic_issue(i) for i in range(1, page_size + 1)]}).encode('utf-8')
+    chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+
+    decoders = [(name, name, lambda: codec.loads(b''.join(chunks))) for name in codec.JSON_LIBRARIES]
+    decoders.append(('incremental (decode_chunks)', None, lambda: codec.decode_chunks(chunks)))
+
+    library = codec.json_library
+    results = {}
+    try:
+        for name, json_library, decode in decoders:
+            if json_library is not None:
+                try:
+                    codec.set_json_library(json_library)
+                except ImportError:
+                    continue
+            decode()
+            gc.collect()
+            tracemalloc.start()
+            decode()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            for _ in range(rounds):
+                decode()
+            seconds = (time.perf_counter() - start) / rounds
+            results[name] = {'megabytes_per_second': len(page) / 1e6 / seconds, 'peak_megabytes': peak / 1e6}
+    finally:
+        codec.set_json_library(library)
+    return results
+
+
+def bench_compression(issue_count=2000, payload_size=1000, page_size=500):
+    """Compare iterating over search results with and without compressed responses.
+
+    :param issue_count: Number of issues in the stub server.
+    :type issue_count: int
+    :param payload_size: Description length of the issues.
+    :type payload_size: int
+    :param page_size: Number of issues per page.
+    :type page_size: int
+    :return: Seconds taken and response bytes received on the wire for each setting.
+    :rtype: dict
+    """
+
+    results = {}
+    for name, compress_min_size in (('uncompressed', None), ('gzip', 1024)):
+        with StubServer(issue_count=issue_count, payload_size=payload_size, compress_min_size=compress_min_size) as \
+                server:
+            metrics = MetricsAggregator()
+            transport = Transport(auth=('user', 'password'), instrumentation=Instrumentation(metrics))
+            jira = Jira(server.base_http_url, server.project_key, transport=transport)
+            start = time.perf_counter()
+            count = sum(1 for _ in jira.search('project = PROJ', page_size=page_size, parallelism=2))
+            seconds = time.perf_counter() - start
+            transport.close()
+            results[name] = {'seconds': seconds, 'issues': count,
+                             'bytes_received': sum(endpoint['bytes_received'] for endpoint in metrics.snapshot())}
+    return results
+
+
+def git_repo_with_files(file_count):
+    """Create a temporary git repository holding file_count untracked files and return its Git object."""
+
+    directory = tempfile.mkdtemp(prefix='atlassian-bench-')
+    repo = Git(directory)
+    repo.git_init()
+    for name, value in (('user.name', 'Benchmark'), ('user.email', 'benchmark@example.com')):
+        repo._git('config', name, value)
+    for i in range(file_count):
+        with open(os.path.join(directory, 'file-%05d.txt' % i), 'w') as f:
+            f.write('generated file %d\n' % i)
+    return repo
+
+
+def bench_git(file_count=2000):
+    """Compare staging and committing file_count files one git process per file against the batched operations.
+
+    Also compares reading every committed blob with one "git cat-file" process per object against one persistent
+    "git cat-file --batch" reader.
+
+    :param file_count: Number of generated files.
+    :type file_count: int
+    :return: Seconds taken by each approach.
+    :rtype: dict
+    """
+
+    paths = ['file-%05d.txt' % i for i in range(file_count)]
+    results = {}
+
+    def timed(name, function):
+        start = time.perf_counter()
+        function()
+        results[name] = time.perf_counter() - start
+
+    def add_per_file():
+        for path in paths:
+            repo.git_add(path)
+        repo.git_commit('per file')
+
+    def add_batched():
+        repo.git_add(paths)
+        repo.git_commit('batched')
+
+    def cat_file_per_object():
+        for sha in objects:
+            subprocess.check_output(['git', 'cat-file', 'blob', sha], cwd=repo.working_directory)
+
+    def cat_file_batch():
+        with repo.cat_file() as reader:
+            for sha in objects:
+                reader.read(sha)
+
+    repo = git_repo_with_files(file_count)
+    try:
+        timed('git_add per file + git_commit', add_per_file)
+        objects = repo._git('ls-tree', '--object-only', 'HEAD').split()
+        timed('git cat-file per object', cat_file_per_object)
+        timed('cat-file --batch reader', cat_file_batch)
+    finally:
+        shutil.rmtree(repo.working_directory)
+
+    repo = git_repo_with_files(file_count)
+    try:
+        timed('git_add(paths) + git_commit', add_batched)
+    finally:
+        shutil.rmtree(repo.working_directory)
+
+    repo = git_repo_with_files(file_count)
+    try:
+        timed('git_commit_files (fast-import)', lambda: repo.git_commit_files(paths, 'fast-import'))
+    finally:
+        shutil.rmtree(repo.working_directory)
+
+    return results
+
+
+def measure(call, iterations, setup=None):
+    """Measure throughput, latency percentiles and memory of a call.
+
+    The call is timed iterations times, then traced by tracemalloc once more, so tracing does not slow the timed calls.
+    Exceptions are counted as errors instead of stopping the run.
+
+    :param call: Callable to measure. It receives the arguments returned by setup.
+    :type call: callable
+    :param iterations: Number of timed calls (at least 2).
+    :type iterations: int
+    :param setup: Callable run before every call, outside of the measurement, returning a tuple of arguments or None.
+    :type setup: callable
+    :return: {'calls_per_second': 812.4, 'p50_ms': 1.2, 'p99_ms': 2.9, 'peak_kilobytes': 41.3, 'errors': 0}
+    :rtype: dict
+    """
+
+    errors = 0
+    latencies = []
+    for _ in range(iterations + 1):
+        args = (setup() if setup else None) or ()
+        if len(latencies) == iterations:
+            gc.collect()
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            call(*args)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.pop()
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'calls_per_second': iterations / sum(latencies),
+        'p50_ms': percentiles[49] * 1000,
+        'p99_ms': percentiles[98] * 1000,
+        'peak_kilobytes': peak / 1e3,
+        'errors': errors
+    }
+
+
+def public_methods(cls):
+    """Names of the public methods of cls, i.e. ['Jira.create_issue', ...]."""
+
+    return [cls.__name__ + '.' + name for name, _ in inspect.getmembers(cls, inspect.isfunction)
+            if not name.startswith('_')]
+
+
+@contextlib.contextmanager
+def stub_process(**options):
+    """Run the stub server in a child process, so it does not show up in the client's timings and memory.
+
+    Options are StubServer keyword arguments. Yields the base URL of the server.
+    """
+
+    args = [sys.executable, '-m', 'atlassian_server_api.stub_server']
+    for name, value in options.items():
+        args += ['--' + name.replace('_', '-'), str(value)]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    try:
+        yield process.stdout.readline().strip()
+    finally:
+        process.terminate()
+        process.wait()
+        process.stdout.close()
+
+
+def jira_cases(jira, directory):
+    """Benchmark cases of every public Jira method, as (name, call, setup) tuples."""
+
+    attachment = os.path.join(directory, 'attachment.log')
+    with open(attachment, 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+    summaries = ['Benchmark issue %d' % i for i in range(50)]
+    hash_cache = HashCache()
+
+    return [
+        ('Jira.get_issues', lambda: jira.get_issues('PROJ-1').raise_for_status(), None),
+        ('Jira.iter_issues', lambda: list(jira.iter_issues(page_size=50)), None),
+        ('Jira.search_issues', lambda: jira.search_issues('project = PROJ', fields=['summary']).raise_for_status(),
+         None),
+        ('Jira.search', lambda: list(jira.search('project = PROJ', fields=['summary'], page_size=50)), None),
+        ('Jira.create_issue', lambda: jira.create_issue('Benchmark issue').raise_for_status(), None),
+        ('Jira.create_issues', lambda: jira.create_issues(summaries), None),
+        ('Jira.add_attachment', lambda: jira.add_attachment('PROJ-2', [attachment]), None),
+        # uploads once, then measures the check of an unchanged file
+        ('Jira.sync_attachments', lambda: jira.sync_attachments('PROJ-3', [attachment], hash_cache), None),
+    ]
+
+
+def bitbucket_cases(bitbucket):
+    """Benchmark cases of every public BitBucket method, as (name, call, setup) tuples."""
+
+    numbers = itertools.count()
+
+    return [
+        ('BitBucket.get_repo', lambda: bitbucket.get_repo('repo-1').raise_for_status(), None),
+        ('BitBucket.get_repos', lambda: bitbucket.get_repos(25).raise_for_status(), None),
+        ('BitBucket.get_repo_branches', lambda: bitbucket.get_repo_branches('repo-1').raise_for_status(), None),
+        ('BitBucket.iter_repos', lambda: list(bitbucket.iter_repos()), None),
+        ('BitBucket.iter_branches', lambda: list(bitbucket.iter_branches('repo-1')), None),
+        ('BitBucket.create_repo', lambda name: bitbucket.create_repo(name).raise_for_status(),
+         lambda: ('bench-repo-%d' % next(numbers),)),
+        ('BitBucket.branch_repo', lambda name: bitbucket.branch_repo('repo-1', name).raise_for_status(),
+         lambda: ('bench-branch-%d' % next(numbers),)),
+    ]
+
+
+def git_cases(directory, file_count=100):
+    """Benchmark cases of every public Git method, as (name, call, setup) tuples.
+
+    The cases share one repository with file_count committed files and a bare remote, both created in directory.
+    Clones and fetches go through a mirror cache of the repository in directory.
+    """
+
+    numbers = itertools.count()
+    repo = git_repo_with_files(file_count)
+    repo.git_add_all()
+    repo.git_commit('initial')
+    remote = os.path.join(directory, 'remote.git')
+    subprocess.check_call(['git', 'init', '--quiet', '--bare', remote])
+    repo.git_add_remote(remote)
+    branch = repo._git('symbolic-ref', '--short', 'HEAD').strip()
+    paths = ['file-%05d.txt' % i for i in range(file_count)]
+    source_url = 'file://' + os.path.abspath(repo.working_directory)
+    cache = MirrorCache(os.path.join(directory, 'mirrors'))
+    clone = Git(os.path.join(directory, 'clone'))
+    clone.git_clone(source_url, cache=cache)
+
+    def change(path='file-00000.txt'):
+        with open(os.path.join(repo.working_directory, path), 'w') as f:
+            f.write('change %d\n' % next(numbers))
+
+    def new_directory():
+        return Git(tempfile.mkdtemp(dir=directory)),
+
+    def change_staged():
+        change()
+        repo.git_add('file-00000.txt')
+
+    def change_all():
+        for path in paths:
+            change(path)
+        return paths,
+
+    def read_head():
+        with repo.cat_file() as objects:
+            objects.read('HEAD')
+
+    def commit():
+        repo._git('commit', '--quiet', '--allow-empty', '-m', 'push %d' % next(numbers))
+
+    cases = [
+        ('Git.git_init', lambda new_repo: new_repo.git_init(), new_directory),
+        ('Git.git_status', repo.git_status, None),
+        ('Git.status', repo.status, None),
+        ('Git.iter_status', lambda: list(repo.iter_status()), None),
+        ('Git.git_add', lambda: repo.git_add('file-00000.txt'), change),
+        ('Git.git_add_all', repo.git_add_all, change),
+        ('Git.git_commit', lambda: repo.git_commit('git_commit'), change_staged),
+        ('Git.git_commit_all', lambda: repo.git_commit_all('git_commit_all'), change),
+        ('Git.git_commit_files', lambda changed: repo.git_commit_files(changed, 'git_commit_files'), change_all),
+        ('Git.cat_file', read_head, None),
+        ('Git.git_add_remote', lambda name: repo.git_add_remote(remote, name), lambda: ('remote-%d' % next(numbers),)),
+        ('Git.git_get_remote_url', repo.git_get_remote_url, None),
+        ('Git.git_push_remote', lambda: repo.git_push_remote(branch=branch), commit),
+        ('Git.git_clone', lambda new_repo: new_repo.git_clone(source_url, cache=cache), new_directory),
+        ('Git.git_fetch', lambda: clone.git_fetch(cache=cache), commit),
+    ]
+    return repo, cases
+
+
+def bench_methods(iterations=200, latency=0.0, payload_size=1000, error_rate=0.0):
+    """Measure every public method of Jira, BitBucket and Git with measure.
+
+    Jira and BitBucket run against a stub server in a child process; Git runs against temporary repositories.
+
+    :param iterations: Number of timed calls per method.
+    :type iterations: int
+    :param latency: Seconds the stub server sleeps before answering each request.
+    :type latency: float
+    :param payload_size: Description length of the issues seeded in the stub server.
+    :type payload_size: int
+    :param error_rate: Fraction of requests the stub server answers with 500.
+    :type error_rate: float
+    :return: Result of measure by method name (i.e. 'Jira.get_issues').
+    :rtype: dict[str, dict]
+    """
+
+    results = {}
+    directory = tempfile.mkdtemp(prefix='atlassian-bench-')
+    repo = None
+    try:
+        with stub_process(latency=latency, issue_count=100, repo_count=30, branch_count=30, payload_size=payload_size,
+                          error_rate=error_rate, seed=0) as base_http_url:
+            jira = Jira(base_http_url, 'PROJ', auth=('user', 'password'))
+            bitbucket = BitBucket(base_http_url, 'PROJ', transport=jira.transport)
+            for name, call, setup in jira_cases(jira, directory) + bitbucket_cases(bitbucket):
+                results[name] = measure(call, iterations, setup)
+            jira.transport.close()
+
+        repo, cases = git_cases(directory)
+        for name, call, setup in cases:
+            results[name] = measure(call, iterations, setup)
+    finally:
+        shutil.rmtree(directory)
+        if repo is not None:
+            shutil.rmtree(repo.working_directory)
+    return results
+
+
+def regressions(results, baseline, tolerance=0.25):
+    """Compare bench_methods results against a baseline run.
+
+    :param results: Results of bench_methods.
+    :type results: dict[str, dict]
+    :param baseline: Results of an earlier bench_methods run.
+    :type baseline: dict[str, dict]
+    :param tolerance: Allowed relative growth of p50_ms, p99_ms and peak_kilobytes (0.25 allows 25 %).
+    :type tolerance: float
+    :return: Descriptions of the measurements that grew more than tolerance.
+    :rtype: list[str]
+    """
+
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'peak_kilobytes'):
+            before, after = baseline[name][metric], result[metric]
+            if after > before * (1 + tolerance):
+                found.append('%s %s: %.3f -> %.3f' % (name, metric, before, after))
+    return found
+
+
+SUITES = ('methods', 'transport', 'coalescing', 'models', 'codec', 'git')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Jira, BitBucket and Git clients.')
+    parser.add_argument('suites', nargs='*', help='suites to run: ' + ', '.join(SUITES) + ' (default: all)')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per method')
+    parser.add_argument('--latency', type=float, default=0.0, help='stub server latency in seconds')
+    parser.add_argument('--payload-size', type=int, default=1000, help='description length of stub issues')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub requests failing with 500')
+    parser.add_argument('--json', help='write the per method results to this file')
+    parser.add_argument('--baseline', help='per method results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error('unknown suites: ' + ', '.join(unknown) + ' (choose from ' + ', '.join(SUITES) + ')')
+    suites = args.suites or list(SUITES)
+
+    if 'methods' in suites:
+        results = bench_methods(args.iterations, args.latency, args.payload_size, args.error_rate)
+        print('%-28s %10s %9s %9s %10s %6s' % ('method', 'calls/s', 'p50 ms', 'p99 ms', 'peak KB', 'errors'))
+        for name, result in results.items():
+            row = (name, result['calls_per_second'], result['p50_ms'], result['p99_ms'], result['peak_kilobytes'],
+                   result['errors'])
+            print('%-28s %10.1f %9.3f %9.3f %10.1f %6d' % row)
+        missing = set(public_methods(Jira) + public_methods(BitBucket) + public_methods(Git)) - set(results)
+        if missing:
+            print('not benchmarked: ' + ', '.join(sorted(missing)))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                found = regressions(results, json.load(f))
+            for regression in found:
+                print('regression: ' + regression)
+            if found:
+                sys.exit(1)
+
+    if 'transport' in suites:
+        print('get_issues(issue_id=...) loop')
+        for name, result in bench_transport().items():
+            row = (name, result['requests_per_second'], result['connections'])
+            print('  %-28s %8.1f req/s  %5d connections' % row)
+
+    if 'coalescing' in suites:
+        print('32 workers asking for the same resources at once, 20 rounds')
+        for name, result in bench_coalescing().items():
+            row = (name, result['server_requests'], result['seconds'], result['coalesced'])
+            print('  %-28s %5d server requests %8.3f s %5d coalesced' % row)
+
+    if 'models' in suites:
+        print('100k decoded issues')
+        for name, result in bench_issue_models().items():
+            print('  %-28s %8.1f MB' % (name, result['megabytes']))
+
+    if 'codec' in suites:
+        print('decoding a 5000 issue search page')
+        for name, result in bench_codec().items():
+            print('  %-28s %8.1f MB/s %8.1f MB peak' % (name, result['megabytes_per_second'], result['peak_megabytes']))
+        print('search over 2000 issues')
+        for name, result in bench_compression().items():
+            print('  %-28s %8.3f s %10d bytes received' % (name, result['seconds'], result['bytes_received']))
+
+    if 'git' in suites:
+        print('git with 2000 generated files')
+        for name, seconds in bench_git().items():
+            print('  %-32s %8.3f s' % (name, seconds))
+
+
+if __name__ == '__main__':
+    main()
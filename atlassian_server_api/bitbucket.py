@@ -1,5 +1,6 @@
-import requests
-import json
+from atlassian_server_api.codec import decode_response, dumps
+from atlassian_server_api.pagination import iter_paged, bitbucket_next_start
+from atlassian_server_api.transport import Transport
 
 
 class BitBucket:
@@ -17,8 +18,8 @@ class BitBucket:
     https://stash.atlassian.com/rest/api/1.0/projects/JIRA/repos/jira/commits
     """
 
-    def __init__(self, base_http_url, project_key, auth):
-        """Initialize BitBucket object with base_http_url, project_key, and auth.
+    def __init__(self, base_http_url, project_key, auth=None, transport=None):
+        """Initialize BitBucket object with base_http_url, project_key, and auth or a shared transport.
 
         :param base_http_url: URL for BitBucket site - http://host:port/ (i.e. http://localhost:7990/)
         :type base_http_url: str
@@ -26,10 +27,14 @@ class BitBucket:
         :type project_key: str
         :param auth: Tuple of username and password for authentication.
         :type auth: tuple[str, str]
+        :param transport: Pooled transport to send requests through. Pass the same transport to several clients to
+            share one connection pool. When omitted a new Transport is created with auth.
+        :type transport: atlassian_server_api.transport.Transport
         """
         self.base_http_url = base_http_url
         self.project_key = project_key
-        self.auth = auth
+        self.transport = transport if transport is not None else Transport(auth=auth)
+        self.auth = auth if auth is not None else self.transport.auth
 
     def create_repo(self, repo_name):
         """Create a new repository.
@@ -60,9 +65,29 @@ class BitBucket:
         }
 
         # POST request
-        return requests.post(url, auth=self.auth, headers=headers, data=json.dumps(data))
+        return self.transport.post(url, headers=headers, data=dumps(data))
 
-    def get_repos(self, limit=10, start_at=0):
+    def get_repo(self, repo_slug):
+        """Retrieve the repository matching the supplied repository slug.
+
+        The authenticated user must have REPO_READ permission for the specified repository to call this resource.
+
+        :param repo_slug: Slug of repository to get (i.e. "my-repo").
+        :type repo_slug: str
+        :return:
+            200 - application/json (repository)
+            401 - application/json (errors)
+            404 - application/json (errors)
+        :rtype: requests.Response
+        """
+
+        url = self.base_http_url + 'rest/api/1.0/projects/' + self.project_key + '/repos/' + repo_slug
+        headers = {'Content-Type': 'application/json'}
+
+        # GET request
+        return self.transport.get(url, headers=headers)
+
+    def get_repos(self, limit=10, start_at=0, stream=False):
         """Retrieve repositories from the project corresponding to the supplied projectKey.
 
         This is a paged API. This API can also be invoked via a user-centric URL when addressing repositories in
@@ -74,6 +99,9 @@ class BitBucket:
         :type limit: int
         :param start_at: Item that should be used as the first item in the page of results.
         :type start_at: int
+        :param stream: Do not download the body until it is read (i.e. by codec.decode_response, which decodes it
+            while it is downloaded).
+        :type stream: bool
         :return:
             200 - application/json (repository)
             401 - application/json (errors)
@@ -83,11 +111,11 @@ class BitBucket:
 
         # create BitBucket repo
         url = self.base_http_url + 'rest/api/1.0/projects/' + self.project_key + '/repos/?limit=' + str(limit) + \
-                                   '&startAt' + str(start_at)
+                                   '&start=' + str(start_at)
         headers = {'Content-Type': 'application/json'}
 
         # GET request
-        return requests.get(url, auth=self.auth, headers=headers)
+        return self.transport.get(url, headers=headers, stream=stream)
 
     def branch_repo(self, repo_name, branch_name):
         """Creates a branch using the information provided in the {@link RestCreateBranchRequest request}
@@ -115,9 +143,9 @@ class BitBucket:
         }
 
         # POST request
-        return requests.post(url, auth=self.auth, headers=headers, data=json.dumps(data))
+        return self.transport.post(url, headers=headers, data=dumps(data))
 
-    def get_repo_branches(self, repo_name):
+    def get_repo_branches(self, repo_name, limit=25, start_at=0, stream=False):
         """Retrieve the branches of the repository.
 
         This is a paged API. This API can also be invoked via a user-centric URL when addressing repositories in
@@ -127,6 +155,13 @@ class BitBucket:
 
         :param repo_name: Name of repository to get branches (i.e. "my_repo").
         :type repo_name: str
+        :param limit: Number of branches to get.
+        :type limit: int
+        :param start_at: Item that should be used as the first item in the page of results.
+        :type start_at: int
+        :param stream: Do not download the body until it is read (i.e. by codec.decode_response, which decodes it
+            while it is downloaded).
+        :type stream: bool
         :return:
             200 - application/json (repository)
             401 - application/json (errors)
@@ -135,8 +170,53 @@ class BitBucket:
         """
 
         # create BitBucket repo
-        url = self.base_http_url + 'rest/api/1.0/projects/' + self.project_key + '/repos/' + repo_name + '/branches'
+        url = self.base_http_url + 'rest/api/1.0/projects/' + self.project_key + '/repos/' + repo_name + \
+            '/branches?limit=' + str(limit) + '&start=' + str(start_at)
         headers = {'Content-Type': 'application/json'}
 
         # GET request
-        return requests.get(url, auth=self.auth, headers=headers)
+        return self.transport.get(url, headers=headers, stream=stream)
+
+    def iter_repos(self, page_size=25):
+        """Iterate over all repositories of the project, one repository at a time.
+
+        Pages are requested with get_repos and followed through isLastPage/nextPageStart. The next page is fetched in
+        the background while the current one is consumed, and no more than two pages are held in memory.
+
+        :param page_size: Number of repos to request per page.
+        :type page_size: int
+        :return: Generator of repositories.
+        :rtype: collections.abc.Iterator[dict]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        def fetch_page(start):
+            stream = self.transport.stream_pages
+            r = self.get_repos(limit=page_size, start_at=start, stream=stream)
+            r.raise_for_status()
+            return decode_response(r, stream)
+
+        return iter_paged(fetch_page, 'values', bitbucket_next_start)
+
+    def iter_branches(self, repo_name, page_size=25):
+        """Iterate over all branches of the repository, one branch at a time.
+
+        Pages are requested with get_repo_branches and followed through isLastPage/nextPageStart. The next page is
+        fetched in the background while the current one is consumed.
+
+        :param repo_name: Name of repository to get branches (i.e. "my_repo").
+        :type repo_name: str
+        :param page_size: Number of branches to request per page.
+        :type page_size: int
+        :return: Generator of branches.
+        :rtype: collections.abc.Iterator[dict]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        def fetch_page(start):
+            stream = self.transport.stream_pages
+            r = self.get_repo_branches(repo_name, limit=page_size, start_at=start, stream=stream)
+            r.raise_for_status()
+            return decode_response(r, stream)
+
+        return iter_paged(fetch_page, 'values', bitbucket_next_start)
@@ -0,0 +1,252 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from requests.structures import CaseInsensitiveDict
+from atlassian_server_api.codec import dumps, loads
+from atlassian_server_api.transport import build_response
+
+# resources listing issues across the project, changed by any write to an issue
+SEARCH_PATHS = ('/rest/api/2/search',)
+
+
+class MemoryCacheBackend:
+    """In-memory storage for ResponseCache, evicting the least recently used entry beyond max_entries."""
+
+    def __init__(self, max_entries=1024):
+        """Initialize MemoryCacheBackend with its size bound.
+
+        :param max_entries: Maximum number of entries kept.
+        :type max_entries: int
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def keys(self):
+        return list(self._entries)
+
+
+class DiskCacheBackend:
+    """On-disk storage for ResponseCache, one file per entry in directory.
+
+    Entries survive restarts. The least recently used entries (by file modification time, refreshed on every read) are
+    deleted beyond max_entries. The directory is meant to be used by one process at a time.
+
+    A file holds a JSON line with the key and response metadata followed by the raw response body, so nothing read from
+    the directory is executed (unlike pickle). Files that cannot be read are deleted.
+    """
+
+    def __init__(self, directory, max_entries=10000):
+        """Initialize DiskCacheBackend with its directory and size bound.
+
+        :param directory: Directory holding the cache files. Created if missing.
+        :type directory: str
+        :param max_entries: Maximum number of entries kept.
+        :type max_entries: int
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> file path, loaded once so invalidation does not read every file
+        self._index = {}
+        for name in os.listdir(directory):
+            if name.endswith('.cache'):
+                path = os.path.join(directory, name)
+                try:
+                    with open(path, 'rb') as f:
+                        self._index[loads(f.readline())['key']] = path
+                except (OSError, ValueError, KeyError, TypeError):
+                    os.remove(path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                metadata = loads(f.readline())
+                if metadata['key'] != key:
+                    return None
+                entry = dict(metadata['entry'], content=f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        os.utime(path)
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        temp_path = path + '.tmp'
+        metadata = {'key': key, 'entry': {name: value for name, value in entry.items() if name != 'content'}}
+        with open(temp_path, 'wb') as f:
+            # compact JSON escapes newlines, so the metadata is exactly the first line
+            f.write(dumps(metadata) + b'\n')
+            f.write(entry['content'])
+        os.replace(temp_path, path)
+        self._index[key] = path
+
+        if len(self._index) > self.max_entries:
+            by_age = sorted(self._index.items(), key=lambda item: self._mtime(item[1]))
+            for old_key, _ in by_age[:len(self._index) - self.max_entries]:
+                self.delete(old_key)
+
+    def delete(self, key):
+        path = self._index.pop(key, self._path(key))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def keys(self):
+        return list(self._index)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.cache')
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+
+class ResponseCache:
+    """Opt-in cache for GET requests sent through a Transport.
+
+    Responses are reused for ttl seconds. After that, responses carrying an ETag or Last-Modified header are revalidated
+    with If-None-Match/If-Modified-Since, so an unchanged resource costs a 304 response instead of a full JSON body.
+    Writes (POST, PUT, DELETE) through the same transport invalidate cached entries of the resource they change, of its
+    parent collection and of Jira searches (i.e. adding an attachment to PROJ-1 invalidates .../issue/PROJ-1 and
+    .../search, but not .../issue/PROJ-2).
+
+    cache = ResponseCache(ttl=30, max_entries=5000)
+    jira = Jira(jira_url, project_id, transport=Transport(auth=auth, cache=cache))
+    """
+
+    def __init__(self, ttl=60, max_entries=1024, backend=None):
+        """Initialize ResponseCache with entry lifetime and storage.
+
+        :param ttl: Seconds a response is reused before it is revalidated.
+        :type ttl: float
+        :param max_entries: Maximum number of entries of the default in-memory backend.
+        :type max_entries: int
+        :param backend: Storage for entries (MemoryCacheBackend or DiskCacheBackend). Defaults to memory.
+        :type backend: MemoryCacheBackend | DiskCacheBackend
+        """
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Counters of responses served from the cache (hits), fetched in full (misses) and revalidated with a 304.
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations}
+
+    def get(self, url, send, headers=None):
+        """Return the response for url, from the cache when possible.
+
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param send: Callable taking the request headers and sending the GET request.
+        :type send: callable
+        :param headers: Request headers.
+        :type headers: dict
+        :rtype: requests.Response
+        """
+
+        with self._lock:
+            entry = self.backend.get(url)
+            if entry is not None and time.time() - entry['stored_at'] < self.ttl:
+                self.hits += 1
+                return self._response(entry)
+
+        headers = dict(headers or {})
+        if entry is not None:
+            # header names are case-insensitive (HTTP/2 and many proxies send them in lowercase)
+            stored = CaseInsensitiveDict(entry['headers'])
+            if 'ETag' in stored:
+                headers['If-None-Match'] = stored['ETag']
+            if 'Last-Modified' in stored:
+                headers['If-Modified-Since'] = stored['Last-Modified']
+
+        r = send(headers)
+
+        with self._lock:
+            if entry is not None and r.status_code == 304:
+                self.revalidations += 1
+                updated = CaseInsensitiveDict(entry['headers'])
+                updated.update(r.headers)
+                entry['headers'] = dict(updated)
+                entry['stored_at'] = time.time()
+                self.backend.set(url, entry)
+                return self._response(entry)
+
+            self.misses += 1
+            if r.status_code == 200:
+                self.backend.set(url, {
+                    'status_code': r.status_code,
+                    'reason': r.reason,
+                    'headers': dict(r.headers),
+                    'content': r.content,
+                    'url': r.url,
+                    'stored_at': time.time()
+                })
+            else:
+                self.backend.delete(url)
+        return r
+
+    def invalidate(self, url):
+        """Drop cached entries of the resource at url, of its parent collection and of searches on the same server.
+
+        :param url: Absolute URL of the changed resource (the query string is ignored).
+        :type url: str
+        """
+
+        changed = self._resource(url)
+        parent = changed.rsplit('/', 1)[0]
+        server = urlsplit(url).netloc
+        with self._lock:
+            for key in self.backend.keys():
+                cached = self._resource(key)
+                search = urlsplit(key).netloc == server and cached.endswith(SEARCH_PATHS)
+                if cached in (changed, parent) or search:
+                    self.backend.delete(key)
+
+    def clear(self):
+        """Drop all cached entries."""
+
+        with self._lock:
+            for key in self.backend.keys():
+                self.backend.delete(key)
+
+    @staticmethod
+    def _resource(url):
+        parts = urlsplit(url)
+        return parts.scheme + '://' + parts.netloc + parts.path.rstrip('/')
+
+    @staticmethod
+    def _response(entry):
+        return build_response(entry['status_code'], entry['headers'], entry['content'], entry['url'], entry['reason'])
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+
+    The first caller of a key runs the call; callers of the same key arriving while it is in flight wait for it and
+    receive the same result (or exception) instead of running their own. Once the call finishes the key is forgotten,
+    so results are never cached. Pass a SingleFlight to Transport or AsyncTransport to coalesce identical concurrent
+    GET requests:
+
+    single_flight = SingleFlight()
+    jira = Jira(jira_url, project_id, transport=Transport(auth=auth, single_flight=single_flight))
+    ... many threads calling jira.get_issues('PROJ-1') at once send one request ...
+    single_flight.stats()  # {'executions': 1, 'coalesced': 31}
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Counters of calls run (executions) and calls that waited for an identical call instead (coalesced).
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {'executions': self.executions, 'coalesced': self.coalesced}
+
+    def do(self, key, function):
+        """Run function, or wait for the in-flight call of the same key.
+
+        :param key: Hashable identity of the call.
+        :param function: Callable run by the first caller of key.
+        :type function: callable
+        :return: Return value of function.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, function):
+        """Asynchronous counterpart of do.
+
+        The call runs in its own task, so cancelling one waiter (even the first) does not cancel it for the others.
+
+        :param key: Hashable identity of the call.
+        :param function: Coroutine function run by the first caller of key.
+        :type function: callable
+        :return: Return value of function.
+        """
+
+        # tasks belong to one event loop
+        key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = self._tasks[key] = asyncio.ensure_future(function())
+                self.executions += 1
+                task.add_done_callback(lambda _: self._forget(key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key):
+        with self._lock:
+            del self._tasks[key]
+
+
+def request_key(transport, method, url, kwargs):
+    """Key of a GET request that can be coalesced, or None for requests that must be sent as they are.
+
+    Requests only share a key when they go through the same transport (so the same credentials), to the same URL, with
+    the same headers. Requests with a body, params or a streamed response are never coalesced.
+
+    :rtype: tuple
+    """
+
+    if method.upper() != 'GET' or any(kwargs.get(name) for name in ('data', 'json', 'files', 'params', 'stream')):
+        return None
+    return id(transport), url, tuple(sorted((kwargs.get('headers') or {}).items()))
@@ -0,0 +1,246 @@
+import codecs
+import gzip
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# characters that can follow a complete value
+DELIMITERS = frozenset(',]}: \t\n\r')
+JSON_LIBRARIES = ('orjson', 'ujson', 'json')
+
+_raw_decoder = json.JSONDecoder()
+
+
+def set_json_library(name=None):
+    """Choose the JSON library request bodies are encoded and responses decoded with.
+
+    By default the fastest installed library is used: orjson, then ujson, then the standard library json module.
+
+    :param name: 'orjson', 'ujson', 'json', or None for the fastest installed.
+    :type name: str
+    :return: Name of the library in use.
+    :rtype: str
+    :raises ImportError: If the library is not installed.
+    """
+
+    global json_library, _dumps, _loads
+
+    if name is None:
+        name = 'orjson' if orjson is not None else 'ujson' if ujson is not None else 'json'
+    if name not in JSON_LIBRARIES:
+        raise ValueError('Unknown JSON library: ' + str(name))
+
+    if name == 'orjson':
+        if orjson is None:
+            raise ImportError('orjson is not installed (pip install orjson).')
+        _dumps, _loads = orjson.dumps, orjson.loads
+    elif name == 'ujson':
+        if ujson is None:
+            raise ImportError('ujson is not installed (pip install ujson).')
+        _dumps, _loads = _ujson_dumps, ujson.loads
+    else:
+        _dumps, _loads = _json_dumps, json.loads
+    json_library = name
+    return name
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+json_library = _dumps = _loads = None
+set_json_library()
+
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON with the JSON library in use.
+
+    :rtype: bytes
+    """
+
+    return _dumps(obj)
+
+
+def loads(data):
+    """Decode a JSON document with the JSON library in use.
+
+    :param data: UTF-8 JSON document.
+    :type data: bytes | str
+    :raises ValueError: If data is not valid JSON.
+    """
+
+    return _loads(data)
+
+
+def decode_response(r, stream=False, chunk_size=64 * 1024):
+    """Decode the JSON body of a response.
+
+    A response requested with stream=True is decoded while it is downloaded (see decode_chunks), so its raw body is
+    never held in memory next to the decoded objects. Otherwise the body is decoded at once with the JSON library in
+    use.
+
+    :param r: Response with a JSON body.
+    :type r: requests.Response
+    :param stream: The response was requested with stream=True and its body was not read yet.
+    :type stream: bool
+    :param chunk_size: Bytes read at a time from a streamed response.
+    :type chunk_size: int
+    :rtype: dict | list
+    :raises ValueError: If the body is not valid JSON.
+    """
+
+    if stream:
+        try:
+            return decode_chunks(r.iter_content(chunk_size))
+        finally:
+            r.close()
+    return loads(r.content)
+
+
+def decode_chunks(chunks):
+    """Decode a JSON document from an iterable of UTF-8 byte chunks, reading the chunks as it goes.
+
+    The arrays directly in a top level object (i.e. the issues of a Jira page or the values of a BitBucket page) are
+    decoded one element at a time, so only the decoded objects and the chunks of the element being decoded are held in
+    memory. Other values are decoded whole.
+
+    :param chunks: Byte chunks of the document (i.e. requests.Response.iter_content()).
+    :type chunks: collections.abc.Iterable[bytes]
+    :rtype: dict | list
+    :raises ValueError: If the document is not valid JSON.
+    """
+
+    reader = _ChunkReader(chunks)
+    if reader.peek() != '{':
+        document = reader.value()
+    else:
+        reader.take('{')
+        document = {}
+        if reader.peek() == '}':
+            reader.take('}')
+        else:
+            while True:
+                if reader.peek() != '"':
+                    raise reader.error('Expecting property name enclosed in double quotes')
+                key = reader.value()
+                reader.take(':')
+                document[key] = reader.array() if reader.peek() == '[' else reader.value()
+                if reader.take(',', '}') == '}':
+                    break
+    if reader.peek() != '':
+        raise reader.error('Extra data')
+    return document
+
+
+class _ChunkReader:
+    """JSON text read from byte chunks, with the position of the next character to decode."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def read(self, size):
+        """Append at least size characters (unless the chunks run out), dropping the text already decoded."""
+
+        parts = [self.text[self.pos:]]
+        target = len(parts[0]) + size
+        length = len(parts[0])
+        while length < target:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                parts.append(self.decoder.decode(b'', final=True))
+                self.exhausted = True
+                break
+            parts.append(self.decoder.decode(chunk))
+            length += len(parts[-1])
+        self.text = ''.join(parts)
+        self.pos = 0
+
+    def peek(self):
+        """Next character after whitespace, or '' at the end of the document."""
+
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or self.exhausted:
+                return self.text[self.pos:self.pos + 1]
+            self.read(1)
+
+    def take(self, *expected):
+        char = self.peek()
+        if char not in expected or not char:
+            raise self.error('Expecting ' + ' or '.join(repr(c) for c in expected))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _raw_decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+                # the value continues in the next chunks: at least double the text before decoding it again
+                self.read(max(len(self.text) - self.pos, 1))
+                continue
+            # a number may continue in the next chunk (i.e. '1.' + '5'): it is only complete once a delimiter follows
+            if not self.exhausted and (end == len(self.text) or isinstance(value, (int, float)) and
+                                       self.text[end] not in DELIMITERS):
+                self.read(1)
+                continue
+            self.pos = end
+            return value
+
+    def array(self):
+        self.take('[')
+        items = []
+        if self.peek() == ']':
+            self.take(']')
+            return items
+        while True:
+            items.append(self.value())
+            if self.take(',', ']') == ']':
+                return items
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.text, self.pos)
+
+
+def compress_body(kwargs, min_size):
+    """Request arguments with the body gzip compressed, if it is bytes or str of at least min_size bytes.
+
+    :param kwargs: Request arguments (data, headers, ...).
+    :type kwargs: dict
+    :param min_size: Smallest body compressed, in bytes (None to never compress).
+    :type min_size: int
+    :rtype: dict
+    """
+
+    data = kwargs.get('data')
+    headers = kwargs.get('headers') or {}
+    if min_size is None or not isinstance(data, (bytes, str)) or 'Content-Encoding' in headers:
+        return kwargs
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if len(data) < min_size:
+        return kwargs
+    headers = dict(headers)
+    headers['Content-Encoding'] = 'gzip'
+    return dict(kwargs, data=gzip.compress(data, compresslevel=6), headers=headers)
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from atlassian_server_api.git import Git
+
+
+class GitFleet:
+    """Run Git operations across many working directories in parallel.
+
+    Each working directory gets its own Git object. Operations run on a bounded thread pool (the work happens in git
+    subprocesses), every git command is killed after timeout seconds, and the outcome is collected per repository, so
+    one slow or failing repository never stops the others. The timeout applies to each git command, not to a whole
+    operation: a callable running several commands may take up to that many times timeout.
+
+    fleet = GitFleet(['/src/service-a', '/src/service-b'], max_workers=16, timeout=120)
+    results = fleet.git_push_remote()
+    failed = [path for path, result in results.items() if not result['ok']]
+    """
+
+    def __init__(self, working_directories, max_workers=8, timeout=None, instrumentation=None):
+        """Initialize GitFleet with the working directories and execution limits.
+
+        :param working_directories: Paths to the working directories of the repositories. Results are keyed by these
+            paths, so each repository must be listed once.
+        :type working_directories: list[str]
+        :param max_workers: Number of repositories processed at the same time.
+        :type max_workers: int
+        :param timeout: Seconds after which a git command of a repository is killed (None to wait indefinitely). Each
+            command of an operation gets the full timeout.
+        :type timeout: float
+        :param instrumentation: Receives an event for every git command.
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
+        :raises ValueError: If a working directory is listed more than once.
+        """
+        working_directories = list(working_directories)
+        seen = set()
+        for working_directory in working_directories:
+            path = os.path.abspath(working_directory)
+            if path in seen:
+                raise ValueError('Working directory ' + working_directory + ' is listed more than once.')
+            seen.add(path)
+        self.repos = [Git(working_directory, timeout=timeout, instrumentation=instrumentation)
+                      for working_directory in working_directories]
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def run(self, operation, *args, **kwargs):
+        """Run an operation on every repository.
+
+        :param operation: Name of a Git method (i.e. 'git_add_all'), or a callable taking the Git object of a
+            repository.
+        :type operation: str | callable
+        :param args: Positional arguments passed to the Git method.
+        :param kwargs: Keyword arguments passed to the Git method.
+        :return: Result of every repository, by working directory, in the order of working_directories:
+            {'ok': True, 'output': '...', 'error': None, 'seconds': 0.02}
+        :rtype: dict[str, dict]
+        """
+
+        if isinstance(operation, str):
+            name = operation
+
+            def operation(repo):
+                return getattr(repo, name)(*args, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(repo.working_directory, executor.submit(self._run_one, operation, repo)) for repo in self.repos]
+            return {working_directory: future.result() for working_directory, future in futures}
+
+    @staticmethod
+    def _run_one(operation, repo):
+        start = time.perf_counter()
+        result = {'ok': False, 'output': None, 'error': None, 'seconds': None}
+        try:
+            result['output'] = operation(repo)
+            result['ok'] = True
+        except subprocess.CalledProcessError as e:
+            message = e.stderr or e.output or b''
+            if isinstance(message, bytes):
+                message = message.decode('utf-8', 'replace')
+            result['error'] = 'git exited with status %d: %s' % (e.returncode, message.strip())
+        except subprocess.TimeoutExpired as e:
+            result['error'] = 'git timed out after %s seconds: %s' % (e.timeout, ' '.join(e.cmd))
+        except Exception as e:
+            result['error'] = '%s: %s' % (type(e).__name__, e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def git_init(self):
+        """Create an empty Git repository in every working directory.
+
+        :rtype: dict[str, dict]
+        """
+
+        return self.run('git_init')
+
+    def git_add_all(self):
+        """Add all files to the staging area of every repository.
+
+        :rtype: dict[str, dict]
+        """
+
+        return self.run('git_add_all')
+
+    def git_commit_all(self, message):
+        """Stage and commit the tracked changes of every repository.
+
+        :param message: A log message describing the changes
+        :type message: str
+        :rtype: dict[str, dict]
+        """
+
+        return self.run('git_commit_all', message)
+
+    def git_add_remote(self, remote_urls, remote_name='origin'):
+        """Add a remote to every repository.
+
+        :param remote_urls: URL of the remote of each repository, by working directory, or a callable taking the
+            working directory and returning the URL.
+        :type remote_urls: dict[str, str] | callable
+        :param remote_name: Name of the remote repository (i.e. 'origin')
+        :type remote_name: str
+        :rtype: dict[str, dict]
+        """
+
+        url_of = remote_urls if callable(remote_urls) else remote_urls.__getitem__
+        return self.run(lambda repo: repo.git_add_remote(url_of(repo.working_directory), remote_name))
+
+    def git_push_remote(self, remote_name='origin', branch='master'):
+        """Push branch of every repository to its remote.
+
+        :param remote_name: Name of the remote repository (i.e. 'origin')
+        :type remote_name: str
+        :param branch: Name of the remote branch to push to (i.e. 'master')
+        :type branch: str
+        :rtype: dict[str, dict]
+        """
+
+        return self.run('git_push_remote', remote_name, branch)
@@ -1,4 +1,10 @@
+import os
+import stat
 import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
 
 
 class Git:
@@ -7,14 +13,41 @@ class Git:
 
     """
 
-    def __init__(self, working_directory):
+    def __init__(self, working_directory, timeout=None, instrumentation=None):
         """Set working_directory where the git repository will reside.
 
         :param working_directory: Path to the working_directory where the git repository will reside.
         :type working_directory: str
+        :param timeout: Seconds after which a git command is killed (None to wait indefinitely).
+        :type timeout: float
+        :param instrumentation: Receives an event for every git command.
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
         """
 
         self.working_directory = working_directory
+        self.timeout = timeout
+        self.instrumentation = instrumentation
+
+    def _git(self, *args, input=None):
+        """Run a git command in the working_directory and return its stdout.
+
+        :param args: Arguments passed to git (i.e. 'add', '--all').
+        :param input: Bytes written to the stdin of the process.
+        :type input: bytes
+        :return: stdout of the process
+        :rtype: str
+        :raises subprocess.CalledProcessError: If git exits with a non-zero status (its stderr attribute holds git's
+            error message).
+        :raises subprocess.TimeoutExpired: If git runs longer than timeout.
+        """
+
+        def run():
+            return subprocess.check_output(('git',) + args, cwd=self.working_directory, input=input,
+                                           stderr=subprocess.PIPE, timeout=self.timeout)
+
+        if self.instrumentation is None:
+            return run().decode("utf-8")
+        return self.instrumentation.git(self.working_directory, args, input, run).decode("utf-8")
 
     def git_init(self):
         """This command creates an empty Git repository in the working_directory path.
@@ -23,19 +56,27 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'init', self.working_directory], cwd=self.working_directory)\
-            .decode("utf-8")
+        return self._git('init', self.working_directory)
 
     def git_add(self, file_path):
-        """Add a file to the staging area by using the "git add" command.
+        """Add a file, or many files at once, to the staging area by using the "git add" command.
 
-        :param file_path:
-        :type file_path: str
+        A list of paths is staged by one git process: the paths are passed literally over stdin
+        (--pathspec-from-file) instead of one process or command line argument per file.
+
+        :param file_path: Path (or pathspec) of the file, or a list of paths relative to the working_directory.
+        :type file_path: str | list[str]
         :return: stdout of the process or error codes
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'add', file_path], cwd=self.working_directory).decode("utf-8")
+        if isinstance(file_path, str):
+            return self._git('add', file_path)
+
+        paths = b'\0'.join(os.fsencode(path) for path in file_path)
+        if not paths:
+            return ''
+        return self._git('--literal-pathspecs', 'add', '--pathspec-from-file=-', '--pathspec-file-nul', input=paths)
 
     def git_add_all(self):
         """Add all files to the staging area by using the "git add --all" command.
@@ -44,8 +85,7 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'add', '--all', self.working_directory], cwd=self.working_directory)\
-            .decode("utf-8")
+        return self._git('add', '--all', self.working_directory)
 
     def git_status(self):
         """Get all paths hat have differences since last commit or that are not tracked by Git.
@@ -58,8 +98,115 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'status', self.working_directory], cwd=self.working_directory)\
-            .decode("utf-8")
+        return self._git('status', self.working_directory)
+
+    def status(self, untracked='normal', ignored=False, renames=True, untracked_cache=None, fsmonitor=None,
+               paths=None):
+        """Get the status of the working tree as typed entries, grouped by kind of change.
+
+        Built on "git status --porcelain=v2 -z", so paths need no unquoting and nothing depends on the language or
+        format of the human readable output. An entry staged and also changed in the working tree is in both staged and
+        unstaged.
+
+        :param untracked: Untracked files to list: 'normal' (directories are not expanded), 'all' or 'no'.
+        :type untracked: str
+        :param ignored: List ignored files too.
+        :type ignored: bool
+        :param renames: Detect renames (costly on large trees).
+        :type renames: bool
+        :param untracked_cache: Force the untracked cache on or off for this command (None keeps the configuration).
+        :type untracked_cache: bool
+        :param fsmonitor: Force the file system monitor on or off for this command, or the path of a fsmonitor hook
+            (None keeps the configuration).
+        :type fsmonitor: bool | str
+        :param paths: Only report these paths (pathspecs relative to the working_directory).
+        :type paths: list[str]
+        :return: {'staged': [StatusEntry, ...], 'unstaged': [...], 'untracked': [...], 'conflicted': [...],
+            'ignored': [...]}
+        :rtype: dict[str, list[StatusEntry]]
+        """
+
+        result = {'staged': [], 'unstaged': [], 'untracked': [], 'conflicted': [], 'ignored': []}
+        for entry in self.iter_status(untracked, ignored, renames, untracked_cache, fsmonitor, paths):
+            if entry.staged:
+                result['staged'].append(entry)
+            if entry.unstaged:
+                result['unstaged'].append(entry)
+            if entry.kind in ('untracked', 'ignored'):
+                result[entry.kind].append(entry)
+            elif entry.conflicted:
+                result['conflicted'].append(entry)
+        return result
+
+    def iter_status(self, untracked='normal', ignored=False, renames=True, untracked_cache=None, fsmonitor=None,
+                    paths=None):
+        """Yield the status entries of the working tree as git emits them.
+
+        Takes the same arguments as status. The output of git is parsed while it is read, so the status of a tree of any
+        size is walked without holding the whole output or all entries in memory. Close the generator (or exhaust it)
+        to stop git.
+
+        :return: Generator of entries.
+        :rtype: collections.abc.Iterator[StatusEntry]
+        :raises subprocess.CalledProcessError: If git exits with a non-zero status.
+        :raises subprocess.TimeoutExpired: If git runs longer than timeout.
+        """
+
+        if untracked not in ('normal', 'all', 'no'):
+            raise ValueError('Unknown untracked mode: ' + str(untracked))
+
+        args = []
+        if untracked_cache is not None:
+            args += ['-c', 'core.untrackedCache=' + ('true' if untracked_cache else 'false')]
+        if fsmonitor is not None:
+            hook = fsmonitor if isinstance(fsmonitor, str) else 'true' if fsmonitor else 'false'
+            args += ['-c', 'core.fsmonitor=' + hook]
+        args += ['status', '--porcelain=v2', '-z', '--untracked-files=' + untracked,
+                 '--renames' if renames else '--no-renames']
+        if ignored:
+            args.append('--ignored')
+        if paths:
+            args += ['--'] + list(paths)
+
+        start = time.perf_counter()
+        # stderr goes to a file, not a pipe: git blocks once a pipe is full, and it is only read after stdout
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(['git'] + args, cwd=self.working_directory, stdout=subprocess.PIPE,
+                                   stderr=stderr_file)
+        timer = None
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, process.kill)
+            timer.start()
+        received = 0
+        completed = False
+        try:
+            records = _nul_separated(process.stdout)
+            for record in records:
+                received += len(record) + 1
+                entry = _status_entry(record, records)
+                if entry is not None:
+                    yield entry
+            completed = True
+        finally:
+            if not completed:
+                # the caller stopped early (or parsing failed): git may be blocked writing the rest
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            stderr_file.close()
+            timed_out = timer is not None and not timer.is_alive() and process.returncode < 0
+            if timer is not None:
+                timer.cancel()
+            if self.instrumentation is not None:
+                self.instrumentation.emit(self.instrumentation.git_event(
+                    self.working_directory, args, process.returncode, time.perf_counter() - start,
+                    bytes_received=received, error='TimeoutExpired' if timed_out else None))
+        if timed_out:
+            raise subprocess.TimeoutExpired(process.args, self.timeout, stderr=stderr)
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args, stderr=stderr)
 
     def git_commit(self, message):
         """Record changes to the repository
@@ -73,7 +220,7 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'commit',  '-m', message], cwd=self.working_directory).decode("utf-8")
+        return self._git('commit', '-m', message)
 
     def git_commit_all(self, message):
         """Staging the file and committing it in one step.
@@ -89,7 +236,7 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'commit', '-am', message], cwd=self.working_directory).decode("utf-8")
+        return self._git('commit', '-am', message)
 
     def git_add_remote(self, remote_url, remote_name='origin'):
         """Manage the set of repositories ("remotes") whose branches you track.
@@ -106,8 +253,21 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'remote', 'add', remote_name, remote_url], cwd=self.working_directory)\
-            .decode("utf-8")
+        return self._git('remote', 'add', remote_name, remote_url)
+
+    def git_get_remote_url(self, remote_name='origin'):
+        """Get the URL of a remote.
+
+        :param remote_name: Name of the remote repository (i.e. 'origin')
+        :type remote_name: str
+        :return: URL of the remote, or None if there is no such remote
+        :rtype: str
+        """
+
+        try:
+            return self._git('remote', 'get-url', remote_name).strip()
+        except subprocess.CalledProcessError:
+            return None
 
     def git_push_remote(self, remote_name='origin', branch='master'):
         """Update remote refs along with associated objects
@@ -123,5 +283,375 @@ class Git:
         :rtype: str
         """
 
-        return subprocess.check_output(['git', 'push', '-u', remote_name, branch], cwd=self.working_directory)\
-            .decode("utf-8")
+        return self._git('push', '-u', remote_name, branch)
+
+    def git_clone(self, remote_url, branch=None, depth=None, filter=None, sparse_paths=None, cache=None,
+                  dissociate=False):
+        """Clone a repository into the working_directory (created if missing, otherwise it must be empty).
+
+        With a cache, the mirror of remote_url is updated first and the clone is made with --reference to it: objects
+        already in the mirror are not transferred again, and are borrowed through alternates instead of copied.
+
+        :param remote_url: URL of the remote repository (i.e. https://host/scm/proj/repo.git or file:///srv/repo.git)
+        :type remote_url: str
+        :param branch: Branch checked out (the remote's default branch if None).
+        :type branch: str
+        :param depth: Create a shallow clone of this many commits.
+        :type depth: int
+        :param filter: Partial clone filter (i.e. 'blob:none' to fetch file contents only when checked out).
+        :type filter: str
+        :param sparse_paths: Only check out these directories (sparse checkout in cone mode).
+        :type sparse_paths: list[str]
+        :param cache: Cache of mirrors to clone with --reference to.
+        :type cache: atlassian_server_api.git_cache.MirrorCache
+        :param dissociate: Copy the borrowed objects from the mirror at the end of the clone, so the clone keeps working
+            after the mirror is evicted.
+        :type dissociate: bool
+        :return: stdout of the process or error codes
+        :rtype: str
+        """
+
+        os.makedirs(self.working_directory, exist_ok=True)
+        args = ['clone', '--quiet']
+        if branch is not None:
+            args += ['--branch', branch]
+        if depth is not None:
+            args += ['--depth', str(depth)]
+        if filter is not None:
+            args += ['--filter=' + filter]
+        if sparse_paths is not None:
+            args += ['--sparse']
+        if dissociate:
+            args += ['--dissociate']
+
+        if cache is None:
+            r = self._git(*args, remote_url, '.')
+        else:
+            with cache.use(remote_url) as mirror_path:
+                r = self._git(*args, '--reference', mirror_path, remote_url, '.')
+
+        if sparse_paths is not None:
+            r += self._git('sparse-checkout', 'set', '--cone', *sparse_paths)
+        return r
+
+    def git_fetch(self, remote_name='origin', depth=None, prune=True, cache=None):
+        """Download objects and refs from a remote repository.
+
+        With a cache, the mirror of the remote's URL is updated and the branches and tags are fetched from the mirror
+        into refs/remotes/<remote_name>/ and refs/tags/, so build agents sharing the cache fetch each remote once. Tags
+        moved on the remote are updated.
+
+        :param remote_name: Name of the remote repository (i.e. 'origin')
+        :type remote_name: str
+        :param depth: Limit the history fetched to this many commits from the tip of each branch.
+        :type depth: int
+        :param prune: Remove remote-tracking branches that no longer exist on the remote. Tags are not pruned, so local
+            tags missing on the remote are kept.
+        :type prune: bool
+        :param cache: Cache of mirrors to fetch from.
+        :type cache: atlassian_server_api.git_cache.MirrorCache
+        :return: stdout of the process or error codes
+        :rtype: str
+        """
+
+        args = ['fetch', '--quiet']
+        if depth is not None:
+            args += ['--depth', str(depth)]
+        if prune:
+            args += ['--prune']
+
+        if cache is None:
+            return self._git(*args, remote_name)
+
+        remote_url = self._git('remote', 'get-url', remote_name).strip()
+        with cache.use(remote_url) as mirror_path:
+            # --tags instead of a refs/tags/* refspec: --prune only deletes tags fetched through a refspec
+            return self._git(*args, '--tags', '--force', mirror_path,
+                             '+refs/heads/*:refs/remotes/' + remote_name + '/*')
+
+    def git_commit_files(self, file_paths, message, branch=None):
+        """Commit many files in one step through "git fast-import", without staging them one by one.
+
+        The files are read from the working_directory and streamed into a new commit on top of branch (the current
+        branch by default). Paths that no longer exist are deleted in the commit. Files not listed keep their content
+        from the parent commit. When branch is the checked out branch, the index entries of the committed paths are
+        refreshed afterwards with a single "git reset", so they do not show up as changed. The number of git processes
+        does not depend on the number of files.
+
+        :param file_paths: Paths of the files to commit, relative to the working_directory.
+        :type file_paths: list[str]
+        :param message: A log message from the user describing the changes
+        :type message: str
+        :param branch: Name of the branch to commit to (i.e. 'master'). Defaults to the current branch.
+        :type branch: str
+        :return: Hash of the new commit.
+        :rtype: str
+        :raises ValueError: If a path is outside the working_directory.
+        :raises subprocess.CalledProcessError: If git fails.
+        """
+
+        file_paths = list(file_paths)
+        for path in file_paths:
+            if os.path.isabs(path) or os.path.normpath(path).split(os.sep)[0] == '..':
+                raise ValueError('Path ' + path + ' is outside the working_directory.')
+
+        head = self._git('symbolic-ref', '--short', 'HEAD').strip()
+        branch = branch or head
+        ref = 'refs/heads/' + branch
+        try:
+            parent = self._git('rev-parse', '--verify', '--quiet', ref + '^{commit}').strip()
+        except subprocess.CalledProcessError:
+            parent = None
+        author = self._git('var', 'GIT_AUTHOR_IDENT').strip()
+        committer = self._git('var', 'GIT_COMMITTER_IDENT').strip()
+
+        start = time.perf_counter()
+        process = subprocess.Popen(['git', 'fast-import', '--quiet', '--done'], cwd=self.working_directory,
+                                   stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            out = process.stdin
+            message = message.encode('utf-8')
+            out.write(b'commit ' + ref.encode('utf-8') + b'\n')
+            out.write(b'author ' + author.encode('utf-8') + b'\n')
+            out.write(b'committer ' + committer.encode('utf-8') + b'\n')
+            out.write(b'data ' + str(len(message)).encode() + b'\n' + message + b'\n')
+            if parent:
+                out.write(b'from ' + parent.encode() + b'\n')
+            for path in file_paths:
+                self._fast_import_file(out, path)
+            out.write(b'\ndone\n')
+            out.close()
+        except BrokenPipeError:
+            # fast-import stopped early; its exit status and stderr tell why
+            pass
+        stderr = process.stderr.read()
+        process.stderr.close()
+        process.wait()
+        if self.instrumentation is not None:
+            self.instrumentation.emit(self.instrumentation.git_event(
+                self.working_directory, ('fast-import',), process.returncode, time.perf_counter() - start,
+                error='CalledProcessError' if process.returncode else None))
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args, stderr=stderr)
+
+        if branch == head:
+            paths = b'\0'.join(os.fsencode(path) for path in file_paths)
+            self._git('--literal-pathspecs', 'reset', '-q', '--pathspec-from-file=-', '--pathspec-file-nul',
+                      input=paths)
+
+        return self._git('rev-parse', ref).strip()
+
+    def _fast_import_file(self, out, path):
+        """Write the fast-import command adding, changing or deleting path."""
+
+        quoted = _fast_import_path(path)
+        full_path = os.path.join(self.working_directory, path)
+        try:
+            info = os.lstat(full_path)
+        except FileNotFoundError:
+            out.write(b'D ' + quoted + b'\n')
+            return
+
+        if stat.S_ISLNK(info.st_mode):
+            target = os.fsencode(os.readlink(full_path))
+            out.write(b'M 120000 inline ' + quoted + b'\ndata ' + str(len(target)).encode() + b'\n' + target + b'\n')
+            return
+
+        mode = b'100755' if info.st_mode & stat.S_IXUSR else b'100644'
+        out.write(b'M ' + mode + b' inline ' + quoted + b'\ndata ' + str(info.st_size).encode() + b'\n')
+        remaining = info.st_size
+        with open(full_path, 'rb') as f:
+            while remaining:
+                chunk = f.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise IOError('File ' + path + ' changed size while being committed.')
+                out.write(chunk)
+                remaining -= len(chunk)
+        out.write(b'\n')
+
+    def cat_file(self):
+        """Start a persistent "git cat-file --batch" reader for object lookups in this repository.
+
+        Use it as a context manager so the git process is stopped afterwards:
+
+        with repo.cat_file() as objects:
+            content = objects.read('HEAD:README.md')
+
+        :rtype: GitCatFile
+        """
+
+        return GitCatFile(self.working_directory)
+
+
+class GitCatFile:
+    """Long-lived "git cat-file --batch" process answering object lookups over a pipe.
+
+    One git process serves any number of lookups, instead of one "git cat-file" or "git show" process per object.
+    Lookups are serialized, so a GitCatFile can be shared between threads.
+    """
+
+    def __init__(self, working_directory):
+        """Start the reader for the repository in working_directory.
+
+        :param working_directory: Path to the working_directory of the git repository.
+        :type working_directory: str
+        """
+        self.working_directory = working_directory
+        self._batch = None
+        self._batch_check = None
+        self._lock = threading.Lock()
+
+    def read(self, object_name):
+        """Read an object.
+
+        :param object_name: Any object name git understands (i.e. a hash, 'HEAD', or 'HEAD:path/to/file').
+        :type object_name: str
+        :return: Tuple of hash, type and content of the object, or None if it does not exist.
+        :rtype: tuple[str, str, bytes]
+        """
+
+        with self._lock:
+            if self._batch is None:
+                self._batch = self._start('--batch')
+            header = self._request(self._batch, object_name)
+            if header is None:
+                return None
+            sha, object_type, size = header
+            content = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)
+            return sha, object_type, content
+
+    def info(self, object_name):
+        """Look up the hash, type and size of an object without reading its content.
+
+        :param object_name: Any object name git understands.
+        :type object_name: str
+        :return: Tuple of hash, type and size of the object, or None if it does not exist.
+        :rtype: tuple[str, str, int]
+        """
+
+        with self._lock:
+            if self._batch_check is None:
+                self._batch_check = self._start('--batch-check')
+            return self._request(self._batch_check, object_name)
+
+    def close(self):
+        """Stop the git processes."""
+
+        with self._lock:
+            for process in (self._batch, self._batch_check):
+                if process is not None:
+                    process.stdin.close()
+                    process.wait()
+                    process.stdout.close()
+            self._batch = self._batch_check = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start(self, mode):
+        return subprocess.Popen(['git', 'cat-file', mode], cwd=self.working_directory, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE)
+
+    @staticmethod
+    def _request(process, object_name):
+        if '\n' in object_name:
+            raise ValueError('Object names cannot contain newlines.')
+        process.stdin.write(object_name.encode('utf-8') + b'\n')
+        process.stdin.flush()
+        header = process.stdout.readline().decode('utf-8').rstrip('\n')
+        # "<name> missing" or "<name> ambiguous", where the name may contain spaces
+        if header.endswith((' missing', ' ambiguous')):
+            return None
+        sha, object_type, size = header.rsplit(' ', 2)
+        return sha, object_type, int(size)
+
+
+class StatusEntry(namedtuple('StatusEntry', ('kind', 'path', 'index', 'worktree', 'orig_path', 'submodule', 'modes',
+                                             'shas', 'score'))):
+    """One entry of Git.status.
+
+    kind - 'changed', 'renamed' (renamed or copied), 'unmerged', 'untracked' or 'ignored'.
+    path - Path relative to the repository root.
+    index, worktree - Status letters of the index and the working tree (i.e. 'M', 'A', 'D', 'R'; '.' if unchanged).
+    orig_path - Path before a rename or copy, otherwise None.
+    submodule - Submodule state ('N...' for regular files).
+    modes - Octal file modes (HEAD, index, working tree; stage 1, 2, 3, working tree when unmerged).
+    shas - Object names (HEAD, index; stage 1, 2, 3 when unmerged).
+    score - Similarity score of a rename or copy (i.e. 'R100').
+    """
+
+    __slots__ = ()
+
+    @property
+    def staged(self):
+        """Whether the entry has changes in the index."""
+
+        return self.kind in ('changed', 'renamed') and self.index != '.'
+
+    @property
+    def unstaged(self):
+        """Whether the entry has changes in the working tree that are not staged."""
+
+        return self.kind in ('changed', 'renamed') and self.worktree != '.'
+
+    @property
+    def conflicted(self):
+        """Whether the entry has merge conflicts."""
+
+        return self.kind == 'unmerged'
+
+
+def _nul_separated(stream, chunk_size=64 * 1024):
+    """Yield the NUL terminated records of stream while it is read."""
+
+    rest = b''
+    while True:
+        chunk = stream.read1(chunk_size) if hasattr(stream, 'read1') else stream.read(chunk_size)
+        if not chunk:
+            break
+        records = (rest + chunk).split(b'\0')
+        rest = records.pop()
+        yield from records
+    if rest:
+        yield rest
+
+
+def _status_entry(record, records):
+    """Parse one "git status --porcelain=v2 -z" record. Rename records take their original path from records."""
+
+    kind = record[:1]
+    if kind == b'1':
+        _, xy, submodule, head_mode, index_mode, worktree_mode, head_sha, index_sha, path = record.split(b' ', 8)
+        return StatusEntry('changed', os.fsdecode(path), chr(xy[0]), chr(xy[1]), None, submodule.decode(),
+                           (head_mode.decode(), index_mode.decode(), worktree_mode.decode()),
+                           (head_sha.decode(), index_sha.decode()), None)
+    if kind == b'2':
+        _, xy, submodule, head_mode, index_mode, worktree_mode, head_sha, index_sha, score, path = \
+            record.split(b' ', 9)
+        return StatusEntry('renamed', os.fsdecode(path), chr(xy[0]), chr(xy[1]), os.fsdecode(next(records)),
+                           submodule.decode(), (head_mode.decode(), index_mode.decode(), worktree_mode.decode()),
+                           (head_sha.decode(), index_sha.decode()), score.decode())
+    if kind == b'u':
+        _, xy, submodule, mode_1, mode_2, mode_3, worktree_mode, sha_1, sha_2, sha_3, path = record.split(b' ', 10)
+        return StatusEntry('unmerged', os.fsdecode(path), chr(xy[0]), chr(xy[1]), None, submodule.decode(),
+                           (mode_1.decode(), mode_2.decode(), mode_3.decode(), worktree_mode.decode()),
+                           (sha_1.decode(), sha_2.decode(), sha_3.decode()), None)
+    if kind in (b'?', b'!'):
+        return StatusEntry('untracked' if kind == b'?' else 'ignored', os.fsdecode(record[2:]), kind.decode(),
+                           kind.decode(), None, None, None, None, None)
+    # headers (# branch.oid ...)
+    return None
+
+
+def _fast_import_path(path):
+    """Encode path for a fast-import command, C-style quoted when needed."""
+
+    path = path.replace(os.sep, '/')
+    raw = path.encode('utf-8')
+    if not raw.startswith(b'"') and b'\n' not in raw:
+        return raw
+    return b'"' + raw.replace(b'\\', b'\\\\').replace(b'"', b'\\"').replace(b'\n', b'\\n') + b'"'
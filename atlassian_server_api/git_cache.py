@@ -0,0 +1,173 @@
+import contextlib
+import hashlib
+import os
+import re
+import shutil
+from atlassian_server_api.git import Git
+
+try:
+    import fcntl
+except ImportError:
+    # no file locking outside POSIX: the cache must not be shared by concurrent processes there
+    fcntl = None
+
+
+class MirrorCache:
+    """Directory of bare mirrors of remote repositories, shared by the clones and fetches of many builds.
+
+    Git.git_clone(..., cache=cache) updates the mirror of the remote (cloning it the first time) and clones with
+    --reference to it, so only objects missing from the mirror are transferred and the clone borrows the mirror's
+    objects through alternates instead of copying them. Git.git_fetch(..., cache=cache) fetches from the updated mirror:
+
+    cache = MirrorCache('/var/cache/git-mirrors', max_bytes=20 * 1024 ** 3)
+    repo = Git('/builds/service-a')
+    repo.git_clone('https://bitbucket.example.com/scm/proj/service-a.git', depth=1, cache=cache)
+
+    Mirrors are locked with flock, so build agents on one host can share the directory: a mirror is locked exclusively
+    while it is created or updated and shared while a clone or fetch reads it. When the mirrors take more than
+    max_bytes, the least recently used are deleted, skipping mirrors in use. A clone borrowing objects from an evicted
+    mirror is broken, so long-lived clones should be made with dissociate=True.
+    """
+
+    def __init__(self, directory, max_bytes=None, timeout=None, instrumentation=None):
+        """Initialize MirrorCache with its directory (created if missing).
+
+        :param directory: Directory holding the mirrors.
+        :type directory: str
+        :param max_bytes: Disk size the mirrors are evicted down to after each update (None to never evict).
+        :type max_bytes: int
+        :param timeout: Seconds after which a git command on a mirror is killed (None to wait indefinitely).
+        :type timeout: float
+        :param instrumentation: Receives an event for every git command.
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.instrumentation = instrumentation
+        os.makedirs(self.directory, exist_ok=True)
+
+    def mirror_path(self, remote_url):
+        """Path of the mirror of remote_url (i.e. /var/cache/git-mirrors/service-a-3f2c9a1b0d4e.git).
+
+        :rtype: str
+        """
+
+        name = re.sub(r'[^A-Za-z0-9._-]', '-', remote_url.rstrip('/').rsplit('/', 1)[-1])
+        if name.endswith('.git'):
+            name = name[:-4]
+        return os.path.join(self.directory, name + '-' + hashlib.sha1(remote_url.encode('utf-8')).hexdigest()[:12] +
+                            '.git')
+
+    @contextlib.contextmanager
+    def use(self, remote_url, update=True):
+        """Context manager yielding the path of the up to date mirror of remote_url, which is not evicted until exit.
+
+        :param remote_url: URL of the remote repository.
+        :type remote_url: str
+        :param update: Fetch the remote into an existing mirror first.
+        :type update: bool
+        :rtype: str
+        """
+
+        path = self.mirror_path(remote_url)
+        with open(path[:-len('.git')] + '.lock', 'a+') as lock_file:
+            self._lock(lock_file, exclusive=True)
+            if not os.path.isdir(path):
+                self._create(remote_url, path)
+            elif update:
+                self._git(path, 'fetch', '--prune', '--quiet', 'origin')
+            # the modification time of the lock file records the last use
+            os.utime(lock_file.name)
+            self._lock(lock_file, exclusive=False)
+            if self.max_bytes is not None:
+                self.evict(self.max_bytes)
+            yield path
+
+    def update(self, remote_url):
+        """Create or update the mirror of remote_url.
+
+        :return: Path of the mirror.
+        :rtype: str
+        """
+
+        with self.use(remote_url) as path:
+            return path
+
+    def _create(self, remote_url, path):
+        partial_path = path + '.partial'
+        # left over by an interrupted clone
+        shutil.rmtree(partial_path, ignore_errors=True)
+        self._git(self.directory, 'clone', '--mirror', '--quiet', remote_url, partial_path)
+        os.rename(partial_path, path)
+
+    def _git(self, working_directory, *args):
+        return Git(working_directory, timeout=self.timeout, instrumentation=self.instrumentation)._git(*args)
+
+    def mirrors(self):
+        """Mirrors in the cache, least recently used first.
+
+        :return: Path, size in bytes and last use (timestamp) of every mirror:
+            [{'path': '/var/cache/git-mirrors/service-a-3f2c9a1b0d4e.git', 'bytes': 52428800, 'last_used': 1.7e9}]
+        :rtype: list[dict]
+        """
+
+        mirrors = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.git') or not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.stat(path[:-len('.git')] + '.lock').st_mtime
+            except FileNotFoundError:
+                last_used = 0.0
+            mirrors.append({'path': path, 'bytes': _directory_size(path), 'last_used': last_used})
+        mirrors.sort(key=lambda mirror: mirror['last_used'])
+        return mirrors
+
+    def evict(self, max_bytes):
+        """Delete the least recently used mirrors until the cache takes at most max_bytes. Mirrors in use are kept.
+
+        :param max_bytes: Disk size the mirrors are evicted down to.
+        :type max_bytes: int
+        :return: Paths of the deleted mirrors.
+        :rtype: list[str]
+        """
+
+        mirrors = self.mirrors()
+        total = sum(mirror['bytes'] for mirror in mirrors)
+        evicted = []
+        for mirror in mirrors:
+            if total <= max_bytes:
+                break
+            with open(mirror['path'][:-len('.git')] + '.lock', 'a+') as lock_file:
+                if not self._lock(lock_file, exclusive=True, blocking=False):
+                    continue
+                shutil.rmtree(mirror['path'])
+            total -= mirror['bytes']
+            evicted.append(mirror['path'])
+        return evicted
+
+    @staticmethod
+    def _lock(lock_file, exclusive, blocking=True):
+        """Lock (or convert the lock of) lock_file. Returns False if blocking is False and the file is locked."""
+
+        if fcntl is None:
+            return True
+        operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(lock_file.fileno(), operation)
+        except BlockingIOError:
+            return False
+        return True
+
+
+def _directory_size(path):
+    size = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(directory, name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
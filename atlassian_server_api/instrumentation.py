@@ -0,0 +1,343 @@
+import bisect
+import re
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# path segments replaced by placeholders, so requests to the same resource type share one endpoint
+ENDPOINT_PATTERNS = (
+    (re.compile(r'/projects/[^/]+'), '/projects/{projectKey}'),
+    (re.compile(r'/repos/[^/]+'), '/repos/{repositorySlug}'),
+    (re.compile(r'/issue/(?!bulk(?:/|$))[^/]+'), '/issue/{issueIdOrKey}'),
+    (re.compile(r'/attachment/[^/]+'), '/attachment/{id}'),
+)
+
+# connections opened by the current thread since Instrumentation.http started counting
+_opened = threading.local()
+
+
+@lru_cache(maxsize=1024)
+def endpoint_template(url):
+    """Path of url with identifiers replaced by placeholders, without host and query.
+
+    i.e. 'http://localhost:8080/rest/api/2/issue/PROJ-1?fields=summary' -> '/rest/api/2/issue/{issueIdOrKey}'
+
+    :param url: Absolute URL of a request.
+    :type url: str
+    :rtype: str
+    """
+
+    path = urlsplit(url).path
+    for pattern, placeholder in ENDPOINT_PATTERNS:
+        path = pattern.sub(placeholder, path)
+    return path
+
+
+def git_subcommand(args):
+    """The git subcommand of a git argument list (i.e. ('-c', 'core.fsmonitor=true', 'status', ...) -> 'status')."""
+
+    args = iter(args)
+    for arg in args:
+        if arg in ('-c', '-C'):
+            # skip the option's value
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return ''
+
+
+def is_error(event):
+    """Whether event is a failure: an exception, an HTTP status of 400 or more, or a non-zero git exit status."""
+
+    if event['error'] is not None or event['status'] is None:
+        return True
+    return event['status'] >= 400 if event['kind'] == 'http' else event['status'] != 0
+
+
+class _TrackingHTTPConnectionPool(HTTPConnectionPool):
+
+    def _new_conn(self):
+        _opened.count = getattr(_opened, 'count', 0) + 1
+        return super()._new_conn()
+
+
+class _TrackingHTTPSConnectionPool(HTTPSConnectionPool):
+
+    def _new_conn(self):
+        _opened.count = getattr(_opened, 'count', 0) + 1
+        return super()._new_conn()
+
+
+class TrackingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter counting the connections opened by each thread, to tell new connections from reused ones."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TrackingHTTPConnectionPool,
+                                                   'https': _TrackingHTTPSConnectionPool}
+
+
+class Instrumentation:
+    """Reports every HTTP request and git subprocess to callbacks.
+
+    Pass one Instrumentation to Transport, AsyncTransport and Git objects; each request or git command then emits one
+    event dict to every callback:
+
+    {'kind': 'http', 'method': 'GET', 'endpoint': '/rest/api/2/issue/{issueIdOrKey}',
+     'target': 'http://localhost:8080/rest/api/2/issue/PROJ-1', 'status': 200, 'seconds': 0.012, 'bytes_sent': 0,
+     'bytes_received': 1843, 'retries': 0, 'reused_connection': True, 'error': None}
+
+    Git commands have kind 'git', the git subcommand as method, 'git <subcommand>' as endpoint, the working directory
+    as target, the exit status as status, and None as reused_connection. Bytes are body bytes for HTTP (as sent on the
+    wire) and stdin/stdout bytes for git. A request that raised has status None and the exception type as error.
+
+    Clients without an Instrumentation skip all of this, so there is no cost when it is not used.
+
+    metrics = MetricsAggregator()
+    instrumentation = Instrumentation(metrics, print)
+    transport = Transport(auth=auth, instrumentation=instrumentation)
+    """
+
+    def __init__(self, *callbacks):
+        """Initialize Instrumentation with the callbacks receiving the events.
+
+        :param callbacks: Callables taking an event dict (i.e. a MetricsAggregator).
+        :type callbacks: callable
+        """
+        self.callbacks = list(callbacks)
+        self.callback_errors = 0
+
+    def subscribe(self, callback):
+        """Add a callback and return it.
+
+        :param callback: Callable taking an event dict.
+        :type callback: callable
+        :rtype: callable
+        """
+
+        self.callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Remove a callback added by subscribe or the constructor."""
+
+        self.callbacks.remove(callback)
+
+    def emit(self, event):
+        """Pass event to every callback. A failing callback is counted in callback_errors and never breaks a request.
+
+        :param event: Event dict.
+        :type event: dict
+        """
+
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception:
+                self.callback_errors += 1
+
+    def http(self, method, url, send, stream=False):
+        """Send a request through a Transport's session and emit its event.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param send: Callable sending the request (including retries) and returning the response.
+        :type send: callable
+        :param stream: Whether the response body is left unread (its size is then taken from Content-Length).
+        :type stream: bool
+        :rtype: requests.Response
+        """
+
+        _opened.count = 0
+        start = time.perf_counter()
+        r = error = None
+        try:
+            r = send()
+            return r
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            bytes_sent = bytes_received = 0
+            if r is not None:
+                bytes_sent = int(r.request.headers.get('Content-Length', 0)) if r.request is not None else 0
+                if stream:
+                    bytes_received = int(r.headers.get('Content-Length', 0))
+                elif r.raw is not None and hasattr(r.raw, 'tell'):
+                    bytes_received = r.raw.tell()
+                else:
+                    bytes_received = len(r.content)
+            self.emit(self._http_event(method, url, r, seconds, bytes_sent, bytes_received, _opened.count, error))
+
+    async def http_async(self, method, url, send, tracking, bytes_sent=0):
+        """Send a request through an AsyncTransport's session and emit its event.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param send: Coroutine function sending the request (including retries) and returning the response.
+        :type send: callable
+        :param tracking: Dict passed as aiohttp trace_request_ctx; its 'opened' item counts the connections opened.
+        :type tracking: dict
+        :param bytes_sent: Size of the request body.
+        :type bytes_sent: int
+        :rtype: requests.Response
+        """
+
+        start = time.perf_counter()
+        r = error = None
+        try:
+            r = await send()
+            return r
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            bytes_received = len(r.content) if r is not None else 0
+            self.emit(self._http_event(method, url, r, seconds, bytes_sent, bytes_received, tracking['opened'],
+                                       error))
+
+    def git(self, working_directory, args, input, run):
+        """Run a git command and emit its event.
+
+        :param working_directory: Working directory of the command.
+        :type working_directory: str
+        :param args: Arguments passed to git.
+        :type args: tuple[str]
+        :param input: Bytes written to the stdin of the process.
+        :type input: bytes
+        :param run: Callable running the command and returning its stdout as bytes.
+        :type run: callable
+        :rtype: bytes
+        """
+
+        start = time.perf_counter()
+        status = error = None
+        output = b''
+        try:
+            output = run()
+            status = 0
+            return output
+        except subprocess.CalledProcessError as e:
+            status, error = e.returncode, 'CalledProcessError'
+            raise
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.emit(self.git_event(working_directory, args, status, time.perf_counter() - start,
+                                     len(input or b''), len(output), error))
+
+    @staticmethod
+    def git_event(working_directory, args, status, seconds, bytes_sent=0, bytes_received=0, error=None):
+        """Event of a git command run outside of git (i.e. a Popen streaming to fast-import).
+
+        :rtype: dict
+        """
+
+        subcommand = git_subcommand(args)
+        return {'kind': 'git', 'method': subcommand, 'endpoint': 'git ' + subcommand, 'target': working_directory,
+                'status': status, 'seconds': seconds, 'bytes_sent': bytes_sent, 'bytes_received': bytes_received,
+                'retries': 0, 'reused_connection': None, 'error': error}
+
+    @staticmethod
+    def _http_event(method, url, r, seconds, bytes_sent, bytes_received, opened, error):
+        return {'kind': 'http', 'method': method.upper(), 'endpoint': endpoint_template(url), 'target': url,
+                'status': r.status_code if r is not None else None, 'seconds': seconds, 'bytes_sent': bytes_sent,
+                'bytes_received': bytes_received, 'retries': getattr(r, 'retries', 0), 'reused_connection': not opened,
+                'error': error}
+
+
+class MetricsAggregator:
+    """Callback aggregating events into counters and a latency histogram per endpoint.
+
+    Events are grouped by kind, method and endpoint. snapshot returns the aggregates as plain dicts, ready to export
+    to a metrics system:
+
+    metrics = MetricsAggregator()
+    jira = Jira(jira_url, project_id, transport=Transport(auth=auth, instrumentation=Instrumentation(metrics)))
+    ...
+    for endpoint in metrics.snapshot():
+        print(endpoint['method'], endpoint['endpoint'], endpoint['count'], endpoint['p99_seconds'])
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize MetricsAggregator with the histogram buckets.
+
+        :param buckets: Ascending upper bounds of the latency buckets, in seconds. The last one should be infinity.
+        :type buckets: tuple[float]
+        """
+        self.buckets = tuple(buckets)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event['kind'], event['method'], event['endpoint'])
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = {
+                    'kind': key[0], 'method': key[1], 'endpoint': key[2], 'count': 0, 'errors': 0, 'statuses': {},
+                    'seconds': 0.0, 'max_seconds': 0.0, 'buckets': [0] * len(self.buckets), 'bytes_sent': 0,
+                    'bytes_received': 0, 'retries': 0, 'reused_connections': 0
+                }
+            endpoint['count'] += 1
+            if is_error(event):
+                endpoint['errors'] += 1
+            endpoint['statuses'][event['status']] = endpoint['statuses'].get(event['status'], 0) + 1
+            endpoint['seconds'] += event['seconds']
+            endpoint['max_seconds'] = max(endpoint['max_seconds'], event['seconds'])
+            endpoint['buckets'][min(bisect.bisect_left(self.buckets, event['seconds']), len(self.buckets) - 1)] += 1
+            endpoint['bytes_sent'] += event['bytes_sent']
+            endpoint['bytes_received'] += event['bytes_received']
+            endpoint['retries'] += event['retries']
+            endpoint['reused_connections'] += bool(event['reused_connection'])
+
+    def snapshot(self):
+        """Aggregates of every endpoint.
+
+        Each has kind, method, endpoint, count, errors (HTTP status >= 400, non-zero git exit status or exception),
+        statuses (count by status), seconds (total), max_seconds, buckets (list of (upper bound, count), not
+        cumulative), bytes_sent, bytes_received, retries, reused_connections, and p50_seconds, p90_seconds and
+        p99_seconds estimated from the histogram (the upper bound of the bucket holding the percentile).
+
+        :rtype: list[dict]
+        """
+
+        with self._lock:
+            endpoints = [dict(endpoint, statuses=dict(endpoint['statuses']), buckets=list(endpoint['buckets']))
+                         for endpoint in self._endpoints.values()]
+
+        for endpoint in endpoints:
+            for name, fraction in (('p50_seconds', 0.5), ('p90_seconds', 0.9), ('p99_seconds', 0.99)):
+                endpoint[name] = self._percentile(endpoint['buckets'], endpoint['count'], fraction,
+                                                  endpoint['max_seconds'])
+            endpoint['buckets'] = list(zip(self.buckets, endpoint['buckets']))
+        return endpoints
+
+    def reset(self):
+        """Forget all aggregates."""
+
+        with self._lock:
+            self._endpoints.clear()
+
+    def _percentile(self, buckets, count, fraction, max_seconds):
+        rank = count * fraction
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, max_seconds)
+        return max_seconds
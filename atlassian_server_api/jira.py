@@ -1,6 +1,16 @@
-import requests
-import json
+import itertools
 import ntpath
+import os
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from atlassian_server_api.attachments import hash_files
+from atlassian_server_api.codec import decode_response, dumps
+from atlassian_server_api.models import DEFAULT_ISSUE_FIELDS, issue_model
+from atlassian_server_api.multipart import MultipartFileEncoder
+from atlassian_server_api.pagination import iter_paged, jira_next_start
+from atlassian_server_api.transport import Transport
 
 
 class Jira:
@@ -25,8 +35,8 @@ class Jira:
     https://jira.atlassian.com/rest/api/latest/issue/JRA-9
     """
 
-    def __init__(self, base_http_url, project_key, auth):
-        """Initialize JIRA object with base_http_url, project_key, and auth.
+    def __init__(self, base_http_url, project_key, auth=None, transport=None):
+        """Initialize JIRA object with base_http_url, project_key, and auth or a shared transport.
 
         :param base_http_url: URL for JIRA site - http://host:port/ (i.e. http://localhost:8080/)
         :type base_http_url: str
@@ -34,10 +44,14 @@ class Jira:
         :type project_key: str
         :param auth: Tuple of username and password for authentication.
         :type auth: tuple[str, str]
+        :param transport: Pooled transport to send requests through. Pass the same transport to several clients to
+            share one connection pool. When omitted a new Transport is created with auth.
+        :type transport: atlassian_server_api.transport.Transport
         """
         self.base_http_url = base_http_url
         self.project_key = project_key
-        self.auth = auth
+        self.transport = transport if transport is not None else Transport(auth=auth)
+        self.auth = auth if auth is not None else self.transport.auth
 
     def create_issue(self, summary, description='', issue_type='Task'):
         """Create Issue in Jira
@@ -61,7 +75,65 @@ class Jira:
         # create Jira issue
         url = self.base_http_url + 'rest/api/2/issue'
         headers = {'Content-Type': 'application/json'}
-        data = {
+        data = self._issue_data(summary, description, issue_type)
+
+        r = self.transport.post(url, headers=headers, data=dumps(data))
+
+        return r
+
+    def create_issues(self, issues, chunk_size=50, max_workers=4):
+        """Create many issues in Jira through the bulk endpoint (/rest/api/2/issue/bulk).
+
+        The issues are split into chunks of chunk_size, one bulk request per chunk, and the chunks are sent
+        concurrently by max_workers threads. Jira creates the valid issues of a chunk even when others fail, so the
+        result is reported per issue, in input order:
+
+        {'index': 0, 'issue': {...}, 'ok': True, 'status': 201, 'id': '10001', 'key': 'PROJ-1', 'error': None}
+
+        To retry, resubmit only the issues of failed results (r['issue'] for r in results if not r['ok']); created
+        issues are never sent twice. When a whole chunk fails without a response from Jira (i.e. a connection error)
+        its issues are reported with status None, since Jira may or may not have created them.
+
+        :param issues: Issues to create. Each is either a summary string or a dict of create_issue keyword arguments
+            (summary, description, issue_type).
+        :type issues: collections.abc.Iterable[str | dict]
+        :param chunk_size: Number of issues per bulk request.
+        :type chunk_size: int
+        :param max_workers: Number of bulk requests sent concurrently.
+        :type max_workers: int
+        :return: Result of every issue, in input order.
+        :rtype: list[dict]
+        """
+
+        chunks = self._issue_chunks(issues, chunk_size)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda chunk: self._create_chunk(*chunk), chunks)
+            return [result for chunk_results in results for result in chunk_results]
+
+    def _create_chunk(self, start_index, chunk):
+        url = self.base_http_url + 'rest/api/2/issue/bulk'
+        headers = {'Content-Type': 'application/json'}
+        data = {"issueUpdates": [self._issue_data(**issue) for issue in chunk]}
+
+        try:
+            r = self.transport.post(url, headers=headers, data=dumps(data))
+        except requests.RequestException as e:
+            return self._bulk_results(start_index, chunk, None, error=str(e))
+        return self._bulk_results(start_index, chunk, r)
+
+    @staticmethod
+    def _projection(separator, fields=None, expand=None):
+        """Query string selecting fields and expansions, starting with separator ('?' or '&'), or ''."""
+
+        params = []
+        for name, value in (('fields', fields), ('expand', expand)):
+            if value:
+                params.append(name + '=' + quote(value if isinstance(value, str) else ','.join(value), safe=',*-'))
+        return separator + '&'.join(params) if params else ''
+
+    def _issue_data(self, summary, description='', issue_type='Task'):
+        return {
             "fields": {
                 "project": {
                     "key": self.project_key
@@ -74,11 +146,67 @@ class Jira:
             }
         }
 
-        r = requests.post(url, auth=self.auth, headers=headers, data=json.dumps(data))
+    @staticmethod
+    def _issue_chunks(issues, chunk_size):
+        """Split issues into (index of first issue, list of create_issue keyword arguments) chunks."""
 
-        return r
+        issues = iter(issues)
+        start_index = 0
+        while True:
+            chunk = [issue if isinstance(issue, dict) else {'summary': issue}
+                     for issue in itertools.islice(issues, chunk_size)]
+            if not chunk:
+                return
+            yield start_index, chunk
+            start_index += len(chunk)
+
+    @staticmethod
+    def _bulk_results(start_index, chunk, response, error=None):
+        """Map a bulk response back to one result per issue of the chunk."""
 
-    def get_issues(self, issue_id=None, max_results=10, start_at=0):
+        results = [{'index': start_index + i, 'issue': issue, 'ok': False, 'status': None, 'id': None, 'key': None,
+                    'error': error} for i, issue in enumerate(chunk)]
+        if response is None:
+            return results
+
+        try:
+            body = decode_response(response)
+        except ValueError:
+            body = None
+        errors = body.get('errors', []) if isinstance(body, dict) else None
+        # a bulk response lists failed issues in errors; Jira's error envelope has a dict of field errors instead
+        if not isinstance(errors, list) or not response.ok and not errors:
+            # the request failed as a whole
+            if isinstance(body, dict) and ('errorMessages' in body or 'errors' in body):
+                error = {'errorMessages': body.get('errorMessages', []), 'errors': body.get('errors', {})}
+            else:
+                error = response.text
+            for result in results:
+                result['status'] = response.status_code
+                result['error'] = error
+            return results
+
+        failed = {}
+        for e in errors:
+            failed[e['failedElementNumber']] = e
+        created = iter(body.get('issues', []))
+        for i, result in enumerate(results):
+            if i in failed:
+                result['status'] = failed[i].get('status', response.status_code)
+                result['error'] = failed[i].get('elementErrors')
+            else:
+                issue = next(created, None)
+                if issue is None:
+                    result['status'] = response.status_code
+                    result['error'] = 'Issue missing from bulk response.'
+                    continue
+                result['ok'] = True
+                result['status'] = 201
+                result['id'] = issue.get('id')
+                result['key'] = issue.get('key')
+        return results
+
+    def get_issues(self, issue_id=None, max_results=10, start_at=0, fields=None, expand=None, stream=False):
         """Get specific or list of Jira issue(s).
 
         Get specific issue by setting the issue_id. Get a list of issues by leaving the issue_id blank and setting the
@@ -91,6 +219,13 @@ class Jira:
         :type max_results: int
         :param start_at: Item that should be used as the first item in the page of results.
         :type start_at: int
+        :param fields: Only return these fields of the issue(s) (i.e. ['summary', 'status']). All fields by default.
+        :type fields: list[str] | str
+        :param expand: Entities to expand in the representation (i.e. ['changelog', 'renderedFields']).
+        :type expand: list[str] | str
+        :param stream: Do not download the body until it is read (i.e. by codec.decode_response, which decodes it
+            while it is downloaded).
+        :type stream: bool
         :return:
             STATUS 200: Success - application/jsonReturns a full representation of a JIRA issue in JSON format.
             STATUS 404: Error - Returned if the requested issue is not found, or the user does not have permission to
@@ -99,23 +234,162 @@ class Jira:
         """
 
         if issue_id is None:
-            url = self.base_http_url + 'rest/api/2/issue?maxResults=' + str(max_results) + '&startAt' + str(start_at)
+            url = self.base_http_url + 'rest/api/2/issue?maxResults=' + str(max_results) + '&startAt=' + str(start_at) \
+                + self._projection('&', fields, expand)
         else:
-            url = self.base_http_url + 'rest/api/2/issue/' + str(issue_id)
+            url = self.base_http_url + 'rest/api/2/issue/' + str(issue_id) + self._projection('?', fields, expand)
         headers = {'Content-Type': 'application/json'}
 
-        r = requests.get(url, auth=self.auth, headers=headers)
+        r = self.transport.get(url, headers=headers, stream=stream)
 
         return r
 
-    def add_attachment(self, issue_id, attachments):
+    def iter_issues(self, page_size=50, fields=None, expand=None, model=False):
+        """Iterate over the issues listed by get_issues, one issue at a time.
+
+        Pages are requested with get_issues and followed through startAt/total. The next page is fetched in the
+        background while the current one is consumed, and no more than two pages are held in memory.
+
+        :param page_size: The "maxResults" parameter used for each page.
+        :type page_size: int
+        :param fields: Only request these fields of the issues. All fields by default, or DEFAULT_ISSUE_FIELDS when
+            model is True.
+        :type fields: list[str]
+        :param expand: Entities to expand in the representation (i.e. ['changelog']).
+        :type expand: list[str]
+        :param model: Yield compact, slotted Issue models holding only the requested fields instead of dicts.
+        :type model: bool
+        :return: Generator of issues.
+        :rtype: collections.abc.Iterator[dict | atlassian_server_api.models.Issue]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        if model:
+            # request exactly the fields of the model (i.e. 'summary, status' split into names)
+            fields = issue_model(DEFAULT_ISSUE_FIELDS if fields is None else fields).fields
+
+        def fetch_page(start):
+            stream = self.transport.stream_pages
+            r = self.get_issues(max_results=page_size, start_at=start, fields=fields, expand=expand, stream=stream)
+            r.raise_for_status()
+            return decode_response(r, stream)
+
+        issues = iter_paged(fetch_page, 'issues', jira_next_start)
+        if model:
+            return map(issue_model(fields).from_json, issues)
+        return issues
+
+    def search_issues(self, jql, max_results=50, start_at=0, fields=None, expand=None, stream=False):
+        """Get one page of the issues matching a JQL query (/rest/api/2/search).
+
+        :param jql: JQL query (i.e. 'project = PROJ AND status = Open ORDER BY key').
+        :type jql: str
+        :param max_results: The "maxResults" parameter indicates how many results to return per page.
+        :type max_results: int
+        :param start_at: Item that should be used as the first item in the page of results.
+        :type start_at: int
+        :param fields: Only return these fields of the issues (i.e. ['summary', 'status']).
+        :type fields: list[str] | str
+        :param expand: Entities to expand in the representation (i.e. ['changelog']).
+        :type expand: list[str] | str
+        :param stream: Do not download the body until it is read (i.e. by codec.decode_response, which decodes it
+            while it is downloaded).
+        :type stream: bool
+        :return:
+            STATUS 200: Success - application/json Returns startAt, maxResults, total and the issues of the page.
+            STATUS 400: Error - Returned if there is a problem with the JQL query.
+        :rtype: requests.Response
+        """
+
+        url = self.base_http_url + 'rest/api/2/search?jql=' + quote(jql) + '&maxResults=' + str(max_results) + \
+            '&startAt=' + str(start_at) + self._projection('&', fields, expand)
+        headers = {'Content-Type': 'application/json'}
+
+        return self.transport.get(url, headers=headers, stream=stream)
+
+    def search(self, jql, fields=None, expand=None, page_size=100, parallelism=4, model=False):
+        """Iterate over all issues matching a JQL query, fetching pages in parallel.
+
+        The first page is requested alone to read the total. The remaining pages are then requested concurrently,
+        parallelism pages at a time, and their issues are yielded in query order. No more than parallelism + 1 pages are
+        held in memory.
+
+        :param jql: JQL query (i.e. 'project = PROJ ORDER BY key').
+        :type jql: str
+        :param fields: Only request these fields of the issues. All fields by default, or DEFAULT_ISSUE_FIELDS when
+            model is True.
+        :type fields: list[str]
+        :param expand: Entities to expand in the representation (i.e. ['changelog']).
+        :type expand: list[str]
+        :param page_size: The "maxResults" parameter used for each page. Jira may cap it.
+        :type page_size: int
+        :param parallelism: Number of pages requested concurrently.
+        :type parallelism: int
+        :param model: Yield compact, slotted Issue models holding only the requested fields instead of dicts.
+        :type model: bool
+        :return: Generator of issues.
+        :rtype: collections.abc.Iterator[dict | atlassian_server_api.models.Issue]
+        :raises requests.HTTPError: If a page request fails.
+        """
+
+        if model:
+            # request exactly the fields of the model (i.e. 'summary, status' split into names)
+            fields = issue_model(DEFAULT_ISSUE_FIELDS if fields is None else fields).fields
+
+        def fetch_page(start, max_results):
+            stream = self.transport.stream_pages
+            r = self.search_issues(jql, max_results=max_results, start_at=start, fields=fields, expand=expand,
+                                   stream=stream)
+            r.raise_for_status()
+            return decode_response(r, stream)
+
+        issues = self._iter_search(fetch_page, page_size, parallelism)
+        if model:
+            return map(issue_model(fields).from_json, issues)
+        return issues
+
+    @staticmethod
+    def _iter_search(fetch_page, page_size, parallelism):
+        page = fetch_page(0, page_size)
+        # Jira may return fewer results per page than requested, so step by what it actually returned
+        step = min(page.get('maxResults') or page_size, page_size) or page_size
+        starts = iter(range(len(page['issues']), page.get('total', 0), step))
+
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            pending = deque(executor.submit(fetch_page, start, step) for start in itertools.islice(starts, parallelism))
+            while True:
+                issues = page['issues']
+                del page
+                for issue in issues:
+                    yield issue
+                if not pending:
+                    return
+                page = pending.popleft().result()
+                for start in itertools.islice(starts, 1):
+                    pending.append(executor.submit(fetch_page, start, step))
+
+    def add_attachment(self, issue_id, attachments, mode='separate', max_workers=4):
         """Add attachments to Jira issue
 
+        Files are streamed from disk in chunks, so large files are never loaded into memory. The mode chooses how they
+        are sent:
+
+        separate - one POST request per file, one after the other.
+        single - all files in one multipart POST request.
+        concurrent - one POST request per file, max_workers uploads at a time.
+
+        Uploads are verified against the attachments returned by the upload responses. Only if a response cannot be
+        read, the issue's attachment field (fields=attachment) is requested instead.
+
         :param issue_id: JIRA will attempt to identify the issue by the issueIdOrKey path parameter. This can be an
             issue id, or an issue key.
         :type issue_id: str
         :param attachments: List of string paths to attachments to be uploaded and added to an issue.
         :type attachments: list[str]
+        :param mode: How files are sent: 'separate', 'single' or 'concurrent'.
+        :type mode: str
+        :param max_workers: Number of concurrent uploads in 'concurrent' mode.
+        :type max_workers: int
         :return:
             STATUS 200: Success - application/json
             STATUS 403: Error - Returned if attachments is disabled or if you don't have permission to add attachments
@@ -125,30 +399,145 @@ class Jira:
         :rtype: list[requests.Response, str]
         """
 
-        # add attachments to Jira issue
-        url = self.base_http_url + 'rest/api/2/issue/' + issue_id + '/attachments'
-        headers = {'X-Atlassian-Token': 'no-check'}
+        if mode not in ('separate', 'single', 'concurrent'):
+            raise ValueError('Unknown attachment mode: ' + str(mode))
 
-        r = []
-        filenames = []
+        if not attachments:
+            return ['ERROR: No attachments to add.']
 
         # POST request for attachments
-        if attachments:
-            for file in attachments:
-                upload = open(file, 'rb')
-                filenames.append(ntpath.basename(file))
-                r.append(requests.post(url, auth=self.auth, headers=headers, files={'file': upload}))
-                upload.close()
+        if mode == 'single':
+            r = [self._upload_attachments(issue_id, attachments)]
+        elif mode == 'concurrent':
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                r = list(executor.map(lambda file: self._upload_attachments(issue_id, [file]), attachments))
         else:
-            r.append('ERROR: No attachments to add.')
+            r = [self._upload_attachments(issue_id, [file]) for file in attachments]
 
         # verify attachments were attached
-        if attachments:
-            jira_attachments = self.get_issues(issue_id).json()['fields']['attachment']
-
-            for filename in filenames:
-                if not any(d['filename'] == filename for d in jira_attachments):
-                    # does not exist
-                    r.append('ERROR: File ' + filename + ' was not attached.')
+        uploaded = self._uploaded_filenames(r)
+        if uploaded is None:
+            uploaded = [d['filename'] for d in self._get_attachment_field(issue_id)]
+        r.extend(self._missing_attachments(attachments, uploaded))
 
         return r
+
+    def sync_attachments(self, issue_id, attachments, hash_cache=None, replace=False, mode='concurrent',
+                         max_workers=4):
+        """Upload only the attachments the issue does not have yet.
+
+        The issue's attachments are listed first. A file is skipped when the issue has an attachment with the same
+        filename and size. With a hash_cache, it must also have the same content hash: hashes of uploaded attachments
+        are recorded in the cache, and local files are hashed in parallel (chunked reads, unchanged files are not hashed
+        again). Attachments uploaded by others have no recorded hash and are compared by filename and size only.
+
+        :param issue_id: JIRA will attempt to identify the issue by the issueIdOrKey path parameter. This can be an
+            issue id, or an issue key.
+        :type issue_id: str
+        :param attachments: List of string paths to attachments to be synced to the issue.
+        :type attachments: list[str]
+        :param hash_cache: Cache of content hashes, also comparing files by content (saved after the sync if it has a
+            path).
+        :type hash_cache: atlassian_server_api.attachments.HashCache
+        :param replace: Delete the issue's older attachments with the filename of a file uploaded again (only after
+            the new one was attached).
+        :type replace: bool
+        :param mode: How changed files are uploaded (see add_attachment).
+        :type mode: str
+        :param max_workers: Number of concurrent uploads in 'concurrent' mode and of files hashed at once.
+        :type max_workers: int
+        :return: Paths uploaded and skipped, ids of deleted attachments, and the result of add_attachment:
+            {'uploaded': ['build.log'], 'skipped': ['report.html'], 'deleted': ['10001'], 'responses': [...]}
+        :rtype: dict
+        """
+
+        existing = self._get_attachment_field(issue_id)
+        hashes = hash_files(attachments, hash_cache, max_workers) if hash_cache is not None else {}
+        upload, skipped = self._plan_attachments(attachments, existing, hashes, hash_cache)
+
+        responses = self.add_attachment(issue_id, upload, mode=mode, max_workers=max_workers) if upload else []
+        replaced = self._record_attachments(responses, upload, existing, hashes, hash_cache)
+        deleted = []
+        for attachment_id in replaced if replace else []:
+            r = self.transport.request('DELETE', self.base_http_url + 'rest/api/2/attachment/' + attachment_id)
+            if r.ok:
+                deleted.append(attachment_id)
+        cache = getattr(self.transport, 'cache', None)
+        if deleted and cache is not None:
+            # the DELETE only invalidates .../attachment/<id>: the issue's attachment list changed too
+            cache.invalidate(self.base_http_url + 'rest/api/2/issue/' + issue_id)
+        if hash_cache is not None:
+            hash_cache.save()
+
+        return {'uploaded': upload, 'skipped': skipped, 'deleted': deleted, 'responses': responses}
+
+    @staticmethod
+    def _plan_attachments(attachments, existing, hashes, hash_cache):
+        """Split attachments into the files to upload and the files the issue already has."""
+
+        by_name = {}
+        for attachment in existing:
+            by_name.setdefault(attachment['filename'], []).append(attachment)
+
+        upload, skipped = [], []
+        for path in attachments:
+            size = os.path.getsize(path)
+            for attachment in by_name.get(ntpath.basename(path), []):
+                recorded = hash_cache.attachment_hash(attachment['id']) if hash_cache is not None else None
+                if attachment.get('size') == size and (recorded is None or recorded == hashes[path]):
+                    skipped.append(path)
+                    break
+            else:
+                upload.append(path)
+        return upload, skipped
+
+    @staticmethod
+    def _record_attachments(responses, upload, existing, hashes, hash_cache):
+        """Record the hashes of the uploaded attachments and return the ids of the attachments they replace."""
+
+        paths = {ntpath.basename(path): path for path in upload}
+        attached = set()
+        for r in responses:
+            if isinstance(r, str) or not r.ok:
+                continue
+            try:
+                created = [(str(d['id']), d['filename']) for d in decode_response(r)]
+            except (ValueError, TypeError, KeyError):
+                continue
+            for attachment_id, filename in created:
+                attached.add(filename)
+                if hash_cache is not None and filename in paths:
+                    hash_cache.set_attachment_hash(attachment_id, hashes[paths[filename]])
+        return [str(d['id']) for d in existing if d['filename'] in attached]
+
+    def _upload_attachments(self, issue_id, file_paths):
+        url = self.base_http_url + 'rest/api/2/issue/' + issue_id + '/attachments'
+        body = MultipartFileEncoder(file_paths)
+        headers = {'X-Atlassian-Token': 'no-check', 'Content-Type': body.content_type}
+
+        try:
+            return self.transport.post(url, headers=headers, data=body)
+        finally:
+            body.close()
+
+    def _get_attachment_field(self, issue_id):
+        return decode_response(self.get_issues(issue_id, fields=['attachment']))['fields']['attachment']
+
+    @staticmethod
+    def _uploaded_filenames(responses):
+        """Filenames listed by successful upload responses, or None if one of them cannot be read."""
+
+        filenames = []
+        for r in responses:
+            if not r.ok:
+                continue
+            try:
+                filenames.extend(d['filename'] for d in decode_response(r))
+            except (ValueError, TypeError, KeyError):
+                return None
+        return filenames
+
+    @staticmethod
+    def _missing_attachments(attachments, uploaded):
+        return ['ERROR: File ' + filename + ' was not attached.'
+                for filename in (ntpath.basename(file) for file in attachments) if filename not in uploaded]
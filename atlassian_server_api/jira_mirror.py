@@ -0,0 +1,217 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from atlassian_server_api.models import issue_model
+
+
+class JiraMirror:
+    """Local SQLite mirror of the issues of a Jira project, kept up to date incrementally.
+
+    The first sync fetches every issue of the project with Jira.search. Later syncs only fetch the issues updated since
+    the previous sync started (less a safety margin). Every field of the mirror is stored in its own indexed column, so
+    lookups by key, status, assignee, or any other mirrored field are answered by SQLite instead of paged REST calls:
+
+    mirror = JiraMirror(jira, 'issues.db', fields=['summary', 'status', 'assignee'])
+    mirror.sync()
+    mirror.get('PROJ-1')  # {'id': '10001', 'key': 'PROJ-1', 'summary': ..., 'status': 'Open', ...}
+    mirror.find(status='Open', assignee='jdoe')
+
+    Field values are stored compacted as by the Issue models (status -> 'Open', assignee -> 'jdoe', attachments ->
+    filenames). The updated field is always mirrored. Incremental syncs cannot see deleted issues or issues moved to
+    another project; sync(full=True) refetches everything and drops them.
+    """
+
+    def __init__(self, jira, path=':memory:', fields=('summary', 'status', 'assignee'), time_zone=None, page_size=100,
+                 parallelism=4, margin=300.0):
+        """Initialize JiraMirror with the client and the database file.
+
+        :param jira: Client of the project to mirror (its project_key selects the issues).
+        :type jira: atlassian_server_api.jira.Jira
+        :param path: Path of the SQLite database file. The default keeps the mirror in memory.
+        :type path: str
+        :param fields: Jira fields to mirror. Changing them discards the mirrored issues on the next sync.
+        :type fields: collections.abc.Iterable[str]
+        :param time_zone: Time zone Jira interprets JQL dates in (the time zone of the user's profile). Defaults to UTC.
+        :type time_zone: datetime.tzinfo
+        :param page_size: The "maxResults" parameter of the search pages.
+        :type page_size: int
+        :param parallelism: Number of search pages requested concurrently.
+        :type parallelism: int
+        :param margin: Seconds before the start of a sync the next sync fetches updates from. Covers the difference
+            between the local and Jira's clock, and issues updated while a sync pages.
+        :type margin: float
+        """
+        self.jira = jira
+        self.path = path
+        fields = tuple(fields)
+        self.fields = fields + (() if 'updated' in fields else ('updated',))
+        self.time_zone = time_zone or datetime.timezone.utc
+        self.page_size = page_size
+        self.parallelism = parallelism
+        self.margin = margin
+        self.model = issue_model(self.fields)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            # readers (other tools) are not blocked while a sync writes
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'fields'").fetchone()
+            if row is not None and tuple(json.loads(row[0])) != self.fields:
+                # the columns no longer match, so mirror again from scratch
+                self._db.execute('DROP TABLE IF EXISTS issues')
+                self._db.execute("DELETE FROM meta")
+
+            columns = ''.join(', "%s"' % field for field in self.fields)
+            self._db.execute('CREATE TABLE IF NOT EXISTS issues (key TEXT PRIMARY KEY, id TEXT' + columns +
+                             ', data TEXT NOT NULL)')
+            for field in self.fields:
+                self._db.execute('CREATE INDEX IF NOT EXISTS "issues_%s" ON issues ("%s")' % (field, field))
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fields', ?)", (json.dumps(self.fields),))
+
+    @property
+    def last_sync(self):
+        """Time the next sync fetches updates from (the start of the last sync less the margin), as a UTC timestamp
+        (None before the first sync).
+
+        :rtype: float
+        """
+
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'last_sync'").fetchone()
+        return float(row[0]) if row is not None else None
+
+    def sync(self, full=False):
+        """Fetch the issues updated since the last sync and store them.
+
+        :param full: Fetch every issue of the project, and delete mirrored issues that were not returned.
+        :type full: bool
+        :return: Number of issues fetched and deleted, and seconds taken:
+            {'fetched': 12, 'deleted': 0, 'full': False, 'seconds': 0.4}
+        :rtype: dict
+        :raises requests.HTTPError: If a search request fails. Issues stored before the failure are kept, and the next
+            sync starts again from the previous last_sync.
+        """
+
+        start = time.perf_counter()
+        # the next sync starts from here: taken before the first page, an issue updated while paging is fetched again
+        next_sync = time.time() - self.margin
+        last_sync = None if full else self.last_sync
+        jql = 'project = "' + self.jira.project_key + '"'
+        if last_sync is not None:
+            # JQL dates have minute resolution, so >= fetches again the issues of the last minute
+            since = datetime.datetime.fromtimestamp(last_sync, self.time_zone)
+            jql += ' AND updated >= "' + since.strftime('%Y/%m/%d %H:%M') + '"'
+        # pages are requested concurrently by offset, so they must be sorted on a field that does not change
+        jql += ' ORDER BY key ASC'
+
+        issues = self.jira.search(jql, fields=self.fields, page_size=self.page_size, parallelism=self.parallelism,
+                                  model=True)
+        fetched = deleted = 0
+        seen = set()
+        batch = []
+        for issue in issues:
+            batch.append(self._row(issue))
+            seen.add(issue.key)
+            if len(batch) == 500:
+                fetched += self._store(batch)
+                batch = []
+        fetched += self._store(batch)
+
+        with self._lock, self._db:
+            if full:
+                stale = [key for key, in self._db.execute('SELECT key FROM issues') if key not in seen]
+                self._db.executemany('DELETE FROM issues WHERE key = ?', ((key,) for key in stale))
+                deleted = len(stale)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('last_sync', ?)", (repr(next_sync),))
+
+        return {'fetched': fetched, 'deleted': deleted, 'full': full, 'seconds': time.perf_counter() - start}
+
+    def _row(self, issue):
+        values = issue.as_dict()
+        columns = [json.dumps(list(values[field])) if isinstance(values[field], tuple) else values[field]
+                   for field in self.fields]
+        return [issue.key, issue.id] + columns + [json.dumps(values)]
+
+    def _store(self, rows):
+        if not rows:
+            return 0
+        placeholders = ', '.join('?' * (len(self.fields) + 3))
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO issues VALUES (' + placeholders + ')', rows)
+        return len(rows)
+
+    def get(self, key):
+        """Get a mirrored issue by key.
+
+        :param key: Issue key (i.e. 'PROJ-1').
+        :type key: str
+        :return: The issue as a flat dict of id, key and the mirrored fields, or None if it is not mirrored.
+        :rtype: dict
+        """
+
+        with self._lock:
+            row = self._db.execute('SELECT data FROM issues WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def find(self, limit=None, **criteria):
+        """Find mirrored issues whose fields equal the given values.
+
+        i.e. mirror.find(status='Open', assignee=None) lists the open, unassigned issues.
+
+        :param limit: Maximum number of issues returned (None for all).
+        :type limit: int
+        :param criteria: Mirrored field names and the values they must equal (None matches empty fields).
+        :return: Issues as flat dicts of id, key and the mirrored fields, ordered by key.
+        :rtype: list[dict]
+        :raises ValueError: If a criterion is not a mirrored field.
+        """
+
+        clauses = []
+        params = []
+        for field, value in criteria.items():
+            if field not in self.fields and field not in ('key', 'id'):
+                raise ValueError('Field ' + field + ' is not mirrored.')
+            if value is None:
+                clauses.append('"%s" IS NULL' % field)
+            else:
+                clauses.append('"%s" = ?' % field)
+                params.append(value)
+
+        query = 'SELECT data FROM issues'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY key'
+        if limit is not None:
+            query += ' LIMIT ' + str(int(limit))
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def count(self):
+        """Number of mirrored issues.
+
+        :rtype: int
+        """
+
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM issues').fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,105 @@
+import keyword
+import sys
+
+DEFAULT_ISSUE_FIELDS = ('summary', 'status', 'attachment')
+
+_issue_models = {}
+
+
+class Issue:
+    """Compact, slotted representation of a Jira issue.
+
+    Only the issue id, key, and the fields of the model are kept; the rest of the JSON representation is dropped.
+    Nested objects are reduced to their name (i.e. status -> 'Open', assignee -> 'jdoe') and attachments to their
+    filenames. Use issue_model to get the model class for a set of fields:
+
+    Model = issue_model(['summary', 'status'])
+    issue = Model.from_json(jira.get_issues('PROJ-1', fields=Model.fields).json())
+    issue.status  # 'Open'
+    """
+
+    __slots__ = ('id', 'key')
+    fields = ()
+
+    def __init__(self, id, key, **values):
+        self.id = id
+        self.key = key
+        for field in self.fields:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_json(cls, data):
+        """Decode the JSON representation of an issue.
+
+        :param data: Decoded JSON of an issue (i.e. one item of a page of issues).
+        :type data: dict
+        :rtype: Issue
+        """
+
+        values = data.get('fields') or {}
+        return cls(data.get('id'), data.get('key'),
+                   **{field: compact_field(field, values.get(field)) for field in cls.fields})
+
+    def as_dict(self):
+        """Return the issue as a flat dict of id, key, and fields.
+
+        :rtype: dict
+        """
+
+        values = {'id': self.id, 'key': self.key}
+        for field in self.fields:
+            values[field] = getattr(self, field)
+        return values
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, ' '.join('%s=%r' % item for item in self.as_dict().items()))
+
+
+def issue_model(fields=DEFAULT_ISSUE_FIELDS):
+    """Return the slotted Issue subclass holding exactly the given fields.
+
+    Classes are created once per set of fields and reused.
+
+    :param fields: Jira field names (i.e. ['summary', 'status', 'assignee'] or 'summary,status,assignee').
+    :type fields: str | collections.abc.Iterable[str]
+    :rtype: type[Issue]
+    """
+
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',')]
+    fields = tuple(fields)
+    model = _issue_models.get(fields)
+    if model is None:
+        for field in fields:
+            if not field.isidentifier() or keyword.iskeyword(field) or field in ('id', 'key', 'fields'):
+                raise ValueError('Field ' + repr(field) + ' cannot be used as a model attribute.')
+        model = type('Issue', (Issue,), {'__slots__': fields, 'fields': fields})
+        _issue_models[fields] = model
+    return model
+
+
+def compact_field(field, value):
+    """Reduce a Jira field value to a compact Python value.
+
+    Attachments become a tuple of filenames, objects become their name (or key, or value), and lists become tuples.
+    Names repeated across many issues (statuses, users, ...) are interned so they are stored once.
+
+    :param field: Jira field name.
+    :type field: str
+    :param value: Decoded JSON value of the field.
+    :return: Compact value.
+    """
+
+    if field == 'attachment' and isinstance(value, list):
+        return tuple(d.get('filename') for d in value)
+    if isinstance(value, dict):
+        for name in ('name', 'key', 'value', 'displayName'):
+            if isinstance(value.get(name), str):
+                return sys.intern(value[name])
+        return value
+    if isinstance(value, list):
+        return tuple(compact_field(field, item) for item in value)
+    return value
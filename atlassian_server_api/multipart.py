@@ -0,0 +1,114 @@
+import io
+import ntpath
+import os
+import uuid
+
+
+class MultipartFileEncoder:
+    """Streaming multipart/form-data body for uploading files from disk.
+
+    The body is produced in chunks while it is being sent: files are opened and read one chunk at a time, so uploading
+    multi-GB files never holds them in memory. The total length is computed up front from the file sizes, so the
+    request is sent with a Content-Length header rather than chunked transfer encoding.
+
+    encoder = MultipartFileEncoder(['build.zip', 'log.txt'])
+    requests.post(url, data=encoder, headers={'Content-Type': encoder.content_type})
+    """
+
+    def __init__(self, file_paths, field_name='file', chunk_size=1024 * 1024):
+        """Initialize MultipartFileEncoder with the files to upload.
+
+        :param file_paths: Paths of the files to upload, each in its own form part.
+        :type file_paths: list[str]
+        :param field_name: Name of the form field of every part (Jira expects 'file').
+        :type field_name: str
+        :param chunk_size: Number of bytes read from disk at a time when iterating.
+        :type chunk_size: int
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=' + self.boundary
+        self.chunk_size = chunk_size
+
+        # each part is either bytes or (path, size) of a file streamed from disk
+        self._parts = []
+        for path in file_paths:
+            filename = ntpath.basename(path).replace('"', '%22')
+            self._parts.append(('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                                'Content-Type: application/octet-stream\r\n\r\n'
+                                % (self.boundary, field_name, filename)).encode('utf-8'))
+            self._parts.append((path, os.path.getsize(path)))
+            self._parts.append(b'\r\n')
+        self._parts.append(('--%s--\r\n' % self.boundary).encode('utf-8'))
+
+        self._length = sum(len(part) if isinstance(part, bytes) else part[1] for part in self._parts)
+        self._position = 0
+        self._index = 0
+        self._offset = 0
+        self._file = None
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=io.SEEK_SET):
+        """Move to position so the body can be sent again (i.e. when a request is retried)."""
+
+        if whence == io.SEEK_CUR:
+            position += self._position
+        elif whence == io.SEEK_END:
+            position += self._length
+        self._close_file()
+        self._position = min(max(position, 0), self._length)
+        self._index, self._offset = 0, self._position
+        while self._index < len(self._parts) and self._offset >= self._part_length(self._index):
+            self._offset -= self._part_length(self._index)
+            self._index += 1
+        return self._position
+
+    def read(self, size=-1):
+        """Read up to size bytes of the body (all remaining bytes when size is negative)."""
+
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, bytes):
+                chunk = part[self._offset:self._offset + size]
+            else:
+                if self._file is None:
+                    self._file = open(part[0], 'rb')
+                    self._file.seek(self._offset)
+                chunk = self._file.read(min(size, part[1] - self._offset))
+                if not chunk:
+                    raise IOError('File ' + part[0] + ' changed size while being uploaded.')
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+            if self._offset >= self._part_length(self._index):
+                self._close_file()
+                self._index += 1
+                self._offset = 0
+        return b''.join(chunks)
+
+    def close(self):
+        self._close_file()
+
+    def _part_length(self, index):
+        part = self._parts[index]
+        return len(part) if isinstance(part, bytes) else part[1]
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iter_paged(fetch_page, items_key, next_start, start=0):
+    """Yield items of a paged API one at a time, prefetching the next page in the background.
+
+    While the caller works through the items of the current page, the request for the next page is already in flight
+    on a worker thread. At most two pages are held in memory at any time, however large the result set is.
+
+    :param fetch_page: Callable taking the start index and returning the decoded JSON page.
+    :type fetch_page: callable
+    :param items_key: Key of the list of items in each page (i.e. 'values' or 'issues').
+    :type items_key: str
+    :param next_start: Callable taking a decoded page and returning the start index of the next page, or None when the
+        page is the last one.
+    :type next_start: callable
+    :param start: Index of the first item to fetch.
+    :type start: int
+    :return: Generator of items.
+    :rtype: collections.abc.Iterator[dict]
+    """
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch_page, start)
+        while future is not None:
+            page = future.result()
+            start = next_start(page)
+            future = executor.submit(fetch_page, start) if start is not None else None
+            items = page.get(items_key, [])
+            del page
+            for item in items:
+                yield item
+
+
+def bitbucket_next_start(page):
+    """Start index of the next page of a BitBucket paged response (isLastPage/nextPageStart)."""
+
+    if page.get('isLastPage', True):
+        return None
+    return page['nextPageStart']
+
+
+def jira_next_start(page, items_key='issues'):
+    """Start index of the next page of a Jira paged response (startAt/maxResults/total)."""
+
+    count = len(page.get(items_key, []))
+    start = page.get('startAt', 0) + count
+    if count == 0 or start >= page.get('total', 0):
+        return None
+    return start
+
+
+async def aiter_paged(fetch_page, items_key, next_start, start=0):
+    """Asynchronous counterpart of iter_paged.
+
+    fetch_page is a coroutine function. The next page is requested as a task while the caller consumes the items of
+    the current page.
+
+    :param fetch_page: Coroutine function taking the start index and returning the decoded JSON page.
+    :type fetch_page: callable
+    :param items_key: Key of the list of items in each page (i.e. 'values' or 'issues').
+    :type items_key: str
+    :param next_start: Callable taking a decoded page and returning the start index of the next page, or None.
+    :type next_start: callable
+    :param start: Index of the first item to fetch.
+    :type start: int
+    :return: Asynchronous generator of items.
+    :rtype: collections.abc.AsyncIterator[dict]
+    """
+
+    task = asyncio.ensure_future(fetch_page(start))
+    try:
+        while task is not None:
+            page = await task
+            start = next_start(page)
+            task = asyncio.ensure_future(fetch_page(start)) if start is not None else None
+            items = page.get(items_key, [])
+            del page
+            for item in items:
+                yield item
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
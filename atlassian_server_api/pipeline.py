@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from atlassian_server_api.git import Git
+
+STAGES = ('create_repo', 'push', 'branch', 'issue')
+
+
+class ProvisioningPipeline:
+    """Provision many repositories as a staged, concurrent pipeline.
+
+    Every repository of the manifest goes through these stages, in order:
+
+    create_repo - BitBucket.create_repo. A 409 (the repository already exists) counts as done, and the slug and clone
+        URL are read from the existing repository with BitBucket.get_repo.
+    push - Git.git_init (unless already a repository), git_add_all and git_commit when there are changes,
+        git_add_remote (unless the remote exists), and git_push_remote.
+    branch - BitBucket.branch_repo for every branch of the entry. A 409 (the branch already exists) counts as done.
+    issue - Jira.create_issue, when a jira client is given and the entry has an issue.
+
+    Each stage has its own thread pool, so HTTP stages of one repository overlap with git stages of another, and the
+    parallelism of each stage is bounded separately. Completed stages are recorded in the state file, so running the
+    same manifest again skips them and resumes where a previous run stopped (and never creates an issue twice).
+
+    pipeline = ProvisioningPipeline(bitbucket, jira, state_path='provision.json',
+                                    remote_url='ssh://git@localhost:7999/proj/{slug}.git')
+    report = pipeline.run([{'name': 'service-a', 'working_directory': '/src/service-a', 'branches': ['develop'],
+                            'issue': {'summary': 'Set up service-a'}}])
+    """
+
+    def __init__(self, bitbucket, jira=None, remote_url=None, state_path=None, workers=None, default_branch='master',
+                 commit_message='Initial commit', git_timeout=None, instrumentation=None):
+        """Initialize ProvisioningPipeline with the clients and settings shared by all repositories.
+
+        :param bitbucket: Client creating repositories and branches.
+        :type bitbucket: atlassian_server_api.bitbucket.BitBucket
+        :param jira: Client creating tracking issues (None to skip the issue stage).
+        :type jira: atlassian_server_api.jira.Jira
+        :param remote_url: Remote URL of a repository, as a format string with {name}, {slug} and {project_key}
+            (i.e. 'ssh://git@localhost:7999/{project_key}/{slug}.git') or a callable taking the manifest entry. Defaults
+            to the clone URL returned by create_repo. An entry's own remote_url takes precedence.
+        :type remote_url: str | callable
+        :param state_path: JSON file recording completed stages, so runs can resume. None keeps no state.
+        :type state_path: str
+        :param workers: Number of concurrent tasks per stage (i.e. {'push': 2}). Defaults to 8 for HTTP stages and 4 for
+            git stages.
+        :type workers: dict[str, int]
+        :param default_branch: Branch pushed to the remote.
+        :type default_branch: str
+        :param commit_message: Message of the commit made when a working directory has uncommitted changes.
+        :type commit_message: str
+        :param git_timeout: Seconds after which a git command is killed.
+        :type git_timeout: float
+        :param instrumentation: Receives an event for every git command (HTTP requests are reported by the clients'
+            transports).
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
+        """
+        self.bitbucket = bitbucket
+        self.jira = jira
+        self.remote_url = remote_url
+        self.state_path = state_path
+        self.workers = {'create_repo': 8, 'push': 4, 'branch': 8, 'issue': 8}
+        self.workers.update(workers or {})
+        self.default_branch = default_branch
+        self.commit_message = commit_message
+        self.git_timeout = git_timeout
+        self.instrumentation = instrumentation
+
+        self._lock = threading.Lock()
+        self._state = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self._state = json.load(f)
+
+    def run(self, manifest):
+        """Provision every repository of the manifest.
+
+        :param manifest: Repositories to provision. Each is a dict with name and working_directory, and optionally
+            branches (list of branch names), issue (create_issue keyword arguments) and remote_url.
+        :type manifest: list[dict]
+        :return: Report with the outcome of every stage of every repository and timings per stage:
+            {'seconds': 1.2,
+             'repos': {'service-a': {'ok': True, 'error': None, 'stages': {'create_repo': {'status': 'done',
+                                                                                           'seconds': 0.1}, ...}}},
+             'stages': {'create_repo': {'count': 1, 'seconds': 0.1, 'max_seconds': 0.1}, ...}}
+            A stage status is 'done', 'skipped' (nothing to do or done by a previous run) or 'failed'.
+        :rtype: dict
+        """
+
+        entries = [dict(entry) for entry in manifest]
+        report = {'seconds': None, 'repos': {}, 'stages': {stage: {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+                                                           for stage in STAGES}}
+        for entry in entries:
+            report['repos'][entry['name']] = {'ok': None, 'error': None, 'stages': {}}
+
+        remaining = [len(entries)]
+        finished = threading.Condition()
+        pools = {stage: ThreadPoolExecutor(max_workers=self.workers[stage]) for stage in STAGES}
+
+        def finish():
+            with finished:
+                remaining[0] -= 1
+                finished.notify_all()
+
+        def run_stage(entry, index):
+            stage = STAGES[index]
+            repo_report = report['repos'][entry['name']]
+            start = time.perf_counter()
+            try:
+                status = self._run_stage(stage, entry)
+            except Exception as e:
+                status = 'failed'
+                repo_report['error'] = '%s failed: %s' % (stage, self._describe(e))
+            seconds = time.perf_counter() - start
+
+            with self._lock:
+                repo_report['stages'][stage] = {'status': status, 'seconds': seconds}
+                timing = report['stages'][stage]
+                timing['count'] += 1
+                timing['seconds'] += seconds
+                timing['max_seconds'] = max(timing['max_seconds'], seconds)
+
+            if status == 'failed' or index + 1 == len(STAGES):
+                repo_report['ok'] = status != 'failed'
+                finish()
+            else:
+                pools[STAGES[index + 1]].submit(run_stage, entry, index + 1)
+
+        start = time.perf_counter()
+        try:
+            for entry in entries:
+                pools[STAGES[0]].submit(run_stage, entry, 0)
+            with finished:
+                finished.wait_for(lambda: remaining[0] == 0)
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+        report['seconds'] = time.perf_counter() - start
+        return report
+
+    def _run_stage(self, stage, entry):
+        state = self._repo_state(entry['name'])
+        if state.get(stage) == 'done':
+            return 'skipped'
+
+        status = getattr(self, '_' + stage)(entry, state)
+        self._save_state(entry['name'], stage, 'done')
+        return status
+
+    def _create_repo(self, entry, state):
+        r = self.bitbucket.create_repo(entry['name'])
+        status = 'done'
+        if r.status_code == 409:
+            # created by an earlier run or by someone else: its slug and clone URL are those of the existing repository
+            r = self.bitbucket.get_repo(slugify(entry['name']))
+            status = 'skipped'
+        r.raise_for_status()
+
+        repo = r.json()
+        clone_urls = {link.get('name'): link.get('href') for link in repo.get('links', {}).get('clone', [])}
+        self._save_state(entry['name'], 'slug', repo.get('slug', slugify(entry['name'])))
+        if clone_urls:
+            self._save_state(entry['name'], 'clone_url', clone_urls.get('http') or next(iter(clone_urls.values())))
+        return status
+
+    def _push(self, entry, state):
+        working_directory = entry['working_directory']
+        repo = Git(working_directory, timeout=self.git_timeout, instrumentation=self.instrumentation)
+
+        if not os.path.isdir(os.path.join(working_directory, '.git')):
+            repo.git_init()
+        if any(repo.status().values()):
+            repo.git_add_all()
+            repo.git_commit(self.commit_message)
+        if repo.git_get_remote_url() is None:
+            repo.git_add_remote(self._remote_url(entry, state))
+        repo.git_push_remote(branch=self.default_branch)
+        return 'done'
+
+    def _branch(self, entry, state):
+        slug = state.get('slug', slugify(entry['name']))
+        status = 'skipped'
+        for branch in entry.get('branches', []):
+            if state.get('branch:' + branch) == 'done':
+                continue
+            r = self.bitbucket.branch_repo(slug, branch)
+            if r.status_code != 409:
+                r.raise_for_status()
+                status = 'done'
+            self._save_state(entry['name'], 'branch:' + branch, 'done')
+        return status
+
+    def _issue(self, entry, state):
+        if self.jira is None or not entry.get('issue'):
+            return 'skipped'
+        r = self.jira.create_issue(**entry['issue'])
+        r.raise_for_status()
+        self._save_state(entry['name'], 'issue_key', r.json().get('key'))
+        return 'done'
+
+    def _remote_url(self, entry, state):
+        if entry.get('remote_url'):
+            return entry['remote_url']
+        if callable(self.remote_url):
+            return self.remote_url(entry)
+        if self.remote_url:
+            return self.remote_url.format(name=entry['name'], slug=state.get('slug', slugify(entry['name'])),
+                                          project_key=self.bitbucket.project_key)
+        if state.get('clone_url'):
+            return state['clone_url']
+        raise ValueError('No remote URL for repository ' + entry['name'] + '.')
+
+    def _repo_state(self, name):
+        with self._lock:
+            return dict(self._state.get(name, {}))
+
+    def _save_state(self, name, key, value):
+        with self._lock:
+            self._state.setdefault(name, {})[key] = value
+            if self.state_path:
+                temp_path = self.state_path + '.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump(self._state, f, indent=2, sort_keys=True)
+                os.replace(temp_path, self.state_path)
+
+    @staticmethod
+    def _describe(error):
+        if isinstance(error, subprocess.CalledProcessError) and error.stderr:
+            return error.stderr.decode('utf-8', 'replace').strip()
+        return str(error)
+
+
+def slugify(name):
+    """Repository slug BitBucket derives from a repository name (i.e. 'My Repo' -> 'my-repo').
+
+    :param name: Name of the repository.
+    :type name: str
+    :rtype: str
+    """
+
+    return re.sub(r'[^a-z0-9_.-]+', '-', name.lower()).strip('-')
@@ -0,0 +1,304 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class TokenBucket:
+    """Token bucket limiting the request rate to one host.
+
+    Tokens are added at rate per second up to capacity; every request takes one. The bucket can also be paused, i.e.
+    when the server answers with Retry-After, so every worker waits instead of only the one that was throttled.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        """Initialize TokenBucket with its rate and burst size.
+
+        :param rate: Requests per second. None for no rate limit (the bucket can still be paused).
+        :type rate: float
+        :param capacity: Maximum burst of requests. Defaults to rate (at least 1).
+        :type capacity: float
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate or 1, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the number of seconds to wait before using it.
+
+        :rtype: float
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate is None:
+                return wait
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def pause(self, seconds):
+        """Hold back every request to the host for seconds.
+
+        :param seconds: Seconds to pause.
+        :type seconds: float
+        """
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RetryBudget:
+    """Limits retries to a fraction of requests, so retries cannot multiply the load on a struggling server.
+
+    Every request deposits ratio tokens, every retry withdraws one. The balance starts at, and is capped to, capacity.
+    """
+
+    def __init__(self, ratio=0.2, capacity=10):
+        """Initialize RetryBudget.
+
+        :param ratio: Retries allowed per request on average (i.e. 0.2 allows one retry per five requests).
+        :type ratio: float
+        :param capacity: Retries allowed in a burst.
+        :type capacity: float
+        """
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Take one retry from the budget. Returns False when the budget is exhausted.
+
+        :rtype: bool
+        """
+
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RequestScheduler:
+    """Rate limits and retries requests sent through a Transport or AsyncTransport.
+
+    Requests to each host pass a TokenBucket. Responses with a retryable status (429, 502, 503, 504) and connection
+    errors are retried with exponential backoff and full jitter, waiting for Retry-After instead when the server sends
+    it. A Retry-After also pauses the host's bucket, so all workers back off together and throughput settles at the
+    server's limit. Only idempotent requests are retried, except that any request is retried after 429 or 503 with
+    Retry-After, which mean the request was refused before being processed. Retries of failures (other statuses and
+    connection errors) also draw from a shared RetryBudget.
+
+    scheduler = RequestScheduler(rate=20, max_retries=5)
+    transport = Transport(auth=auth, scheduler=scheduler)
+    """
+
+    def __init__(self, rate=None, burst=None, max_retries=3, backoff=0.5, max_backoff=30.0,
+                 retry_statuses=(429, 502, 503, 504), retry_budget=None):
+        """Initialize RequestScheduler.
+
+        :param rate: Requests per second per host. None for no rate limit.
+        :type rate: float
+        :param burst: Requests allowed in a burst per host. Defaults to rate.
+        :type burst: float
+        :param max_retries: Maximum number of retries of one request.
+        :type max_retries: int
+        :param backoff: Base delay in seconds; retry n waits a random time up to backoff * 2 ** n.
+        :type backoff: float
+        :param max_backoff: Upper bound of the backoff delay and of Retry-After, in seconds.
+        :type max_backoff: float
+        :param retry_statuses: Response status codes that are retried.
+        :type retry_statuses: tuple[int]
+        :param retry_budget: Budget shared by all retries. Defaults to RetryBudget().
+        :type retry_budget: RetryBudget
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Counters of requests sent, retries, and throttled responses (429 or 503 with Retry-After).
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {'requests': self.requests, 'retries': self.retries, 'throttled': self.throttled}
+
+    def bucket(self, url):
+        """Return the TokenBucket of the host of url.
+
+        :rtype: TokenBucket
+        """
+
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def send(self, method, url, send):
+        """Send a request, waiting for the host's bucket and retrying as configured.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param send: Callable sending the request and returning the response.
+        :type send: callable
+        :return: The last response. Its retries attribute holds the number of retries.
+        :rtype: requests.Response
+        :raises requests.ConnectionError: If the last attempt failed to connect.
+        """
+
+        bucket = self.bucket(url)
+        self._count_request()
+        attempt = 0
+        while True:
+            time.sleep(bucket.reserve())
+            try:
+                r = send()
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._retry_delay(method, bucket, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, bucket, attempt, r)
+                if delay is None:
+                    r.retries = attempt
+                    return r
+                self._discard(r)
+            time.sleep(delay)
+            attempt += 1
+
+    async def send_async(self, method, url, send, connection_errors=(ConnectionError, asyncio.TimeoutError)):
+        """Asynchronous counterpart of send.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param send: Coroutine function sending the request and returning the response.
+        :type send: callable
+        :param connection_errors: Exceptions treated as connection errors.
+        :type connection_errors: tuple[type]
+        :rtype: requests.Response
+        """
+
+        bucket = self.bucket(url)
+        self._count_request()
+        attempt = 0
+        while True:
+            await asyncio.sleep(bucket.reserve())
+            try:
+                r = await send()
+            except connection_errors:
+                delay = self._retry_delay(method, bucket, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, bucket, attempt, r)
+                if delay is None:
+                    r.retries = attempt
+                    return r
+                self._discard(r)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _discard(r):
+        """Close a response that is retried.
+
+        Its (error) body is read first, so a streamed response returns its connection to the pool.
+        """
+
+        try:
+            r.content
+        except (requests.RequestException, RuntimeError):
+            pass
+        r.close()
+
+    def _count_request(self):
+        self.retry_budget.deposit()
+        with self._lock:
+            self.requests += 1
+
+    def _retry_delay(self, method, bucket, attempt, response=None):
+        """Seconds to wait before retrying, or None if the request must not be retried."""
+
+        retry_after = None
+        if response is not None:
+            if response.status_code not in self.retry_statuses:
+                return None
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None and response.status_code in (429, 503):
+                retry_after = min(retry_after, self.max_backoff)
+                bucket.pause(retry_after)
+                with self._lock:
+                    self.throttled += 1
+
+        refused = retry_after is not None and response.status_code in (429, 503)
+        if method.upper() not in IDEMPOTENT_METHODS and not refused:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        # the server paces refused requests itself; the budget guards against retry storms on failures
+        if not refused and not self.retry_budget.withdraw():
+            return None
+
+        with self._lock:
+            self.retries += 1
+        if retry_after is not None:
+            # the bucket is paused until then; waiting on it keeps the retry behind the pause
+            return 0.0
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """Seconds to wait according to a Retry-After header (delay in seconds or HTTP date), or None.
+
+    :param value: Value of the Retry-After header.
+    :type value: str
+    :rtype: float
+    """
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
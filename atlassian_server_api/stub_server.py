@@ -0,0 +1,641 @@
+import argparse
+import calendar
+import gzip
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from atlassian_server_api.pipeline import slugify
+
+
+JIRA_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000+0000'
+
+JQL_CLAUSE = re.compile(r'^\s*(\w+)\s*(!=|>=|<=|=|>|<)\s*(?:"([^"]*)"|(\S+))\s*$')
+
+
+def jira_time(timestamp=None):
+    """Format a UTC timestamp the way Jira formats created/updated fields."""
+
+    return time.strftime(JIRA_TIME_FORMAT, time.gmtime(timestamp))
+
+
+def parse_jql_time(value):
+    """Parse a JQL date ("yyyy/MM/dd HH:mm", "yyyy-MM-dd HH:mm" or "yyyy-MM-dd") or a Jira timestamp as UTC."""
+
+    value = value.replace('/', '-')
+    for time_format in ('%Y-%m-%d %H:%M', '%Y-%m-%d', JIRA_TIME_FORMAT):
+        try:
+            return calendar.timegm(time.strptime(value, time_format))
+        except ValueError:
+            continue
+    raise ValueError('Unsupported date: ' + value)
+
+
+def filler(size):
+    """Text of size characters, used to give seeded issues a realistic payload."""
+
+    text = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '
+    return (text * (size // len(text) + 1))[:size]
+
+
+def match_jql(issue, jql):
+    """Whether issue matches jql.
+
+    Supports clauses joined by AND, comparing project, key, status, assignee, issuetype or summary with = and !=, and
+    created or updated with =, !=, >, >=, < and <=. ORDER BY is ignored.
+    """
+
+    jql = re.split(r'\s+order\s+by\s+', jql, flags=re.IGNORECASE)[0].strip()
+    if not jql:
+        return True
+
+    for clause in re.split(r'\s+and\s+', jql, flags=re.IGNORECASE):
+        match = JQL_CLAUSE.match(clause)
+        if not match:
+            raise ValueError('Unsupported JQL clause: ' + clause)
+        field, operator, value = match.group(1).lower(), match.group(2), match.group(3) or match.group(4)
+
+        if field == 'key':
+            actual = issue['key']
+        elif field in ('created', 'updated'):
+            actual, value = parse_jql_time(issue['fields'][field]), parse_jql_time(value)
+        else:
+            actual = issue['fields'].get(field)
+            if isinstance(actual, dict):
+                actual = actual.get('key') if field == 'project' else actual.get('name')
+
+        if operator == '=':
+            matched = actual == value
+        elif operator == '!=':
+            matched = actual != value
+        elif field not in ('created', 'updated'):
+            raise ValueError('Unsupported JQL comparison: ' + clause)
+        else:
+            matched = {'>': actual > value, '>=': actual >= value, '<': actual < value, '<=': actual <= value}[operator]
+        if not matched:
+            return False
+    return True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler emulating the subset of the Jira and BitBucket REST APIs used by this package."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # keep benchmark and test output quiet
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stub.count_connection()
+
+    def do_GET(self):
+        stub = self.server.stub
+        if not self.begin():
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        fields = query['fields'][0].split(',') if 'fields' in query else None
+
+        match = re.match(r'^/rest/api/2/issue/([^/]+)$', url.path)
+        if match and match.group(1) in stub.issues:
+            return self.send_json(200, stub.project(stub.issues[match.group(1)], fields))
+
+        if url.path == '/rest/api/2/issue':
+            start = int(query.get('startAt', ['0'])[0])
+            limit = int(query.get('maxResults', ['50'])[0])
+            page = stub.jira_page(list(stub.issues.values()), start, limit, 'issues')
+            page['issues'] = [stub.project(issue, fields) for issue in page['issues']]
+            return self.send_json(200, page)
+
+        if url.path == '/rest/api/2/search':
+            try:
+                issues = [issue for issue in list(stub.issues.values()) if match_jql(issue, query.get('jql', [''])[0])]
+            except ValueError as e:
+                return self.send_json(400, {'errorMessages': [str(e)]})
+            start = int(query.get('startAt', ['0'])[0])
+            limit = int(query.get('maxResults', ['50'])[0])
+            page = stub.jira_page(issues, start, limit, 'issues')
+            page['issues'] = [stub.project(issue, fields) for issue in page['issues']]
+            return self.send_json(200, page)
+
+        match = re.match(r'^/rest/api/1\.0/projects/([^/]+)/repos/?$', url.path)
+        if match and match.group(1) == stub.project_key:
+            return self.send_json(200, stub.bitbucket_page(list(stub.repos.values()), query))
+
+        match = re.match(r'^/rest/api/1\.0/projects/([^/]+)/repos/([^/]+)$', url.path)
+        if match and match.group(1) == stub.project_key and match.group(2) in stub.repos:
+            return self.send_json(200, stub.repos[match.group(2)])
+
+        match = re.match(r'^/rest/api/1\.0/projects/([^/]+)/repos/([^/]+)/branches$', url.path)
+        if match and match.group(1) == stub.project_key and match.group(2) in stub.branches:
+            return self.send_json(200, stub.bitbucket_page(stub.branches[match.group(2)], query))
+
+        return self.send_json(404, {'errorMessages': ['Not found: ' + self.path]})
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.read_body()
+        if not self.begin():
+            return
+
+        url = urlsplit(self.path)
+
+        if url.path == '/rest/api/2/issue':
+            fields = json.loads(body.decode('utf-8'))['fields']
+            issue = stub.add_issue(fields['summary'], fields.get('description', ''), fields['issuetype']['name'])
+            return self.send_json(201, stub.issue_link(issue))
+
+        if url.path == '/rest/api/2/issue/bulk':
+            created, errors = [], []
+            for i, update in enumerate(json.loads(body.decode('utf-8'))['issueUpdates']):
+                fields = update['fields']
+                if not fields.get('summary'):
+                    errors.append({'status': 400, 'failedElementNumber': i, 'elementErrors': {
+                        'errorMessages': [], 'errors': {'summary': 'You must specify a summary of the issue.'}}})
+                    continue
+                issue = stub.add_issue(fields['summary'], fields.get('description', ''), fields['issuetype']['name'])
+                created.append(stub.issue_link(issue))
+            return self.send_json(400 if errors else 201, {'issues': created, 'errors': errors})
+
+        match = re.match(r'^/rest/api/2/issue/([^/]+)/attachments$', url.path)
+        if match and match.group(1) in stub.issues:
+            files = self.parse_multipart(body)
+            return self.send_json(200, stub.add_attachments(match.group(1), files))
+
+        match = re.match(r'^/rest/api/1\.0/projects/([^/]+)/repos$', url.path)
+        if match and match.group(1) == stub.project_key:
+            name = json.loads(body.decode('utf-8'))['name']
+            if slugify(name) in stub.repos:
+                return self.send_json(409, {'errors': [{'message': 'This repository URL is already taken.'}]})
+            return self.send_json(201, stub.add_repo(name))
+
+        match = re.match(r'^/rest/api/1\.0/projects/([^/]+)/repos/([^/]+)/branches$', url.path)
+        if match and match.group(1) == stub.project_key and match.group(2) in stub.branches:
+            name = json.loads(body.decode('utf-8'))['name']
+            branch = stub.add_branch(match.group(2), name)
+            if branch is None:
+                return self.send_json(409, {'errors': [{'message': 'Branch ' + name + ' already exists.'}]})
+            return self.send_json(200, branch)
+
+        return self.send_json(404, {'errorMessages': ['Not found: ' + self.path]})
+
+    def do_DELETE(self):
+        stub = self.server.stub
+        if not self.begin():
+            return
+
+        match = re.match(r'^/rest/api/2/attachment/([^/]+)$', urlsplit(self.path).path)
+        if match and stub.delete_attachment(match.group(1)):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        return self.send_json(404, {'errorMessages': ['Not found: ' + self.path]})
+
+    def begin(self):
+        """Count the request, apply latency, inject errors, and answer 429 when throttled.
+
+        Returns False if the request was already answered.
+        """
+
+        stub = self.server.stub
+        stub.count_request()
+        status = stub.injected_error(self.command, self.path)
+        if status is not None:
+            self.send_json(status, {'errorMessages': ['Injected error.']})
+            return False
+        if stub.throttle():
+            self.send_json(429, {'errorMessages': ['Rate limit exceeded.']},
+                           headers={'Retry-After': str(stub.retry_after)})
+            return False
+        if stub.latency:
+            time.sleep(stub.latency)
+        return True
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if not size:
+                    break
+                chunks.append(chunk)
+            body = b''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        encoding = self.headers.get('Content-Encoding', '').lower()
+        if encoding == 'gzip':
+            return gzip.decompress(body)
+        if encoding == 'deflate':
+            return zlib.decompress(body)
+        return body
+
+    def parse_multipart(self, body):
+        """Return a list of (filename, content) tuples of a multipart/form-data body."""
+
+        head = b'Content-Type: ' + self.headers['Content-Type'].encode('latin-1') + b'\r\n\r\n'
+        message = BytesParser(policy=HTTP).parsebytes(head + body)
+        return [(part.get_filename(), part.get_payload(decode=True)) for part in message.iter_parts()]
+
+    def compress(self, body):
+        """Compress body with the first of gzip and deflate the client accepts, if it is large enough."""
+
+        stub = self.server.stub
+        if stub.compress_min_size is None or len(body) < stub.compress_min_size:
+            return body
+        accepted = [encoding.split(';')[0].strip().lower()
+                    for encoding in self.headers.get('Accept-Encoding', '').split(',')]
+        if 'gzip' in accepted:
+            self.send_header('Content-Encoding', 'gzip')
+            return gzip.compress(body, compresslevel=6)
+        if 'deflate' in accepted:
+            self.send_header('Content-Encoding', 'deflate')
+            return zlib.compress(body, 6)
+        return body
+
+    def end_headers(self):
+        if self.close_connection:
+            # the connection is closed after this response, so the client must not reuse it
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.command == 'GET' and status == 200 and self.headers.get('If-None-Match') == etag:
+            self.server.stub.count_not_modified()
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        body = self.compress(body)
+        self.send_header('Content-Length', str(len(body)))
+        if self.command == 'GET' and status == 200:
+            self.send_header('ETag', etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer:
+    """In-process HTTP server standing in for Jira and BitBucket Server.
+
+    Runs on a background thread on localhost so clients can be exercised and benchmarked without a live Atlassian
+    instance:
+
+    with StubServer(latency=0.001) as server:
+        jira = Jira(server.base_http_url, 'PROJ', auth=('user', 'password'))
+        jira.get_issues('PROJ-1')
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, project_key='PROJ', issue_count=10, repo_count=3,
+                 branch_count=1, max_page_size=None, throttle_rate=None, throttle_burst=None, retry_after=1,
+                 payload_size=0, error_rate=0.0, error_status=500, seed=None, compress_min_size=None):
+        """Initialize StubServer with the listening address, simulated latency, errors, and seeded data.
+
+        :param host: Address to listen on.
+        :type host: str
+        :param port: Port to listen on (0 picks a free port).
+        :type port: int
+        :param latency: Seconds to sleep before answering each request.
+        :type latency: float
+        :param project_key: Key of the seeded project.
+        :type project_key: str
+        :param issue_count: Number of issues to seed (PROJ-1 ... PROJ-n).
+        :type issue_count: int
+        :param repo_count: Number of repositories to seed (repo-1 ... repo-n).
+        :type repo_count: int
+        :param branch_count: Number of branches to seed per repository (master plus branch-1 ...).
+        :type branch_count: int
+        :param max_page_size: Upper bound applied to the page size requested by clients (None for no bound).
+        :type max_page_size: int
+        :param throttle_rate: Requests per second served before answering 429 (None for no throttling).
+        :type throttle_rate: float
+        :param throttle_burst: Requests served in a burst when throttling. Defaults to throttle_rate.
+        :type throttle_burst: float
+        :param retry_after: Value of the Retry-After header of 429 responses, in seconds.
+        :type retry_after: float
+        :param payload_size: Length of the description of every seeded issue, in characters.
+        :type payload_size: int
+        :param error_rate: Fraction of requests answered with error_status (i.e. 0.01 for one in a hundred).
+        :type error_rate: float
+        :param error_status: Status code of the errors injected by error_rate.
+        :type error_status: int
+        :param seed: Seed of the random choice of failing requests, for reproducible runs.
+        :type seed: int
+        :param compress_min_size: Compress response bodies of at least this many bytes with gzip or deflate, when the
+            client accepts them (None to never compress).
+        :type compress_min_size: int
+        """
+        self.latency = latency
+        self.project_key = project_key
+        self.max_page_size = max_page_size
+        self.throttle_rate = throttle_rate
+        self.throttle_burst = throttle_burst if throttle_burst is not None else throttle_rate
+        self.retry_after = retry_after
+        self.throttled_count = 0
+        self._throttle_tokens = self.throttle_burst
+        self._throttle_updated = time.monotonic()
+        self.request_count = 0
+        self.connection_count = 0
+        self.attachment_count = 0
+        self.not_modified_count = 0
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_count = 0
+        self.compress_min_size = compress_min_size
+        self._injected_errors = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self._thread = None
+
+        self.issues = {}
+        for i in range(1, issue_count + 1):
+            self.add_issue('Issue %d' % i, filler(payload_size))
+
+        self.repos = {}
+        self.branches = {}
+        for i in range(1, repo_count + 1):
+            self.add_repo('repo-%d' % i, branch_count)
+
+    @property
+    def base_http_url(self):
+        """Base URL of the running server (i.e. http://127.0.0.1:54321/)."""
+
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def add_issue(self, summary, description='', issue_type='Task'):
+        """Seed an issue and return it."""
+
+        with self._lock:
+            number = len(self.issues) + 1
+            key = '%s-%d' % (self.project_key, number)
+            issue = {
+                'id': str(10000 + number),
+                'key': key,
+                'fields': {
+                    'project': {'key': self.project_key},
+                    'summary': summary,
+                    'description': description,
+                    'issuetype': {'name': issue_type},
+                    'status': {'name': 'Open'},
+                    'assignee': None,
+                    'created': jira_time(),
+                    'updated': jira_time(),
+                    'attachment': []
+                }
+            }
+            self.issues[key] = issue
+        return issue
+
+    def update_issue(self, key, **fields):
+        """Change fields of a seeded issue (i.e. status={'name': 'Done'}) and bump its updated time."""
+
+        with self._lock:
+            issue = self.issues[key]
+            issue['fields'].update(fields)
+            if 'updated' not in fields:
+                issue['fields']['updated'] = jira_time()
+        return issue
+
+    def add_repo(self, name, branch_count=1):
+        """Seed a repository with master plus branch_count - 1 branches and return it."""
+
+        with self._lock:
+            slug = slugify(name)
+            repo = {
+                'id': len(self.repos) + 1,
+                'slug': slug,
+                'name': name,
+                'scmId': 'git',
+                'project': {'key': self.project_key},
+                'links': {'clone': [
+                    {'href': self.base_http_url + 'scm/' + self.project_key.lower() + '/' + slug + '.git',
+                     'name': 'http'}
+                ]}
+            }
+            self.repos[slug] = repo
+            self.branches[slug] = [
+                {'id': 'refs/heads/' + branch, 'displayId': branch, 'type': 'BRANCH', 'isDefault': branch == 'master'}
+                for branch in ['master'] + ['branch-%d' % i for i in range(1, branch_count)]
+            ]
+        return repo
+
+    def add_branch(self, repo_name, branch_name):
+        """Add a branch to a seeded repository and return it, or None if it already exists."""
+
+        with self._lock:
+            branches = self.branches[repo_name]
+            if any(branch['displayId'] == branch_name for branch in branches):
+                return None
+            branch = {'id': 'refs/heads/' + branch_name, 'displayId': branch_name, 'type': 'BRANCH',
+                      'isDefault': False}
+            branches.append(branch)
+        return branch
+
+    def add_attachments(self, issue_key, files):
+        """Attach (filename, content) tuples to an issue and return the new attachment objects."""
+
+        created = []
+        with self._lock:
+            attachments = self.issues[issue_key]['fields']['attachment']
+            for filename, content in files:
+                self.attachment_count += 1
+                attachment = {
+                    'id': str(self.attachment_count),
+                    'self': self.base_http_url + 'rest/api/2/attachment/' + str(self.attachment_count),
+                    'filename': filename,
+                    'size': len(content),
+                    'mimeType': 'application/octet-stream'
+                }
+                attachments.append(attachment)
+                created.append(attachment)
+        return created
+
+    def delete_attachment(self, attachment_id):
+        """Remove an attachment from its issue. Returns False if there is no such attachment."""
+
+        with self._lock:
+            for issue in self.issues.values():
+                attachments = issue['fields']['attachment']
+                for i, attachment in enumerate(attachments):
+                    if attachment['id'] == attachment_id:
+                        del attachments[i]
+                        return True
+        return False
+
+    def issue_link(self, issue):
+        return {'id': issue['id'], 'key': issue['key'], 'self': self.base_http_url + 'rest/api/2/issue/' + issue['id']}
+
+    @staticmethod
+    def project(issue, fields):
+        """Copy of issue holding only the requested fields (all fields for None, '*all' or '*navigable')."""
+
+        if not fields or '*all' in fields or '*navigable' in fields:
+            return issue
+        return dict(issue, fields={name: value for name, value in issue['fields'].items() if name in fields})
+
+    def page_size(self, requested):
+        if self.max_page_size is not None:
+            return min(requested, self.max_page_size)
+        return requested
+
+    def jira_page(self, items, start, limit, items_key):
+        """Slice items into a Jira style page (startAt/maxResults/total)."""
+
+        limit = self.page_size(limit)
+        return {'startAt': start, 'maxResults': limit, 'total': len(items), items_key: items[start:start + limit]}
+
+    def bitbucket_page(self, items, query):
+        """Slice items into a BitBucket style page (isLastPage/nextPageStart)."""
+
+        start = int(query.get('start', ['0'])[0])
+        limit = self.page_size(int(query.get('limit', ['25'])[0]))
+        values = items[start:start + limit]
+        page = {'size': len(values), 'limit': limit, 'start': start, 'values': values,
+                'isLastPage': start + limit >= len(items)}
+        if not page['isLastPage']:
+            page['nextPageStart'] = start + limit
+        return page
+
+    def throttle(self):
+        """Whether the current request exceeds throttle_rate and must be answered with 429."""
+
+        if self.throttle_rate is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._throttle_tokens = min(self.throttle_burst,
+                                        self._throttle_tokens + (now - self._throttle_updated) * self.throttle_rate)
+            self._throttle_updated = now
+            if self._throttle_tokens < 1:
+                self.throttled_count += 1
+                return True
+            self._throttle_tokens -= 1
+            return False
+
+    def inject_error(self, status=500, count=1, method=None, path=None):
+        """Answer the next count requests matching method and path with status.
+
+        :param status: Status code of the error responses.
+        :type status: int
+        :param count: Number of requests to fail.
+        :type count: int
+        :param method: HTTP method of the requests to fail (None for any).
+        :type method: str
+        :param path: Regular expression searched in the path of the requests to fail (None for any).
+        :type path: str
+        """
+
+        with self._lock:
+            self._injected_errors.append([method, path, status, count])
+
+    def injected_error(self, method, path):
+        """Status code to answer the request with instead of handling it, or None."""
+
+        with self._lock:
+            for injected in self._injected_errors:
+                injected_method, injected_path, status, count = injected
+                if (injected_method is None or injected_method == method) and \
+                        (injected_path is None or re.search(injected_path, path)):
+                    if count == 1:
+                        self._injected_errors.remove(injected)
+                    else:
+                        injected[3] -= 1
+                    self.error_count += 1
+                    return status
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.error_count += 1
+                return self.error_status
+        return None
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified_count += 1
+
+    def count_connection(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def start(self):
+        """Serve requests on a background thread."""
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main(argv=None):
+    """Serve the stub API until interrupted, printing its base URL on the first line of stdout."""
+
+    parser = argparse.ArgumentParser(description='Serve a stub of the Jira and BitBucket REST APIs.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to sleep before answering each request')
+    parser.add_argument('--project-key', default='PROJ')
+    parser.add_argument('--issue-count', type=int, default=10)
+    parser.add_argument('--repo-count', type=int, default=3)
+    parser.add_argument('--branch-count', type=int, default=1)
+    parser.add_argument('--max-page-size', type=int, default=None)
+    parser.add_argument('--payload-size', type=int, default=0, help='description length of seeded issues')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--compress-min-size', type=int, default=None,
+                        help='compress response bodies of at least this many bytes')
+    args = parser.parse_args(argv)
+
+    server = StubServer(**vars(args)).start()
+    print(server.base_http_url, flush=True)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
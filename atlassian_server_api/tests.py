@@ -1,77 +1,805 @@
+import asyncio
+import json
 import unittest
 import shutil
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from atlassian_server_api.aio import AsyncBitBucket, AsyncJira, AsyncTransport, aiohttp
+from atlassian_server_api.attachments import HashCache
+from atlassian_server_api.benchmarks import bench_transport, bitbucket_cases, git_cases, jira_cases, main, \
+    measure, public_methods
 from atlassian_server_api.bitbucket import BitBucket
+from atlassian_server_api.cache import DiskCacheBackend, MemoryCacheBackend, ResponseCache
+from atlassian_server_api.coalesce import SingleFlight
+from atlassian_server_api.fleet import GitFleet
+from atlassian_server_api.codec import decode_chunks, dumps
 from atlassian_server_api.jira import Jira
 from atlassian_server_api.git import Git
-from unittest.mock import MagicMock, patch
+from atlassian_server_api.git_cache import MirrorCache
+from atlassian_server_api.jira_mirror import JiraMirror
+from atlassian_server_api.models import Issue, issue_model
+from atlassian_server_api.pipeline import ProvisioningPipeline
+from atlassian_server_api.instrumentation import Instrumentation, MetricsAggregator
+from atlassian_server_api.scheduler import RequestScheduler
+from atlassian_server_api.stub_server import StubServer
+from atlassian_server_api.transport import Transport, build_response
 
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test')
 
-class AtlassianGitTests(unittest):
 
-    cwd = os.getcwd()
-    test_dir = os.path.join(cwd, 'atlassian_server_api', 'test', 'git_test')
+class AtlassianGitTests(unittest.TestCase):
 
-    def git_test(self):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='git_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_git(self):
 
         # create test file
-        os.mkdir(self.test_dir)
-        f = open(os.path.join(self.test_dir, "git_test.txt"), "w+")
-        for i in range(10):
-            f.write("This is line %d\r\n" % (i + 1))
+        with open(os.path.join(self.test_dir, "git_test.txt"), "w+") as f:
+            for i in range(10):
+                f.write("This is line %d\r\n" % (i + 1))
 
         # create git repo
         repo = Git(self.test_dir)
         r = repo.git_init()
-        self.assertIs(r.decode('utf-8').startswith('Initialized empty Git repository'), True)
-        shutil.copyfile(os.path.join(self.cwd, 'atlassian_server_api', 'test', 'git', '.gitignore'),
-                        os.path.join(self.test_dir, '.gitignore'))
+        self.assertTrue(r.startswith('Initialized empty Git repository'))
+        repo._git('config', 'user.name', 'Test')
+        repo._git('config', 'user.email', 'test@example.com')
+        shutil.copyfile(os.path.join(TEST_DIR, 'git', '.gitignore'), os.path.join(self.test_dir, '.gitignore'))
         repo.git_add_all()
-        r = repo.git_status()
-        self.assertIs(r.decode('utf-8').startswith(
-            'On branch master\n\nNo commits yet\n\nChanges to be committed:\n  '
-            '(use "git rm --cached <file>..." to unstage)\n\n\tnew file:   .gitignore\n\tnew file:   git_test.txt'),
-                      True)
+        status = repo.status()
+        self.assertEqual([(entry.path, entry.index) for entry in status['staged']],
+                         [('.gitignore', 'A'), ('git_test.txt', 'A')])
+        self.assertEqual(status['unstaged'] + status['untracked'], [])
         r = repo.git_commit_all("init commit")
-        self.assertIs(r.decode('utf-8').startswith('[master (root-commit)'), True)
+        self.assertIn('(root-commit)', r)
 
-        shutil.rmtree(self.test_dir)
+        # rename one file, change the other, and add one
+        repo._git('mv', 'git_test.txt', 'renamed test.txt')
+        with open(os.path.join(self.test_dir, '.gitignore'), 'w') as f:
+            f.write('*.log\n')
+        for name in ('new.txt', 'build.log'):
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write(name)
+        status = repo.status(ignored=True)
+        renamed, = status['staged']
+        self.assertEqual((renamed.kind, renamed.path, renamed.orig_path),
+                         ('renamed', 'renamed test.txt', 'git_test.txt'))
+        self.assertEqual([(entry.path, entry.worktree) for entry in status['unstaged']], [('.gitignore', 'M')])
+        self.assertEqual([entry.path for entry in status['untracked']], ['new.txt'])
+        self.assertEqual([entry.path for entry in status['ignored']], ['build.log'])
+
+    def test_iter_status_exit(self):
+        events = []
+        repo = Git(self.test_dir, instrumentation=Instrumentation(events.append))
+        repo.git_init()
+        # more output than a pipe holds, so git is still writing when the generator is closed
+        for i in range(3000):
+            with open(os.path.join(self.test_dir, 'untracked-file-%05d.txt' % i), 'w'):
+                pass
+        for _ in range(10):
+            self.assertEqual(len(list(repo.iter_status())), 3000)
+        self.assertEqual([event['status'] for event in events[1:]], [0] * 10)
+
+        entries = repo.iter_status()
+        next(entries)
+        entries.close()
+        self.assertLess(events[-1]['status'], 0)
+
+    def test_iter_status_stderr(self):
+        repo = Git(self.test_dir, timeout=10)
+        repo.git_init()
+        # a failing fsmonitor hook writing more to stderr than a pipe holds
+        hook = os.path.join(self.test_dir, 'fsmonitor-hook')
+        with open(hook, 'w') as f:
+            f.write('#!/bin/sh\nhead -c 200000 /dev/zero | tr "\\0" x >&2\nexit 1\n')
+        os.chmod(hook, 0o755)
+        self.assertEqual([entry.path for entry in repo.iter_status(fsmonitor=hook)], ['fsmonitor-hook'])
+
+    def test_git_commit_files(self):
+        repo = Git(self.test_dir)
+        repo.git_init()
+        repo._git('config', 'user.name', 'Test')
+        repo._git('config', 'user.email', 'test@example.com')
+        paths = ['file-%d.txt' % i for i in range(20)] + ['a b']
+        for path in paths:
+            with open(os.path.join(self.test_dir, path), 'w') as f:
+                f.write(path)
+
+        sha = repo.git_commit_files(paths, 'fast-import')
+        self.assertEqual(repo._git('rev-parse', 'HEAD').strip(), sha)
+        self.assertEqual(repo._git('status', '--porcelain'), '')
+        with repo.cat_file() as objects:
+            self.assertEqual(objects.read('HEAD:file-3.txt')[2], b'file-3.txt')
+            self.assertIsNone(objects.read('HEAD:missing.txt'))
+            self.assertEqual(objects.read('HEAD:a b')[1:], ('blob', b'a b'))
+            self.assertEqual(objects.info('HEAD:a b')[1:], ('blob', 3))
+            self.assertIsNone(objects.read('HEAD:a missing'))
+            self.assertIsNone(objects.info('HEAD:a missing'))
+
+        with self.assertRaises(ValueError):
+            repo.git_commit_files(['../outside.txt'], 'outside')
+
+    def test_git_clone(self):
+        source = Git(os.path.join(self.test_dir, 'source'))
+        os.makedirs(source.working_directory)
+        source.git_init()
+        source._git('config', 'user.name', 'Test')
+        source._git('config', 'user.email', 'test@example.com')
+        source._git('config', 'uploadpack.allowFilter', 'true')
+        paths = ['docs/index.txt', 'src/main.txt', 'README.txt']
+        for path in paths:
+            os.makedirs(os.path.join(source.working_directory, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(source.working_directory, path), 'w') as f:
+                f.write(path)
+        source.git_commit_files(paths, 'first')
+        url = 'file://' + source.working_directory
+
+        cache = MirrorCache(os.path.join(self.test_dir, 'mirrors'))
+        clone = Git(os.path.join(self.test_dir, 'clone'))
+        clone.git_clone(url, depth=1, filter='blob:none', sparse_paths=['src'], cache=cache)
+        self.assertEqual(sorted(os.listdir(clone.working_directory)), ['.git', 'README.txt', 'src'])
+        mirror, = cache.mirrors()
+        with open(os.path.join(clone.working_directory, '.git', 'objects', 'info', 'alternates')) as f:
+            self.assertEqual(f.read().strip(), os.path.join(mirror['path'], 'objects'))
+
+        clone._git('tag', 'local')
+        sha = source.git_commit_files(['src/main.txt'], 'second')
+        source._git('tag', 'v1')
+        clone.git_fetch(cache=cache)
+        self.assertEqual(clone._git('rev-parse', 'origin/HEAD').strip(), sha)
+        # remote tags are fetched, local tags are not pruned
+        self.assertEqual(clone._git('tag').split(), ['local', 'v1'])
+
+        # mirrors in use are not evicted
+        with cache.use(url, update=False):
+            self.assertEqual(cache.evict(0), [])
+        self.assertEqual(cache.evict(0), [mirror['path']])
 
-    # TODO: create mock tests
-    # @patch('example.models.request')
-    def bitbucket_test(self, req):
-        # verify API comms
-        project_id = ATLASSIAN_SETTINGS['bitbucket']['projects'].values()[0]
-        bb_auth = ATLASSIAN_SETTINGS['bitbucket']['username'], ATLASSIAN_SETTINGS['bitbucket']['password']
-        bb_http_url = ATLASSIAN_SETTINGS['bitbucket']['http_url']
-        bb = BitBucket(base_http_url=bb_http_url, project_key=project_id, auth=bb_auth)
 
+class AtlassianBitBucketTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(repo_count=30, branch_count=3).start()
+        self.bb = BitBucket(base_http_url=self.server.base_http_url, project_key='PROJ', auth=('user', 'password'))
+
+    def tearDown(self):
+        self.bb.transport.close()
+        self.server.stop()
+
+    def test_bitbucket(self):
         # get list of repos and check that first repo has at least 1 branch
-        repos = bb.get_repos(10).json()['values']
+        repos = self.bb.get_repos(10).json()['values']
         first_repo = repos[0]['slug']
-        self.assertIs(bb.get_repo_branches(repo_name=first_repo).json()['size'] > 0, True)
+        self.assertTrue(self.bb.get_repo_branches(repo_name=first_repo).json()['size'] > 0)
+
+    def test_iter_repos(self):
+        self.assertEqual(len(list(self.bb.iter_repos(page_size=7))), 30)
+        self.assertEqual([b['displayId'] for b in self.bb.iter_branches('repo-1', page_size=2)],
+                         ['master', 'branch-1', 'branch-2'])
 
-        # TODO: mock API responses
-        # url = MagicMock()
-        # self.example._get_page(url)
-        # req.assert_called_once_with('GET', url)
+    def test_create_repo(self):
+        self.assertEqual(self.bb.create_repo('My Repo').json()['slug'], 'my-repo')
+        self.assertEqual(self.bb.create_repo('My Repo').status_code, 409)
+        self.assertEqual(self.bb.branch_repo('my-repo', 'develop').status_code, 200)
+        self.assertEqual(self.bb.branch_repo('my-repo', 'develop').status_code, 409)
 
-    # TODO: create mock tests
-    def jira_test(self):
-        project_id = ATLASSIAN_SETTINGS['jira']['projects'].values()[0]
-        auth = ATLASSIAN_SETTINGS['jira']['username'], ATLASSIAN_SETTINGS['jira']['password']
-        jira = Jira(base_http_url=ATLASSIAN_SETTINGS['jira']['http_url'], project_key=project_id, auth=auth)
 
+class AtlassianJiraTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(issue_count=25, payload_size=100).start()
+        self.jira = Jira(base_http_url=self.server.base_http_url, project_key='PROJ', auth=('user', 'password'))
+
+    def tearDown(self):
+        self.jira.transport.close()
+        self.server.stop()
+
+    def test_jira(self):
         # verify issues exist
-        issue = jira.get_issues(max_results=10).json()
-        if issue['size'] > 0:
-            print('ERROR: Issue not created successfully.' + str(issue))
+        issues = self.jira.get_issues(max_results=10).json()
+        self.assertEqual(len(issues['issues']), 10)
+        issue = self.jira.get_issues('PROJ-1', fields=['summary']).json()
+        self.assertEqual(issue['fields'], {'summary': 'Issue 1'})
+        self.assertEqual(len(self.server.issues['PROJ-1']['fields']['description']), 100)
+
+    def test_models(self):
+        issues = list(self.jira.iter_issues(page_size=10, model=True))
+        self.assertEqual([issue.key for issue in issues], ['PROJ-%d' % i for i in range(1, 26)])
+        self.assertIsInstance(issues[0], Issue)
+        self.assertEqual((issues[0].status, issues[0].attachment), ('Open', ()))
+
+        found = list(self.jira.search('project = PROJ', fields='summary, status', page_size=10, model=True))
+        self.assertEqual(found[0].as_dict(), {'id': issues[0].id, 'key': 'PROJ-1', 'summary': issues[0].summary,
+                                              'status': 'Open'})
+        self.assertIs(type(found[0]), issue_model(['summary', 'status']))
+
+    def test_create_issues(self):
+        issues = ['First', {'summary': ''}, 'Third', 'Fourth', 'Fifth']
+        results = self.jira.create_issues(issues, chunk_size=2, max_workers=3)
+        self.assertEqual([r['ok'] for r in results], [True, False, True, True, True])
+        # the chunks are sent concurrently, so the keys are assigned in any order
+        created = [r for r in results if r['ok']]
+        self.assertEqual(sorted(r['key'] for r in created), ['PROJ-%d' % i for i in range(26, 30)])
+        self.assertEqual([self.server.issues[r['key']]['fields']['summary'] for r in created],
+                         ['First', 'Third', 'Fourth', 'Fifth'])
+
+    def test_create_issues_envelope_errors(self):
+        envelope = {'errorMessages': [], 'errors': {'project': 'project is required'}}
+        response = build_response(400, {'Content-Type': 'application/json'}, dumps(envelope), 'http://localhost/')
+        results = Jira._bulk_results(0, [{'summary': 'First'}, {'summary': 'Second'}], response)
+        self.assertEqual([(r['ok'], r['status'], r['error']) for r in results], [(False, 400, envelope)] * 2)
+
+        self.server.inject_error(401, path='/issue/bulk')
+        results = self.jira.create_issues(['First', 'Second'])
+        self.assertEqual([(r['ok'], r['status']) for r in results], [(False, 401)] * 2)
+        self.assertEqual(results[0]['error'], {'errorMessages': ['Injected error.'], 'errors': {}})
+
+    def test_search(self):
+        keys = [issue['key'] for issue in self.jira.search('project = PROJ', page_size=4)]
+        self.assertEqual(keys, ['PROJ-%d' % i for i in range(1, 26)])
+
+    def test_add_attachment(self):
+        attachments = [os.path.join(TEST_DIR, 'attachments', name) for name in ('test1.txt', 'test2.txt')]
+        for mode in ('separate', 'single', 'concurrent'):
+            r = self.jira.add_attachment('PROJ-1', attachments, mode=mode)
+            self.assertTrue(all(response.status_code == 200 for response in r), r)
+        self.assertEqual(len(self.server.issues['PROJ-1']['fields']['attachment']), 6)
+
+    def test_sync_attachments(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ('a.txt', 'b.txt')]
+            for path in paths:
+                with open(path, 'w') as f:
+                    f.write('first')
+            hash_cache = HashCache(os.path.join(directory, 'hashes.json'))
+            self.assertEqual(self.jira.sync_attachments('PROJ-1', paths, hash_cache)['uploaded'], paths)
+            self.assertEqual(self.jira.sync_attachments('PROJ-1', paths, HashCache(hash_cache.path))['skipped'], paths)
 
-    def cleanup(self):
+            # same size, different content
+            with open(paths[1], 'w') as f:
+                f.write('again')
+            attachments = self.server.issues['PROJ-1']['fields']['attachment']
+            old_id, = [d['id'] for d in attachments if d['filename'] == 'b.txt']
+            result = self.jira.sync_attachments('PROJ-1', paths, HashCache(hash_cache.path), replace=True)
+            self.assertEqual((result['uploaded'], result['skipped']), (paths[1:], paths[:1]))
+            self.assertEqual(result['deleted'], [old_id])
+        self.assertEqual([d['filename'] for d in self.server.issues['PROJ-1']['fields']['attachment']],
+                         ['a.txt', 'b.txt'])
+
+    def test_error_injection(self):
+        self.server.inject_error(503, count=2, method='GET', path='/issue/PROJ-1$')
+        self.assertEqual(self.jira.get_issues('PROJ-2').status_code, 200)
+        self.assertEqual(self.jira.get_issues('PROJ-1').status_code, 503)
+        self.assertEqual(self.jira.get_issues('PROJ-1').status_code, 503)
+        self.assertEqual(self.jira.get_issues('PROJ-1').status_code, 200)
+        self.assertEqual(self.server.error_count, 2)
+
+
+class AtlassianJiraMirrorTests(unittest.TestCase):
+
+    def test_sync(self):
+        with StubServer(issue_count=30) as server:
+            jira = Jira(server.base_http_url, 'PROJ', auth=('user', 'password'))
+            for i in range(1, 31):
+                server.update_issue('PROJ-%d' % i, updated='2019-01-%02dT00:00:00.000+0000' % i)
+            with JiraMirror(jira, page_size=7, fields=iter(['summary', 'status', 'assignee'])) as mirror:
+                self.assertEqual(mirror.fields, ('summary', 'status', 'assignee', 'updated'))
+                start = time.time()
+                self.assertEqual(mirror.sync()['fetched'], 30)
+                # the next sync starts from the start of this one, less the margin
+                self.assertTrue(start - mirror.margin <= mirror.last_sync <= time.time() - mirror.margin)
+
+                server.update_issue('PROJ-4', status={'name': 'Done'}, assignee={'name': 'jdoe'})
+                result = mirror.sync()
+                self.assertEqual(result['fetched'], 1)
+                self.assertEqual(mirror.get('PROJ-4')['status'], 'Done')
+                self.assertEqual([issue['key'] for issue in mirror.find(status='Done', assignee='jdoe')], ['PROJ-4'])
+                self.assertEqual(len(mirror.find(status='Open')), 29)
+
+                del server.issues['PROJ-1']
+                self.assertEqual(mirror.sync(full=True)['deleted'], 1)
+                self.assertIsNone(mirror.get('PROJ-1'))
+
+
+class AtlassianFleetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='fleet_test')
+        self.directories = [os.path.join(self.test_dir, name) for name in ('c', 'a', 'b')]
+        for directory in self.directories:
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'README'), 'w') as f:
+                f.write(directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_fleet(self):
+        fleet = GitFleet(self.directories, max_workers=2)
+        results = fleet.git_init()
+        self.assertEqual(list(results), self.directories)
+        self.assertTrue(all(result['ok'] for result in results.values()))
+        fleet.run(lambda repo: [repo._git('symbolic-ref', 'HEAD', 'refs/heads/master'),
+                                repo._git('config', 'user.name', 'Test'),
+                                repo._git('config', 'user.email', 'test@example.com')])
+        self.assertTrue(all(result['ok'] for result in fleet.git_add_all().values()))
+        self.assertTrue(all(result['ok'] for result in fleet.git_commit_all('init').values()))
+
+        remotes = {directory: directory + '.git' for directory in self.directories}
+        # the remote of the last repository does not exist
+        for directory in self.directories[:2]:
+            Git(self.test_dir)._git('init', '--quiet', '--bare', remotes[directory])
+        self.assertTrue(all(result['ok'] for result in fleet.git_add_remote(remotes).values()))
+        results = fleet.git_push_remote()
+        self.assertEqual([result['ok'] for result in results.values()], [True, True, False])
+        # the failing repository does not stop the others
+        self.assertTrue(results[self.directories[2]]['error'].startswith('git exited with status'))
+        self.assertEqual(Git(remotes[self.directories[0]])._git('show', 'master:README'), self.directories[0])
+
+    def test_timeout(self):
+        fleet = GitFleet(self.directories[:1], timeout=0.5)
+        result, = fleet.run(lambda repo: repo._git('-c', 'alias.wait=!sleep 2', 'wait')).values()
+        self.assertFalse(result['ok'])
+        self.assertTrue(result['error'].startswith('git timed out after 0.5 seconds'))
+        self.assertLess(result['seconds'], 2)
+
+    def test_duplicate_directories(self):
+        with self.assertRaises(ValueError):
+            GitFleet([self.directories[0], self.directories[1], self.directories[0] + os.sep])
+
+
+class AtlassianPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='pipeline_test')
+        self.server = StubServer(repo_count=0)
+        self.server.start()
+        self.bitbucket = BitBucket(self.server.base_http_url, 'PROJ', auth=('user', 'password'))
+        self.jira = Jira(self.server.base_http_url, 'PROJ', auth=('user', 'password'))
+        self.remote_url = os.path.join(self.test_dir, 'remotes', '{slug}.git')
+        self.state_path = os.path.join(self.test_dir, 'state.json')
+
+    def tearDown(self):
+        self.server.stop()
         shutil.rmtree(self.test_dir)
 
+    def entry(self, name, remote=True):
+        working_directory = os.path.join(self.test_dir, name)
+        os.makedirs(working_directory)
+        repo = Git(working_directory)
+        repo.git_init()
+        repo._git('symbolic-ref', 'HEAD', 'refs/heads/master')
+        repo._git('config', 'user.name', 'Test')
+        repo._git('config', 'user.email', 'test@example.com')
+        with open(os.path.join(working_directory, 'README'), 'w') as f:
+            f.write(name + '\n')
+        if remote:
+            self.add_remote(name)
+        return {'name': name, 'working_directory': working_directory, 'branches': ['develop'],
+                'issue': {'summary': 'Set up ' + name}}
+
+    def add_remote(self, name):
+        Git(self.test_dir)._git('init', '--quiet', '--bare', self.remote_url.format(slug=name))
+
+    def pipeline(self, state_path=None):
+        return ProvisioningPipeline(self.bitbucket, self.jira, remote_url=self.remote_url,
+                                    state_path=state_path or self.state_path)
+
+    def test_run(self):
+        manifest = [self.entry('service-a'), self.entry('service-b')]
+        issue_count = len(self.server.issues)
+        report = self.pipeline().run(manifest)
+        for name in ('service-a', 'service-b'):
+            self.assertEqual(report['repos'][name]['ok'], True, report['repos'][name]['error'])
+            self.assertEqual({stage['status'] for stage in report['repos'][name]['stages'].values()}, {'done'})
+            self.assertIn('develop', [branch['displayId'] for branch in self.server.branches[name]])
+            remote = Git(self.remote_url.format(slug=name))
+            self.assertEqual(remote._git('show', 'master:README'), name + '\n')
+        self.assertEqual(len(self.server.issues), issue_count + 2)
+
+        # a second run finds every stage done
+        report = self.pipeline().run(manifest)
+        self.assertEqual({stage['status'] for repo in report['repos'].values() for stage in repo['stages'].values()},
+                         {'skipped'})
+        self.assertEqual(len(self.server.issues), issue_count + 2)
+
+    def test_resume(self):
+        manifest = [self.entry('service-a'), self.entry('service-b', remote=False)]
+        report = self.pipeline().run(manifest)
+        self.assertTrue(report['repos']['service-a']['ok'])
+        failed = report['repos']['service-b']
+        self.assertFalse(failed['ok'])
+        self.assertTrue(failed['error'].startswith('push failed: '))
+        self.assertEqual({stage: result['status'] for stage, result in failed['stages'].items()},
+                         {'create_repo': 'done', 'push': 'failed'})
+
+        self.add_remote('service-b')
+        report = self.pipeline().run(manifest)
+        self.assertEqual({stage: result['status'] for stage, result in report['repos']['service-b']['stages'].items()},
+                         {'create_repo': 'skipped', 'push': 'done', 'branch': 'done', 'issue': 'done'})
+        self.assertTrue(report['repos']['service-b']['ok'])
+
+    def test_existing_repo(self):
+        # the repository exists but the state of the run that created it is lost
+        repo = self.server.add_repo('Service C')
+        entry = self.entry('Service C')
+        state_path = os.path.join(self.test_dir, 'other-state.json')
+        pipeline = ProvisioningPipeline(self.bitbucket, state_path=state_path)
+        report = pipeline.run([dict(entry, branches=[], remote_url=self.remote_url.format(slug='Service C'))])
+        self.assertTrue(report['repos']['Service C']['ok'], report['repos']['Service C']['error'])
+        self.assertEqual(report['repos']['Service C']['stages']['create_repo']['status'], 'skipped')
+        with open(state_path) as f:
+            state = json.load(f)['Service C']
+        self.assertEqual(state['slug'], repo['slug'])
+        self.assertEqual(state['clone_url'], repo['links']['clone'][0]['href'])
+
+
+class AtlassianInstrumentationTests(unittest.TestCase):
+
+    def test_instrumentation(self):
+        events = []
+        metrics = MetricsAggregator()
+        instrumentation = Instrumentation(metrics, events.append)
+        with StubServer() as server, Transport(auth=('user', 'password'), instrumentation=instrumentation) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+            jira.get_issues('PROJ-1')
+            jira.get_issues('PROJ-2')
+            server.inject_error(500, path='PROJ-3')
+            jira.get_issues('PROJ-3')
+
+        self.assertEqual([event['reused_connection'] for event in events], [False, True, True])
+        self.assertEqual([event['status'] for event in events], [200, 200, 500])
+        self.assertTrue(all(event['bytes_received'] > 0 for event in events))
+        endpoint, = metrics.snapshot()
+        self.assertEqual((endpoint['method'], endpoint['endpoint']), ('GET', '/rest/api/2/issue/{issueIdOrKey}'))
+        self.assertEqual((endpoint['count'], endpoint['errors'], endpoint['reused_connections']), (3, 1, 2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            Git(directory, instrumentation=instrumentation).git_init()
+        self.assertEqual((events[-1]['endpoint'], events[-1]['status']), ('git init', 0))
+
+
+class AtlassianSingleFlightTests(unittest.TestCase):
+
+    def test_coalescing(self):
+        single_flight = SingleFlight()
+        barrier = threading.Barrier(8)
+        with StubServer(latency=0.05) as server, \
+                Transport(auth=('user', 'password'), single_flight=single_flight) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+
+            def get_issue(_):
+                barrier.wait()
+                return jira.get_issues('PROJ-1').json()['key']
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                self.assertEqual(list(executor.map(get_issue, range(8))), ['PROJ-1'] * 8)
+            stats = single_flight.stats()
+            self.assertEqual(stats['executions'] + stats['coalesced'], 8)
+            self.assertEqual(server.request_count, stats['executions'])
+            self.assertLess(server.request_count, 8)
+
+            # writes are never coalesced
+            jira.create_issue('New')
+            self.assertEqual(single_flight.stats()['executions'], stats['executions'])
+
+    def test_exception(self):
+        single_flight = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            single_flight.do('key', lambda: 1 / 0)
+        self.assertEqual(single_flight.do('key', lambda: 1), 1)
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AtlassianAsyncTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(issue_count=10, repo_count=3, branch_count=3)
+        self.server.start()
+        self.test_dir = tempfile.mkdtemp(prefix='aio_test')
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.test_dir)
+
+    def run_jira(self, test):
+        async def run():
+            async with AsyncTransport(auth=('user', 'password'), concurrency=4) as transport:
+                return await test(AsyncJira(self.server.base_http_url, 'PROJ', transport=transport))
+        return asyncio.run(run())
+
+    def test_issues(self):
+        async def test(jira):
+            r = await jira.get_issues('PROJ-1')
+            self.assertEqual((r.status_code, r.json()['key']), (200, 'PROJ-1'))
+            keys = [issue['key'] async for issue in jira.iter_issues(page_size=3)]
+            self.assertEqual(keys, ['PROJ-%d' % i for i in range(1, 11)])
+            found = [issue['key'] async for issue in jira.search('project = PROJ', page_size=3, parallelism=2)]
+            self.assertEqual(found, keys)
+            return await jira.create_issues(['First', {'summary': ''}, {'summary': 'Third'}], chunk_size=2)
+
+        results = self.run_jira(test)
+        self.assertEqual([result['ok'] for result in results], [True, False, True])
+        # the chunks are sent concurrently, so the keys are assigned in any order
+        self.assertEqual(sorted(result['key'] for result in results if result['ok']), ['PROJ-11', 'PROJ-12'])
+
+    def test_add_attachment(self):
+        paths = []
+        for name in ('a.txt', 'b.txt', 'c.txt'):
+            paths.append(os.path.join(self.test_dir, name))
+            with open(paths[-1], 'w') as f:
+                f.write(name)
+
+        async def test(jira):
+            return [await jira.add_attachment('PROJ-%d' % i, paths, mode=mode)
+                    for i, mode in enumerate(('separate', 'single', 'concurrent'), 1)]
+
+        for i, responses in enumerate(self.run_jira(test), 1):
+            self.assertTrue(all(r.ok for r in responses))
+            self.assertEqual(sorted(d['filename'] for d in self.server.issues['PROJ-%d' % i]['fields']['attachment']),
+                             ['a.txt', 'b.txt', 'c.txt'])
+        # one request per file, except in single mode
+        self.assertEqual(self.server.request_count, 7)
+
+    def test_bitbucket(self):
+        async def run():
+            async with AsyncTransport(auth=('user', 'password')) as transport:
+                bitbucket = AsyncBitBucket(self.server.base_http_url, 'PROJ', transport=transport)
+                repos = [repo['slug'] async for repo in bitbucket.iter_repos(page_size=2)]
+                branches = [branch['displayId'] async for branch in bitbucket.iter_branches('repo-1', page_size=2)]
+                return repos, branches
+
+        self.assertEqual(asyncio.run(run()), (['repo-1', 'repo-2', 'repo-3'], ['master', 'branch-1', 'branch-2']))
+
+
+class AtlassianCacheTests(unittest.TestCase):
+
+    def test_revalidation(self):
+        cache = ResponseCache(ttl=0)
+        with StubServer() as server, Transport(auth=('user', 'password'), cache=cache) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+            first = jira.get_issues('PROJ-1')
+            second = jira.get_issues('PROJ-1')
+            self.assertEqual((second.status_code, second.json()), (200, first.json()))
+            self.assertEqual(cache.stats(), {'hits': 0, 'misses': 1, 'revalidations': 1})
+            self.assertEqual(server.not_modified_count, 1)
+
+            cache.ttl = 60
+            request_count = server.request_count
+            self.assertEqual(jira.get_issues('PROJ-1').json(), first.json())
+            self.assertEqual(cache.stats()['hits'], 1)
+            self.assertEqual(server.request_count, request_count)
+
+    def test_last_modified(self):
+        url = 'http://localhost/rest/api/2/issue/PROJ-1'
+        last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        sent = []
+
+        def send(headers):
+            sent.append(headers)
+            status = 304 if headers.get('If-Modified-Since') == last_modified else 200
+            # lowercase names, as sent over HTTP/2 and by many proxies
+            return build_response(status, {'last-modified': last_modified, 'etag': '"1"'}, b'{"key": "PROJ-1"}', url)
+
+        cache = ResponseCache(ttl=0)
+        cache.get(url, send)
+        r = cache.get(url, send)
+        self.assertEqual((sent[1]['If-Modified-Since'], sent[1]['If-None-Match']), (last_modified, '"1"'))
+        self.assertEqual((r.status_code, r.json()), (200, {'key': 'PROJ-1'}))
+        self.assertEqual(cache.stats()['revalidations'], 1)
+
+    def test_lru(self):
+        backend = MemoryCacheBackend(max_entries=2)
+        for key in ('a', 'b'):
+            backend.set(key, {'key': key})
+        backend.get('a')
+        backend.set('c', {'key': 'c'})
+        self.assertEqual(sorted(backend.keys()), ['a', 'c'])
+
+    def test_invalidate(self):
+        api = 'http://jira/rest/api/2/'
+        keys = [api + 'issue/PROJ-1', api + 'issue/PROJ-2', api + 'issue?startAt=0', api + 'search?jql=project%3DPROJ',
+                'http://other/rest/api/2/search?jql=project%3DPROJ']
+        cache = ResponseCache()
+        for key in keys:
+            cache.backend.set(key, {})
+
+        # an attachment changes its issue and searches, but not other issues or other servers
+        cache.invalidate(api + 'issue/PROJ-1/attachments')
+        self.assertEqual(cache.backend.keys(), [keys[1], keys[2], keys[4]])
+        # an issue changes the issue list
+        cache.invalidate(api + 'issue/PROJ-2')
+        self.assertEqual(cache.backend.keys(), [keys[4]])
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'a.txt')
+            with open(path, 'w') as f:
+                f.write('a')
+            cache = ResponseCache(ttl=60)
+            with StubServer() as server, Transport(auth=('user', 'password'), cache=cache) as transport:
+                jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+                self.assertEqual(jira.get_issues('PROJ-1').json()['fields']['attachment'], [])
+                for r in jira.add_attachment('PROJ-1', [path]):
+                    r.raise_for_status()
+                self.assertEqual(len(jira.get_issues('PROJ-1').json()['fields']['attachment']), 1)
+                self.assertEqual(cache.stats()['misses'], 2)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalidate_deleted_attachment(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'a.txt')
+            with open(path, 'w') as f:
+                f.write('a')
+            cache = ResponseCache(ttl=60)
+            with StubServer() as server, Transport(auth=('user', 'password'), cache=cache) as transport:
+                jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+                jira.sync_attachments('PROJ-1', [path])
+                with open(path, 'w') as f:
+                    f.write('changed')
+
+                send = transport.request
+
+                def request(method, url, **kwargs):
+                    if method == 'DELETE':
+                        # another reader caches the issue between the upload and the delete
+                        jira.get_issues('PROJ-1')
+                    return send(method, url, **kwargs)
+
+                transport.request = request
+                self.assertEqual(len(jira.sync_attachments('PROJ-1', [path], replace=True)['deleted']), 1)
+                self.assertEqual(len(jira.get_issues('PROJ-1').json()['fields']['attachment']), 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_disk_backend(self):
+        directory = tempfile.mkdtemp()
+        try:
+            entry = {'status_code': 200, 'reason': 'OK', 'headers': {'ETag': '"1"'}, 'content': b'{"a":\n1}',
+                     'url': 'http://localhost/a', 'stored_at': 1.0}
+            backend = DiskCacheBackend(directory, max_entries=2)
+            backend.set('http://localhost/a', entry)
+            with open(os.path.join(directory, 'corrupt.cache'), 'wb') as f:
+                f.write(b'\x80\x04not json')
+
+            # entries survive a restart, unreadable files are dropped
+            backend = DiskCacheBackend(directory, max_entries=2)
+            self.assertEqual(backend.keys(), ['http://localhost/a'])
+            self.assertEqual(backend.get('http://localhost/a'), entry)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'corrupt.cache')))
+
+            # the least recently used entry is evicted
+            backend.set('http://localhost/b', dict(entry, content=b'b'))
+            time.sleep(0.05)
+            backend.get('http://localhost/a')
+            time.sleep(0.05)
+            backend.set('http://localhost/c', dict(entry, content=b'c'))
+            self.assertEqual(sorted(backend.keys()), ['http://localhost/a', 'http://localhost/c'])
+            self.assertEqual(len(os.listdir(directory)), 2)
+        finally:
+            shutil.rmtree(directory)
+
+
+class AtlassianModelTests(unittest.TestCase):
+
+    def test_issue_model(self):
+        Model = issue_model('summary,status,assignee,attachment,labels')
+        self.assertEqual(Model.fields, ('summary', 'status', 'assignee', 'attachment', 'labels'))
+        self.assertIs(issue_model(Model.fields), Model)
+        issue = Model.from_json({'id': '10001', 'key': 'PROJ-1', 'fields': {
+            'summary': 'First', 'status': {'name': 'Open', 'id': '1'}, 'assignee': None, 'description': 'Dropped',
+            'attachment': [{'id': '1', 'filename': 'a.txt'}, {'id': '2', 'filename': 'b.txt'}], 'labels': ['x', 'y']}})
+        self.assertEqual(issue.as_dict(), {'id': '10001', 'key': 'PROJ-1', 'summary': 'First', 'status': 'Open',
+                                           'assignee': None, 'attachment': ('a.txt', 'b.txt'), 'labels': ('x', 'y')})
+        self.assertEqual(issue, Model(**issue.as_dict()))
+        # slotted: no per-instance dict, no other attributes
+        self.assertFalse(hasattr(issue, '__dict__'))
+        with self.assertRaises(AttributeError):
+            issue.description = 'Dropped'
+
+        for fields in (['summary', 'class'], ['custom-field'], 'summary,key'):
+            with self.assertRaises(ValueError):
+                issue_model(fields)
+
+
+class AtlassianSchedulerTests(unittest.TestCase):
+
+    def test_throttled_pages(self):
+        scheduler = RequestScheduler(max_retries=50)
+        with StubServer(issue_count=40, throttle_rate=50, throttle_burst=2, retry_after=0.05) as server, \
+                Transport(auth=('user', 'password'), scheduler=scheduler, stream_pages=True) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+            self.assertEqual(len(list(jira.iter_issues(page_size=2))), 40)
+            stats = scheduler.stats()
+            self.assertGreater(stats['throttled'], 0)
+            self.assertEqual(stats['retries'], server.throttled_count)
+            # throttled streamed pages give their connection back
+            self.assertEqual(server.connection_count, 1)
+
+    def test_retry_after(self):
+        scheduler = RequestScheduler(max_retries=1)
+        with StubServer(throttle_rate=0.001, throttle_burst=1, retry_after=0.3) as server, \
+                Transport(auth=('user', 'password'), scheduler=scheduler) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+            self.assertEqual(jira.get_issues('PROJ-1').status_code, 200)
+            start = time.monotonic()
+            r = jira.get_issues('PROJ-1')
+            self.assertGreaterEqual(time.monotonic() - start, 0.3)
+            self.assertEqual((r.status_code, r.retries), (429, 1))
+            self.assertEqual(server.request_count, 3)
+
+
+class AtlassianCodecTests(unittest.TestCase):
+
+    def test_decode_chunks(self):
+        page = {'startAt': 0, 'total': 3, 'issues': [{'key': 'PROJ-%d' % i, 'summary': 'é' * i} for i in range(3)],
+                'names': {}, 'values': [], 'number': 12345}
+        body = dumps(page)
+        for size in (1, 7, len(body)):
+            self.assertEqual(decode_chunks(body[i:i + size] for i in range(0, len(body), size)), page)
+        # chunk boundaries inside numbers
+        for chunks, expected in (([b'{"a": 1.', b'5}'], {'a': 1.5}),
+                                 ([b'[1.', b'5]'], [1.5]),
+                                 ([b'[1', b'2e', b'-3 ,-', b'4]'], [12e-3, -4]),
+                                 ([b'{"a": [10', b'0]}'], {'a': [100]})):
+            self.assertEqual(decode_chunks(chunks), expected)
+        for invalid in (b'{"issues": [1, 2', b'{"a": 1} {}', b'[1, 2]]', b'[1.]'):
+            with self.assertRaises(ValueError):
+                decode_chunks([invalid])
+
+    def test_compression(self):
+        with StubServer(issue_count=30, payload_size=1000, compress_min_size=1024) as server, \
+                Transport(auth=('user', 'password'), compress_min_size=1024) as transport:
+            jira = Jira(server.base_http_url, 'PROJ', transport=transport)
+            r = jira.search_issues('project = PROJ')
+            self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+            self.assertLess(int(r.headers['Content-Length']), len(r.content))
+            self.assertEqual(len(list(jira.search('project = PROJ', page_size=7))), 30)
+
+            results = jira.create_issues(['Issue with a long description'] * 20)
+            self.assertTrue(all(result['ok'] for result in results))
+
+
+class AtlassianBenchmarkTests(unittest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        result = measure(calls.append, 10, setup=lambda: (len(calls),))
+        self.assertEqual(calls, list(range(11)))
+        self.assertEqual(result['errors'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_unknown_suite(self):
+        with self.assertRaises(SystemExit):
+            main(['transport', 'unknown'])
+
+    def test_bench_transport(self):
+        results = bench_transport(iterations=200)
+        self.assertEqual(results['new connection per request']['connections'], 200)
+        self.assertEqual(results['pooled keep-alive']['connections'], 1)
+
+    def test_every_public_method_is_benchmarked(self):
+        directory = tempfile.mkdtemp()
+        repo = None
+        try:
+            repo, cases = git_cases(directory, file_count=1)
+            cases += jira_cases(None, directory) + bitbucket_cases(None)
+            names = [name for name, call, setup in cases]
+        finally:
+            shutil.rmtree(directory)
+            if repo is not None:
+                shutil.rmtree(repo.working_directory)
+        self.assertEqual(sorted(names), sorted(public_methods(Jira) + public_methods(BitBucket) + public_methods(Git)))
+
 
-tests = AtlassianGitTests
-tests.git_test
-tests.bitbucket_test
-tests.jira_test
+if __name__ == '__main__':
+    unittest.main()
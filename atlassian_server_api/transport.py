@@ -0,0 +1,207 @@
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from atlassian_server_api.codec import compress_body
+from atlassian_server_api.coalesce import request_key
+from atlassian_server_api.instrumentation import TrackingHTTPAdapter
+
+
+def build_response(status_code, headers, content, url, reason=None):
+    """Build a requests.Response from data received elsewhere (i.e. aiohttp or a cache).
+
+    :param status_code: HTTP status code.
+    :type status_code: int
+    :param headers: Response headers.
+    :type headers: collections.abc.Mapping
+    :param content: Response body.
+    :type content: bytes
+    :param url: URL of the resource.
+    :type url: str
+    :param reason: HTTP reason phrase (i.e. 'OK').
+    :type reason: str
+    :rtype: requests.Response
+    """
+
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = content
+    return response
+
+
+class Transport:
+    """Pooled, keep-alive HTTP transport shared by the Jira and BitBucket clients.
+
+    Every request goes through one requests.Session, so TCP and TLS connections are pooled per host and reused between
+    calls instead of being opened for every request. Authentication and default headers are set once on the session.
+    A single Transport can be handed to several clients (i.e. a Jira and a BitBucket object for the same server) so
+    they share one connection pool:
+
+    transport = Transport(auth=('user', 'password'), pool_maxsize=20)
+    jira = Jira('http://localhost:8080/', 'PROJ', transport=transport)
+    bitbucket = BitBucket('http://localhost:7990/', 'PROJ', transport=transport)
+
+    Responses are requested compressed (Accept-Encoding: gzip, deflate) and decompressed as they are read. Request
+    bodies are sent compressed when they reach compress_min_size bytes.
+    """
+
+    def __init__(self, auth=None, headers=None, pool_connections=10, pool_maxsize=10, keep_alive=True, cache=None,
+                 scheduler=None, instrumentation=None, single_flight=None, compress_min_size=None, stream_pages=False):
+        """Initialize Transport object with auth, default headers, and connection pool settings.
+
+        :param auth: Tuple of username and password for authentication.
+        :type auth: tuple[str, str]
+        :param headers: Headers sent with every request (request specific headers take precedence).
+        :type headers: dict
+        :param pool_connections: Number of hosts to keep connection pools for.
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of connections kept alive per host.
+        :type pool_maxsize: int
+        :param keep_alive: Reuse connections between requests. When False every request is sent through a new session,
+            so it opens its own connection and closes it afterwards.
+        :type keep_alive: bool
+        :param cache: Cache for GET responses. Writes sent through this transport invalidate affected entries.
+        :type cache: atlassian_server_api.cache.ResponseCache
+        :param scheduler: Rate limiter and retry policy applied to every request. Share one scheduler between
+            transports to share its limits.
+        :type scheduler: atlassian_server_api.scheduler.RequestScheduler
+        :param instrumentation: Receives an event for every request sent to the server (cache hits send none).
+        :type instrumentation: atlassian_server_api.instrumentation.Instrumentation
+        :param single_flight: Coalesces identical concurrent GET requests into one; every caller receives the same
+            response.
+        :type single_flight: atlassian_server_api.coalesce.SingleFlight
+        :param compress_min_size: Gzip compress request bodies of at least this many bytes (None to never compress).
+            The server must accept Content-Encoding: gzip request bodies.
+        :type compress_min_size: int
+        :param stream_pages: Let the paged iterators of the clients decode pages while they are downloaded (see
+            codec.decode_chunks). This lowers peak memory on large pages but is slower than decoding whole pages with
+            the JSON library in use, as done by default (bench_codec on a 5000 issue page: 43 MB/s and 46 MB peak
+            incremental, 49 MB/s and 62 MB peak with json, 65 MB/s and 53 MB peak with orjson). Pages are always read
+            whole with a cache or single_flight, which need complete responses.
+        :type stream_pages: bool
+        """
+        self.auth = auth
+        self.cache = cache
+        self.scheduler = scheduler
+        self.instrumentation = instrumentation
+        self.single_flight = single_flight
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.compress_min_size = compress_min_size
+        self.stream_pages = stream_pages and cache is None and single_flight is None
+
+        self.headers = headers
+        self.session = self._new_session()
+
+    def _new_session(self):
+        session = requests.Session()
+        session.auth = self.auth
+        if self.headers:
+            session.headers.update(self.headers)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        # the tracking adapter tells the instrumentation whether a request opened a new connection
+        adapter_class = HTTPAdapter if self.instrumentation is None else TrackingHTTPAdapter
+        adapter = adapter_class(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session.
+
+        :param method: HTTP method (i.e. 'GET').
+        :type method: str
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :param kwargs: Any other argument accepted by requests.Session.request (headers, data, files, ...).
+        :return: Response from the server.
+        :rtype: requests.Response
+        """
+
+        kwargs = compress_body(kwargs, self.compress_min_size)
+        if self.single_flight is not None:
+            key = request_key(self, method, url, kwargs)
+            if key is not None:
+                return self.single_flight.do(key, lambda: self._request(method, url, kwargs))
+        return self._request(method, url, kwargs)
+
+    def _request(self, method, url, kwargs):
+        if self.cache is None:
+            return self._send(method, url, kwargs)
+
+        # cache plain GET requests (the URL is the cache key)
+        if method.upper() == 'GET' and not kwargs.get('stream') and not kwargs.get('params'):
+            def send(headers):
+                return self._send(method, url, dict(kwargs, headers=headers))
+            return self.cache.get(url, send, kwargs.get('headers'))
+
+        r = self._send(method, url, kwargs)
+        if method.upper() not in ('GET', 'HEAD', 'OPTIONS'):
+            self.cache.invalidate(url)
+        return r
+
+    def _send(self, method, url, kwargs):
+        if self.instrumentation is None:
+            return self._attempt(method, url, kwargs)
+        return self.instrumentation.http(method, url, lambda: self._attempt(method, url, kwargs),
+                                         stream=kwargs.get('stream', False))
+
+    def _attempt(self, method, url, kwargs):
+        if self.scheduler is None:
+            return self._session_request(method, url, kwargs)
+
+        # rewind streamed bodies (i.e. MultipartFileEncoder) before every attempt
+        data = kwargs.get('data')
+        position = data.tell() if hasattr(data, 'seek') and hasattr(data, 'tell') else None
+
+        def send():
+            if position is not None:
+                data.seek(position)
+            return self._session_request(method, url, kwargs)
+
+        return self.scheduler.send(method, url, send)
+
+    def _session_request(self, method, url, kwargs):
+        if self.keep_alive:
+            return self.session.request(method, url, **kwargs)
+        # nothing is pooled: the connection is closed with the session (a streamed response closes it when released)
+        with self._new_session() as session:
+            return session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        """Send a GET request.
+
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :rtype: requests.Response
+        """
+
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request.
+
+        :param url: Absolute URL of the resource.
+        :type url: str
+        :rtype: requests.Response
+        """
+
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """Close all pooled connections."""
+
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()